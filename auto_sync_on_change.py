@@ -1,165 +1,304 @@
 """
-Watches a local folder for file changes using watchdog.
+Watches a local folder (recursively) for file changes using watchdog.
 On file modification:
 - Uploads the changed file to S3 (main sync).
-- Creates a ZIP backup of the file and uploads it to S3, using S3 versioning for backup history.
-- Maintains logs locally and uploads logs to S3.
-- Handles file deletions by removing them from S3.
+- Streams a compressed ZIP backup of the file to S3 (no temp file), using S3 versioning for backup history
+  (or, with BACKUP_MODE = 'dedup', stores only the changed chunks via dedup_store).
+- Maintains logs locally and ships them to S3 in batched, compressed segments.
+- Handles file (and folder) deletions by removing them from S3, gathered into
+  batched delete_objects calls.
+- S3 keys mirror the path relative to the watch folder, so subfolders are synced too.
+- On startup, reconciles a local scan against a cached index of synced files and
+  only uploads/deletes what changed while the watcher was down.
+- Watchdog callbacks only enqueue events; an EventPipeline worker pool syncs files
+  in parallel while keeping per-file ordering.
+- Noncurrent versions of the ZIP backups are capped at RETENTION_MAX_VERSIONS per file
+  by a retention pass every RETENTION_INTERVAL seconds.
+- Bursts of modify events are coalesced into one sync of the final content once the
+  file has been quiet for DEBOUNCE_SECONDS.
+- Per-stage latency/bytes, S3 retries/errors and queue depth are served in the
+  Prometheus text format on http://127.0.0.1:METRICS_PORT/metrics (spans on /traces).
+- Importing this module has no side effects: the S3 client, upload engine and
+  indexes are created on first use, and the folder/versioning setup runs once and
+  is then cached locally (see s3_clients.py) instead of costing round trips on
+  every start.
 """
 import os
 import time
-import boto3
-import zipfile
+import threading
 import logging
 from datetime import datetime
-from collections import defaultdict
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import FileSystemEventHandler, FileDeletedEvent, FileModifiedEvent, DirDeletedEvent
 from botocore.exceptions import ClientError, BotoCoreError
+from upload_engine import UploadEngine
+from object_index import ObjectIndex
+from dedup_store import DedupStore
+from event_pipeline import EventPipeline, CoalescingScheduler
+from log_shipper import S3LogShipper
+from stream_backup import upload_backup
+from bulk_ops import DeleteBatcher
+from retention import RetentionPolicy, enforce_retention
+from reconcile import SyncIndex, SYNC_INDEX_NAME, relative_key, scan_local, diff
+from file_state import iter_files
+from s3_clients import get_client, lazy, BootstrapCache, ensure_folder, ensure_versioning
+import metrics
 
 # --- Config ---
 bucket_name = '24030142014'
 watch_folder = '/Volumes/study/cloud web/aws 4th july/'
 log_file_path = os.path.join(watch_folder, 's3_sync.log')
-zip_output_folder = os.path.join(watch_folder, 'zips/')
 s3_base_folder = 'live-sync/'
 backup_folder = s3_base_folder + 'backups/'
-log_s3_key = s3_base_folder + "logs/s3_sync.log"
+log_s3_prefix = s3_base_folder + "logs/"
+reserved_rel_prefixes = ('backups/', 'logs/')
+sync_index_path = os.path.join(watch_folder, SYNC_INDEX_NAME)
 allowed_extensions = ('.pdf', '.jpg', '.jpeg', '.mpeg', '.doc', '.txt', '.py')
+# 'zip' uploads a full ZIP per change; 'dedup' stores only new content-defined chunks
+BACKUP_MODE = 'zip'
+BACKUP_FORMAT = 'zip'      # or 'zstd' (needs the optional 'zstandard' package)
+COMPRESSION_LEVEL = 6
+SYNC_WORKERS = 4           # files synced in parallel
+MAX_PENDING_EVENTS = 1000  # observer blocks (backpressure) beyond this
+STATS_INTERVAL = 30        # seconds between queue depth/lag log lines
+DEBOUNCE_SECONDS = 2.0     # a file must be quiet this long before it is synced
+CHECK_STABLE = True        # also require size/mtime to stop changing
+RETENTION_MAX_VERSIONS = 20   # stored versions kept per backup ZIP
+RETENTION_INTERVAL = 3600     # seconds between retention passes
+METRICS_PORT = 9108           # /metrics and /traces; None disables the endpoint
 
-s3 = boto3.client('s3')
+# --- Shared objects (created on first use, never at import) ---
+@lazy
+def get_object_index():
+    return ObjectIndex()
+
+@lazy
+def get_engine():
+    return UploadEngine(get_client(), index=get_object_index())
+
+@lazy
+def get_dedup_store():
+    return DedupStore(get_client(), bucket_name)
 
 # --- Logging ---
 logger = logging.getLogger("S3Sync")
 logger.setLevel(logging.INFO)
 formatter = logging.Formatter("🔍 %(asctime)s - %(levelname)s: %(message)s", datefmt='%Y-%m-%d %H:%M:%S')
-file_handler = logging.FileHandler(log_file_path)
-file_handler.setFormatter(formatter)
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
-
-# --- Upload Log to S3 ---
-def upload_log_to_s3():
-    try:
-        s3.upload_file(log_file_path, bucket_name, log_s3_key)
-        logger.info(f"📝 Log uploaded to S3: {log_s3_key}")
-    except Exception as e:
-        logger.error(f"❌ Failed to upload log to S3: {e}")
+log_shipper = None
 
-# --- Ensure S3 folders exist ---
-def ensure_s3_folder(key):
+def setup_logging():
+    global log_shipper
+    file_handler = logging.FileHandler(log_file_path)
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+
+    # --- Ship Logs to S3 (batched, off the event path) ---
+    log_shipper = S3LogShipper(get_client(), bucket_name, log_s3_prefix)
+    log_shipper.setFormatter(formatter)
+    logger.addHandler(log_shipper)
+
+# --- One-time S3 setup (skipped on later starts while cached) ---
+def bootstrap(cache=None):
+    cache = cache or BootstrapCache()
+    for key in (log_s3_prefix, backup_folder):
+        try:
+            ensure_folder(get_client(), bucket_name, key, cache, logger)
+        except Exception as e:
+            logger.error(f"❌ Couldn't create S3 folder {key}: {e}")
     try:
-        s3.put_object(Bucket=bucket_name, Key=key)
-        logger.info(f"📁 Ensured S3 folder: {key}")
+        ensure_versioning(get_client(), bucket_name, cache, logger)
     except Exception as e:
-        logger.error(f"❌ Couldn't create S3 folder {key}: {e}")
+        logger.error(f"❌ Couldn't check versioning on bucket {bucket_name}: {e}")
+    cache.close()
 
-ensure_s3_folder(s3_base_folder + 'logs/')
-ensure_s3_folder(s3_base_folder + 'backups/')
+# --- Key mapping ---
+def relative_path(filepath):
+    return relative_key(filepath, watch_folder)
 
-def ensure_bucket_versioning(bucket_name):
-    s3_resource = boto3.resource('s3')
-    bucket_versioning = s3_resource.BucketVersioning(bucket_name)
-    if bucket_versioning.status != 'Enabled':
-        bucket_versioning.enable()
-        logger.info(f"✅ Enabled versioning on bucket: {bucket_name}")
-    else:
-        logger.info(f"ℹ️ Versioning already enabled on bucket: {bucket_name}")
+def is_reserved(rel):
+    # Local folders that would land on top of the backup/log prefixes
+    return rel.startswith(reserved_rel_prefixes)
 
-ensure_bucket_versioning(bucket_name)
+def is_ignored(filepath):
+    # The watcher's own log and sync index live in the watched folder: syncing them
+    # would log a line, which fires another event, which syncs the log again...
+    path = os.path.abspath(filepath)
+    if path in (os.path.abspath(log_file_path), os.path.abspath(sync_index_path)):
+        return True
+    return not filepath.lower().endswith(allowed_extensions)
 
 # --- Handler ---
 class S3SyncHandler(FileSystemEventHandler):
-    def __init__(self):
+    def __init__(self, pipeline, sync_index):
         super().__init__()
-        self.last_event_time = defaultdict(float)
+        self.pipeline = pipeline
+        self.sync_index = sync_index
+        self.scheduler = CoalescingScheduler(self.schedule_sync, quiet=DEBOUNCE_SECONDS,
+                                             check_stable=CHECK_STABLE, logger=logger)
+        self.deleter = DeleteBatcher(get_client(), bucket_name, on_deleted=self.deleted_remote, logger=logger)
 
     def on_modified(self, event):
-        if event.is_directory:
+        if event.is_directory or is_ignored(event.src_path):
             return
+        rel = relative_path(event.src_path)
+        if is_reserved(rel):
+            return
+        self.scheduler.touch(s3_base_folder + rel, event.src_path)
 
-        filepath = event.src_path
-        filename = os.path.basename(filepath)
-        s3_key = s3_base_folder + filename
-        now = time.time()
+    on_created = on_modified
 
-        if now - self.last_event_time[s3_key] < 5:
-            return  # debounce
+    def on_moved(self, event):
+        if event.is_directory:
+            # Some platforms only report the folder: drop the old keys, sync the new tree
+            self.on_deleted(DirDeletedEvent(event.src_path))
+            for _, entry in iter_files(event.dest_path, allowed_extensions):
+                self.on_modified(FileModifiedEvent(entry.path))
+            return
+        self.on_deleted(FileDeletedEvent(event.src_path))
+        self.on_modified(FileModifiedEvent(event.dest_path))
 
-        self.last_event_time[s3_key] = now
-        self.upload_main_and_backup(filepath)
+    def schedule_sync(self, s3_key, filepath):
+        self.pipeline.submit(s3_key, 'modified', self.upload_main_and_backup, filepath)
 
     def upload_main_and_backup(self, filepath):
-        filename = os.path.basename(filepath)
-        name_part, ext = os.path.splitext(filename)
+        rel = relative_path(filepath)
+        name_part, ext = os.path.splitext(rel)
         ext = ext.lower()
 
         if ext not in allowed_extensions:
-            logger.info(f"⏭️ Skipped unsupported file: {filename}")
+            logger.info(f"⏭️ Skipped unsupported file: {rel}")
             return
 
-        if not os.path.exists(filepath):
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
             logger.error(f"❌ File not found: {filepath}")
             return
 
         logger.info(f"➡️ Triggered sync for: {filepath}")
+        # The file is back: make sure a queued delete can't land after this upload
+        self.deleter.discard(s3_base_folder + rel)
+        # A span only: its child stages (upload, backup) carry the latency and bytes metrics
+        with metrics.span('sync_file', key=s3_base_folder + rel, size=st.st_size):
+            self.sync_file(filepath, rel, name_part, st)
 
+    def sync_file(self, filepath, rel, name_part, st):
         # --- Upload main file ---
         try:
-            s3.upload_file(filepath, bucket_name, s3_base_folder + filename)
-            logger.info(f"✅ Uploaded main file → {s3_base_folder + filename}")
+            get_engine().upload(filepath, bucket_name, s3_base_folder + rel)
+            self.sync_index.record(rel, st.st_size, st.st_mtime_ns)
+            logger.info(f"✅ Uploaded main file → {s3_base_folder + rel}")
         except Exception as e:
             logger.error(f"❌ Main file upload failed: {e}")
 
-        # --- Create ZIP ---
-        try:
-            os.makedirs(zip_output_folder, exist_ok=True)
-            zip_name = f"{name_part}.zip"
-            zip_path = os.path.join(zip_output_folder, zip_name)
-
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                zipf.write(filepath, arcname=filename)
-
-            logger.info(f"📦 Created ZIP: {zip_path}")
-        except Exception as e:
-            logger.error(f"❌ ZIP creation failed: {e}")
+        if BACKUP_MODE == 'dedup':
+            try:
+                with metrics.stage('dedup_backup', nbytes=st.st_size, key=rel):
+                    get_dedup_store().backup_file(filepath, name=rel)
+            except Exception as e:
+                logger.error(f"❌ Dedup backup failed: {e}")
             return
 
-        # --- Upload ZIP to S3 ---
+        # --- Compress + upload backup in one streaming pass ---
         try:
-            with open(zip_path, 'rb') as f:
-                s3.put_object(Bucket=bucket_name, Key=backup_folder + zip_name, Body=f)
-            logger.info(f"📤 Uploaded ZIP → S3: {backup_folder + zip_name}")
+            backup_key, size = upload_backup(get_client(), filepath, bucket_name, backup_folder + name_part,
+                                             fmt=BACKUP_FORMAT, level=COMPRESSION_LEVEL)
+            logger.info(f"📤 Uploaded backup → S3: {backup_key} ({size} bytes)")
         except Exception as e:
-            logger.error(f"❌ ZIP upload failed: {e}")
-
-        upload_log_to_s3()
+            logger.error(f"❌ Backup upload failed: {e}")
 
     def on_deleted(self, event):
+        rel = relative_path(event.src_path)
         if event.is_directory:
+            # Some platforms only report the folder; queue whatever we had synced under it
+            with self.sync_index.lock:
+                children = [child for child in self.sync_index.entries if child.startswith(rel + '/')]
+            for child in children:
+                self.on_deleted(FileDeletedEvent(os.path.join(watch_folder, child)))
             return
-        filename = os.path.basename(event.src_path)
-        s3_key = s3_base_folder + filename
-        try:
-            s3.delete_object(Bucket=bucket_name, Key=s3_key)
-            logger.info(f"🗑️ Deleted main file from S3: {s3_key}")
-        except Exception as e:
-            logger.error(f"❌ Failed to delete from S3: {e}")
-        upload_log_to_s3()
+        if is_reserved(rel) or not rel.lower().endswith(allowed_extensions):
+            return
+        s3_key = s3_base_folder + rel
+        self.scheduler.cancel(s3_key)
+        self.pipeline.submit(s3_key, 'deleted', self.delete_main, rel)
+
+    def delete_main(self, rel):
+        self.deleter.add(s3_base_folder + rel)
+
+    def deleted_remote(self, s3_key):
+        self.sync_index.remove(s3_key[len(s3_base_folder):])
+        get_object_index().record_delete(s3_key)
+        logger.info(f"🗑️ Deleted main file from S3: {s3_key}")
+
+# --- Backup Retention ---
+def run_retention():
+    try:
+        policy = RetentionPolicy(max_versions=RETENTION_MAX_VERSIONS)
+        enforce_retention(get_client(), bucket_name, backup_folder, policy, snapshots=False,
+                          index=get_object_index(), logger=logger)
+    except Exception as e:
+        logger.error(f"❌ Retention pass failed: {e}")
+
+# --- Startup Reconciliation ---
+def reconcile(handler, sync_index):
+    """Queue uploads/deletes for whatever changed while the watcher was down."""
+    start = time.time()
+    if not sync_index.loaded:
+        count = sync_index.seed_from_remote(get_client(), bucket_name, s3_base_folder, allowed_extensions,
+                                            skip=(backup_folder, log_s3_prefix))
+        logger.info(f"🗂️ Seeded sync index from S3 listing: {count} object(s)")
+    local = scan_local(watch_folder, allowed_extensions, skip=reserved_rel_prefixes)
+    to_upload, to_delete = diff(local, sync_index)
+    for rel in to_upload:
+        handler.pipeline.submit(s3_base_folder + rel, 'modified', handler.upload_main_and_backup,
+                                os.path.join(watch_folder, rel))
+    for rel in to_delete:
+        handler.pipeline.submit(s3_base_folder + rel, 'deleted', handler.delete_main, rel)
+    logger.info(f"🔁 Reconciled {len(local)} local file(s) in {time.time() - start:.2f}s: "
+                f"{len(to_upload)} to upload, {len(to_delete)} to delete")
 
 # --- Run Watcher ---
 if __name__ == "__main__":
+    setup_logging()
+    bootstrap()
     logger.info(f"🔄 Watching folder: {watch_folder}")
-    event_handler = S3SyncHandler()
+    pipeline = EventPipeline(max_workers=SYNC_WORKERS, max_pending=MAX_PENDING_EVENTS, logger=logger)
+    sync_index = SyncIndex(sync_index_path)
+    event_handler = S3SyncHandler(pipeline, sync_index)
+    metrics.REGISTRY.add_collector('pipeline', pipeline.stats)
+    metrics.REGISTRY.add_collector('debounce', lambda: {'pending': event_handler.scheduler.pending()})
+    metrics.REGISTRY.add_collector('log_shipper', log_shipper.stats)
+    if METRICS_PORT is not None:
+        metrics.serve(METRICS_PORT)
     observer = Observer()
-    observer.schedule(event_handler, watch_folder, recursive=False)
+    observer.schedule(event_handler, watch_folder, recursive=True)
     try:
         observer.start()
+        reconcile(event_handler, sync_index)
+        last_stats = time.time()
+        last_retention = 0
         while True:
             time.sleep(1)
+            if time.time() - last_stats >= STATS_INTERVAL:
+                stats = pipeline.stats()
+                debouncing = event_handler.scheduler.pending()
+                if stats['queue_depth'] or stats['in_flight'] or debouncing:
+                    logger.info(f"📊 Debouncing: {debouncing} | Queue depth: {stats['queue_depth']} | "
+                                f"In flight: {stats['in_flight']} | Oldest wait: {stats['oldest_wait_seconds']}s")
+                sync_index.save()
+                last_stats = time.time()
+            if BACKUP_MODE == 'zip' and time.time() - last_retention >= RETENTION_INTERVAL:
+                threading.Thread(target=run_retention, name="retention", daemon=True).start()
+                last_retention = time.time()
     except KeyboardInterrupt:
         observer.stop()
         logger.info("🛑 Sync stopped.")
     observer.join()
+    event_handler.scheduler.stop()
+    pipeline.stop()
+    event_handler.deleter.close()
+    sync_index.save()
+    log_shipper.close()
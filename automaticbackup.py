@@ -1,65 +1,279 @@
 """
 Periodically (every BACKUP_INTERVAL seconds) backs up all supported files from a local folder to S3.
 - Each backup is stored in a timestamped S3 folder under 'auto-backups/'.
+- Incremental mode uploads only new/changed files (tracked in a local manifest) and
+  writes a per-snapshot '_index.json' pointing unchanged files at earlier snapshots.
+- Old snapshots are thinned by a retention policy (last N, hourly, daily, weekly)
+  every RETENTION_INTERVAL seconds; see retention.py.
 - Logs upload results and errors.
+- Dedup mode only re-chunks files whose content changed (stat check, then hash,
+  via a local manifest), keeps DEDUP_MAX_VERSIONS manifests per file and drops
+  chunks nothing references any more on each retention pass.
+- Copy mode builds self-contained snapshots inside S3: files whose content (size +
+  ETag) already exists in the previous snapshot or COPY_SOURCE_PREFIXES are copied
+  server-side; only new content is uploaded.
+- Each run is a journaled transfer job: if the script dies mid-run, the next run
+  resumes the same snapshot, skipping uploaded files and continuing multipart
+  uploads from their last part. Stale multipart uploads are aborted.
+- Backup run/upload timings, per-file queue wait and S3 retries/errors are served
+  on http://127.0.0.1:METRICS_PORT/metrics.
+- Nothing runs at import: the S3 client, journal and indexes are created on first use.
 - Designed to run continuously as an auto-backup cronjob.
 """
-import boto3
 import os
 import time
 import logging
 from datetime import datetime
 from botocore.exceptions import BotoCoreError, ClientError
-
-# --- Logging Setup ---
-logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+from object_index import ObjectIndex
+from backup_manifest import BackupManifest, MANIFEST_NAME, snapshot_entry, write_snapshot_index
+from dedup_store import DedupStore
+from retention import RetentionPolicy, enforce_retention
+from transfer_jobs import TransferJournal, ResumableUploader, JOURNAL_NAME, cleanup_stale_uploads
+from file_state import iter_files, FileScanner, FILE_STATE_CACHE_NAME, remote_state
+from snapshot_copy import content_sources, copy_many, previous_snapshot
+from s3_clients import get_client, lazy
+import metrics
 
 # --- Config ---
-s3 = boto3.client('s3')
 bucket_name = '24030142014'
 local_folder = '/Volumes/study/cloud web/aws 4th july/'
 backup_prefix = 'auto-backups/'
 allowed_extensions = ('.pdf', '.jpg', '.jpeg', '.mpeg', '.doc', '.txt')
+manifest_path = os.path.join(local_folder, MANIFEST_NAME)
+dedup_manifest_path = os.path.join(local_folder, '.dedup_backup_manifest.json')
+BACKUP_JOB = 'auto-backup'
+
+# 'incremental' uploads only new/changed files and indexes the rest; 'full' re-uploads everything;
+# 'copy' makes full snapshots with server-side copies of content already in the bucket;
+# 'dedup' stores each file as content-defined chunks shared across all versions
+BACKUP_MODE = 'incremental'
+COPY_SOURCE_PREFIXES = ('documents/', 'live-sync/')  # besides the previous snapshot
+MAX_BANDWIDTH = None  # bytes/sec shared by all uploads; None = unlimited
 
 # Backup interval (in seconds) — 3600 = every 1 hour
 BACKUP_INTERVAL = 120  # Change to e.g., 600 for every 10 minutes
 
-def run_backup():
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    s3_backup_folder = f"{backup_prefix}{timestamp}/"
+# --- Retention ---
+RETENTION_POLICY = RetentionPolicy(keep_last=5, hourly=24, daily=7, weekly=4, max_versions=10)
+RETENTION_INTERVAL = 3600  # seconds between retention passes
+RETENTION_DRY_RUN = False  # True only logs what would be deleted
+DEDUP_MAX_VERSIONS = 10    # dedup manifests kept per file
+
+METRICS_PORT = 9109  # /metrics and /traces; None disables the endpoint
+
+# --- Shared objects (created on first use, never at import) ---
+@lazy
+def get_object_index():
+    return ObjectIndex()
+
+@lazy
+def get_dedup_store():
+    store = DedupStore(get_client(), bucket_name)
+    store.load_known_chunks()  # once per process, not once per cycle
+    return store
+
+@lazy
+def get_journal():
+    return TransferJournal(os.path.join(local_folder, JOURNAL_NAME))
+
+@lazy
+def get_uploader():
+    return ResumableUploader(get_client(), bucket_name, get_journal(), max_bandwidth=MAX_BANDWIDTH,
+                             index=get_object_index())
+
+def backup_candidates():
+    # scandir already knows each entry's type: no isfile() call per file
+    for file, entry in iter_files(local_folder, allowed_extensions, recursive=False):
+        yield file, entry.path
+
+def run_full_backup(s3_backup_folder):
     files_uploaded = 0
+    get_client().put_object(Bucket=bucket_name, Key=s3_backup_folder)
+
+    jobs = ((full_path, s3_backup_folder + file) for file, full_path in backup_candidates())
+    for result in get_uploader().upload_many(BACKUP_JOB, jobs):
+        file = os.path.basename(result.path)
+        if result.error:
+            logging.error(f"❌ Failed to upload '{file}': {result.error}")
+        else:
+            logging.info(f"✅ Uploaded: {file} → {result.key}")
+            files_uploaded += 1
+
+    if files_uploaded == 0:
+        logging.warning("⚠️ No valid files found to upload.")
+    else:
+        logging.info(f"✅ Backup completed. {files_uploaded} file(s) uploaded.\n")
 
+def run_copy_backup(s3_backup_folder):
+    s3 = get_client()
+    scanner = FileScanner(os.path.join(local_folder, FILE_STATE_CACHE_NAME))
     try:
-        s3.put_object(Bucket=bucket_name, Key=s3_backup_folder)
-        logging.info(f"\n🕒 Starting backup at {timestamp}")
-        logging.info(f"📁 S3 folder: {s3_backup_folder}")
-
-        for file in os.listdir(local_folder):
-            full_path = os.path.join(local_folder, file)
-
-            if os.path.isfile(full_path) and file.lower().endswith(allowed_extensions):
-                s3_key = s3_backup_folder + file
-                try:
-                    s3.upload_file(full_path, bucket_name, s3_key)
-                    logging.info(f"✅ Uploaded: {file} → {s3_key}")
-                    files_uploaded += 1
-                except (ClientError, BotoCoreError) as e:
-                    logging.error(f"❌ Failed to upload '{file}': {e}")
-
-        if files_uploaded == 0:
-            logging.warning("⚠️ No valid files found to upload.")
+        states = scanner.hash(scanner.scan(local_folder, allowed_extensions, recursive=False))
+    finally:
+        scanner.close()
+    if not states:
+        logging.warning("⚠️ No valid files found to back up.")
+        return
+
+    # --- 1. Match local content against what the bucket already holds
+    previous = previous_snapshot(s3, bucket_name, backup_prefix, s3_backup_folder)
+    sources = content_sources(s3, bucket_name, ([previous] if previous else []) + list(COPY_SOURCE_PREFIXES))
+    existing = remote_state(s3, bucket_name, s3_backup_folder)  # a resumed run may be half done
+    copies, uploads, files_present = [], [], 0
+    for state in states:
+        if state.etag and existing.get(state.rel) == (state.size, state.etag):
+            files_present += 1
+        elif state.etag and (state.size, state.etag) in sources:
+            copies.append((sources[(state.size, state.etag)], s3_backup_folder + state.rel, state.size, state.etag))
         else:
-            logging.info(f"✅ Backup completed. {files_uploaded} file(s) uploaded.\n")
+            uploads.append(state)
+
+    # --- 2. Copy known content inside S3; fall back to uploading if a copy fails
+    copied = copied_bytes = 0
+    by_key = {s3_backup_folder + state.rel: state for state in states}
+    for result in copy_many(s3, bucket_name, copies):
+        if result.error:
+            logging.warning(f"⚠️ Server-side copy of {result.source} failed, uploading instead: {result.error}")
+            uploads.append(by_key[result.key])
+            continue
+        copied += 1
+        copied_bytes += result.size
+
+    # --- 3. Upload only new content
+    files_uploaded = uploaded_bytes = 0
+    jobs = ((state.path, s3_backup_folder + state.rel) for state in uploads)
+    for result in get_uploader().upload_many(BACKUP_JOB, jobs):
+        if result.error:
+            logging.error(f"❌ Failed to upload '{os.path.basename(result.path)}': {result.error}")
+            continue
+        logging.info(f"✅ Uploaded: {os.path.basename(result.path)} → {result.key}")
+        files_uploaded += 1
+        uploaded_bytes += result.size
 
+    logging.info(f"✅ Backup completed. {copied} file(s) copied server-side ({copied_bytes} bytes), "
+                 f"{files_uploaded} uploaded ({uploaded_bytes} bytes)"
+                 + (f", {files_present} already in place" if files_present else "") + ".\n")
+
+def run_incremental_backup(s3_backup_folder):
+    manifest = BackupManifest(manifest_path)
+    index = {}
+    changed = {}
+    files_uploaded = 0
+
+    # --- 1. Stat every file; hash only those whose size/mtime moved
+    for file, full_path in backup_candidates():
+        st = os.stat(full_path)
+        is_changed, sha = manifest.check(file, full_path, st)
+        if is_changed:
+            changed[full_path] = (file, st, sha)
+        else:
+            index[file] = snapshot_entry(manifest.entries[file])
+    present = set(index) | {file for file, _, _ in changed.values()}
+
+    # --- 2. Upload only new or changed files into this snapshot
+    jobs = ((full_path, s3_backup_folder + file) for full_path, (file, _, _) in changed.items())
+    for result in get_uploader().upload_many(BACKUP_JOB, jobs):
+        file, st, sha = changed[result.path]
+        if result.error:
+            logging.error(f"❌ Failed to upload '{file}': {result.error}")
+            continue
+        manifest.record(file, result.path, st, sha, result.key)
+        index[file] = snapshot_entry(manifest.entries[file])
+        logging.info(f"✅ Uploaded: {file} → {result.key}")
+        files_uploaded += 1
+
+    # --- 3. Write the snapshot index and persist the manifest
+    if not index:
+        logging.warning("⚠️ No valid files found to back up.")
+        return
+    manifest.prune(present)
+    write_snapshot_index(get_client(), bucket_name, s3_backup_folder, index)
+    manifest.save()
+    logging.info(f"✅ Backup completed. {files_uploaded} file(s) uploaded, "
+                 f"{len(index) - files_uploaded} unchanged file(s) referenced from earlier snapshots.\n")
+
+def run_dedup_backup():
+    manifest = BackupManifest(dedup_manifest_path)
+    present = []
+    files_backed_up = files_unchanged = bytes_uploaded = 0
+    for file, full_path in backup_candidates():
+        try:
+            st = os.stat(full_path)
+            present.append(file)
+            # Stat first, hash only if that moved: unchanged files aren't re-chunked
+            changed, sha = manifest.check(file, full_path, st)
+            if not changed:
+                files_unchanged += 1
+                continue
+            with metrics.stage('dedup_backup', nbytes=st.st_size, key=file):
+                manifest_key, stats = get_dedup_store().backup_file(full_path, name=file)
+            manifest.record(file, full_path, st, sha, manifest_key)
+            bytes_uploaded += stats['bytes_uploaded']
+            files_backed_up += 1
+        except (ClientError, BotoCoreError, OSError) as e:
+            logging.error(f"❌ Failed to back up '{file}': {e}")
+    manifest.prune(present)
+    manifest.save()
+
+    if not present:
+        logging.warning("⚠️ No valid files found to back up.")
+    else:
+        logging.info(f"✅ Dedup backup completed. {files_backed_up} file(s), {bytes_uploaded} bytes uploaded, "
+                     f"{files_unchanged} unchanged.\n")
+
+def run_backup():
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+    try:
+        logging.info(f"\n🕒 Starting backup at {timestamp}")
+        with metrics.stage('backup_run', mode=BACKUP_MODE):
+            if BACKUP_MODE == 'dedup':
+                run_dedup_backup()
+                return
+            journal = get_journal()
+            # An unfinished job from a crashed run keeps its snapshot folder
+            s3_backup_folder, resumed = journal.start_job(BACKUP_JOB, f"{backup_prefix}{timestamp}/")
+            if resumed:
+                logging.info(f"⏯️ Resuming interrupted backup into {s3_backup_folder}")
+            cleanup_stale_uploads(get_client(), bucket_name, backup_prefix, journal)
+            logging.info(f"📁 S3 folder: {s3_backup_folder}")
+            if BACKUP_MODE == 'incremental':
+                run_incremental_backup(s3_backup_folder)
+            elif BACKUP_MODE == 'copy':
+                run_copy_backup(s3_backup_folder)
+            else:
+                run_full_backup(s3_backup_folder)
+            journal.finish_job(BACKUP_JOB)
     except Exception as e:
         logging.critical(f"🛑 Backup failed: {e}")
 
+def run_retention():
+    try:
+        if BACKUP_MODE == 'dedup':
+            store = get_dedup_store()
+            pruned = store.prune_manifests(DEDUP_MAX_VERSIONS)
+            collected = store.collect_garbage()
+            logging.info(f"🧹 Dedup retention: {pruned} old manifest(s), {collected} unused chunk(s) deleted")
+            return
+        enforce_retention(get_client(), bucket_name, backup_prefix, RETENTION_POLICY,
+                          dry_run=RETENTION_DRY_RUN, index=get_object_index(), logger=logging.getLogger())
+    except Exception as e:
+        logging.error(f"❌ Retention pass failed: {e}")
+
 # --- Run forever with interval ---
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
     logging.info("🔄 Auto-backup script started. Press Ctrl+C to stop.")
+    if METRICS_PORT is not None:
+        metrics.serve(METRICS_PORT)
+    last_retention = 0
     try:
         while True:
             run_backup()
+            if time.time() - last_retention >= RETENTION_INTERVAL:
+                run_retention()
+                last_retention = time.time()
             time.sleep(BACKUP_INTERVAL)
     except KeyboardInterrupt:
         logging.info("🛑 Auto-backup script stopped manually.")
@@ -0,0 +1,90 @@
+"""
+Local manifest and per-snapshot index for incremental backups.
+- The manifest persists path, size, mtime, content hash and last uploaded key per file.
+- Files are only re-hashed when their size or mtime changes.
+- Each snapshot gets a small '_index.json' mapping every file to the object holding
+  its bytes, so unchanged files point back at earlier snapshots instead of being re-uploaded.
+- restore_snapshot() rebuilds a full snapshot from its index.
+"""
+import os
+import json
+import hashlib
+import logging
+
+MANIFEST_NAME = '.auto_backup_manifest.json'
+SNAPSHOT_INDEX_NAME = '_index.json'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# --- Manifest ---
+class BackupManifest:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Ignoring unreadable manifest {path}: {e}")
+
+    def check(self, name, full_path, st):
+        """Return (changed, sha256) for a file, hashing only when stat data moved."""
+        entry = self.entries.get(name)
+        if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+            return False, entry['sha256']
+        sha = file_sha256(full_path)
+        if entry and entry['sha256'] == sha:
+            # Touched but identical: refresh stat data, keep pointing at the old object
+            entry['size'], entry['mtime'] = st.st_size, st.st_mtime
+            return False, sha
+        return True, sha
+
+    def record(self, name, full_path, st, sha, key):
+        self.entries[name] = {
+            'path': full_path,
+            'size': st.st_size,
+            'mtime': st.st_mtime,
+            'sha256': sha,
+            'key': key
+        }
+
+    def prune(self, names):
+        for name in set(self.entries) - set(names):
+            del self.entries[name]
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+# --- Snapshot Index ---
+def snapshot_entry(entry):
+    return {'key': entry['key'], 'size': entry['size'], 'sha256': entry['sha256']}
+
+def write_snapshot_index(client, bucket, snapshot_prefix, index):
+    client.put_object(
+        Bucket=bucket,
+        Key=snapshot_prefix + SNAPSHOT_INDEX_NAME,
+        Body=json.dumps(index, indent=1).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+def read_snapshot_index(client, bucket, snapshot_prefix):
+    obj = client.get_object(Bucket=bucket, Key=snapshot_prefix + SNAPSHOT_INDEX_NAME)
+    return json.loads(obj['Body'].read())
+
+def restore_snapshot(client, bucket, snapshot_prefix, dest_folder):
+    index = read_snapshot_index(client, bucket, snapshot_prefix)
+    os.makedirs(dest_folder, exist_ok=True)
+    for name, entry in index.items():
+        client.download_file(bucket, entry['key'], os.path.join(dest_folder, name))
+        logging.info(f"📥 Restored: {entry['key']} → {name}")
+    return len(index)
@@ -0,0 +1,94 @@
+"""
+Benchmarks the deduplicating backup store against full-ZIP backups.
+- Builds a realistic text document and applies a series of typical edits
+  (append, insert in the middle, small overwrite, block delete).
+- Backs up every version with DedupStore into the in-memory LocalS3 stand-in.
+- Reports the dedup ratio and the upload bytes saved versus one ZIP per version.
+- Verifies that the last version restores byte-for-byte.
+"""
+import io
+import os
+import random
+import zipfile
+import logging
+import tempfile
+from dedup_store import DedupStore
+from local_s3 import LocalS3
+
+DOC_SIZE = 4 * 1024 * 1024
+BUCKET = 'bench-bucket'
+WORDS = ("sync backup bucket version upload chunk folder archive restore file "
+         "the a of to and in is for on with as by at from this that").split()
+
+def make_document(rng, size):
+    out = io.StringIO()
+    written = 0
+    while written < size:
+        line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))) + '.\n'
+        out.write(line)
+        written += len(line)
+    return out.getvalue().encode('utf-8')[:size]
+
+def edit_patterns(rng, doc):
+    yield 'original', doc
+    doc = doc + make_document(rng, 20 * 1024)
+    yield 'append 20 KiB', doc
+    mid = len(doc) // 2
+    doc = doc[:mid] + make_document(rng, 3 * 1024) + doc[mid:]
+    yield 'insert 3 KiB in middle', doc
+    pos = len(doc) // 3
+    doc = doc[:pos] + b'X' * 500 + doc[pos + 500:]
+    yield 'overwrite 500 B', doc
+    pos = len(doc) // 4
+    doc = doc[:pos] + doc[pos + 64 * 1024:]
+    yield 'delete 64 KiB block', doc
+    for i in range(5):
+        pos = rng.randrange(len(doc))
+        doc = doc[:pos] + b'edit %d ' % i + doc[pos:]
+        yield f'small edit #{i + 1}', doc
+
+def zip_size(name, data):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr(name, data)
+    return buf.tell()
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(42)
+    client = LocalS3()
+    store = DedupStore(client, BUCKET)
+
+    logical = zip_total = dedup_total = 0
+    last_manifest = last_data = None
+    print(f"{'version':<26}{'size':>10}{'zip bytes':>12}{'dedup bytes':>13}{'new/all chunks':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'report.txt')
+        for label, data in edit_patterns(rng, make_document(rng, DOC_SIZE)):
+            with open(path, 'wb') as f:
+                f.write(data)
+            manifest_key, stats = store.backup_file(path)
+            zipped = zip_size('report.txt', data)
+            logical += len(data)
+            zip_total += zipped
+            dedup_total += stats['bytes_uploaded']
+            last_manifest, last_data = manifest_key, data
+            print(f"{label:<26}{len(data):>10}{zipped:>12}{stats['bytes_uploaded']:>13}"
+                  f"{stats['new_chunks']:>8}/{stats['chunks']:<7}")
+
+        restored = os.path.join(tmp, 'restored.txt')
+        store.restore(last_manifest, restored)
+        with open(restored, 'rb') as f:
+            assert f.read() == last_data, "restore mismatch"
+
+    stored = sum(len(obj['body']) for (_, key), obj in client.objects.items() if '/chunks/' in key)
+    print()
+    print(f"Logical bytes backed up : {logical}")
+    print(f"Full-ZIP upload bytes   : {zip_total}")
+    print(f"Dedup upload bytes      : {dedup_total}")
+    print(f"Upload bytes saved      : {zip_total - dedup_total} ({100 * (1 - dedup_total / zip_total):.1f}%)")
+    print(f"Dedup ratio             : {logical / stored:.2f}x (logical / stored chunk bytes)")
+    print("Restore of last version : OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmarks batched log shipping against re-uploading the whole log per event.
+- Simulates sync events, each writing a few log lines like the watcher does.
+- 'per-event upload' re-uploads the full, growing log after every event (old behaviour).
+- 'batched shipper' uses S3LogShipper with the LocalS3 stand-in.
+- Prints upload bytes per event in windows so you can see one grow and the other stay flat.
+"""
+import logging
+from local_s3 import LocalS3
+from log_shipper import S3LogShipper
+
+EVENTS = 20000
+WINDOW = 2000
+BUCKET = 'bench-bucket'
+
+def event_lines(i):
+    name = f"document_{i % 500}.txt"
+    return [
+        f"🔍 2025-07-04 16:25:45 - INFO: ➡️ Triggered sync for: /Volumes/study/cloud web/{name}",
+        f"🔍 2025-07-04 16:25:45 - INFO: ✅ Uploaded main file → live-sync/{name}",
+        f"🔍 2025-07-04 16:25:46 - INFO: 📦 Created ZIP: zips/{name}.zip",
+        f"🔍 2025-07-04 16:25:46 - INFO: 📤 Uploaded ZIP → S3: live-sync/backups/{name}.zip",
+    ]
+
+def main():
+    client = LocalS3()
+    shipper = S3LogShipper(client, BUCKET, 'live-sync/logs/', flush_interval=3600)
+    shipper.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger('bench-log-shipping')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(shipper)
+
+    log_size = 0
+    window_old = window_new = 0
+    print(f"{'events':>10}{'log size':>12}{'per-event upload B/event':>28}{'batched shipper B/event':>26}")
+    for i in range(1, EVENTS + 1):
+        before = client.bytes_uploaded
+        for line in event_lines(i):
+            logger.info(line)
+            log_size += len(line.encode('utf-8')) + 1
+        if shipper.buffered_bytes >= shipper.flush_bytes:
+            shipper.ship()  # flush inline so bytes land in this event's window
+        window_new += client.bytes_uploaded - before
+        window_old += log_size  # the old code uploaded the full log each time
+        if i % WINDOW == 0:
+            print(f"{i:>10}{log_size:>12}{window_old / WINDOW:>28.0f}{window_new / WINDOW:>26.1f}")
+            window_old = window_new = 0
+
+    shipper.close()
+    print()
+    print(f"Segments written: {shipper.segments_uploaded}, total shipped bytes: {shipper.bytes_uploaded}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmarks the retention engine on synthetic version histories.
+- Builds a week of incremental snapshots (one every 2 minutes, like automaticbackup.py)
+  and a set of watcher ZIP backups with long noncurrent-version histories, in a
+  versioned LocalS3 stand-in.
+- Plans retention from one list_object_versions walk per root, applies it in
+  batched deletes, and reports walk/plan/apply time and request counts.
+- Verifies that every kept snapshot still restores (all '_index.json' targets exist)
+  and that no key keeps more versions than the policy allows.
+"""
+import json
+import time
+import random
+import logging
+from datetime import datetime, timedelta
+from local_s3 import LocalS3
+from retention import RetentionPolicy, plan_retention, apply_plan, SNAPSHOT_TIME_FORMAT
+from bulk_ops import DELETE_BATCH_SIZE
+
+BUCKET = 'bench-bucket'
+SNAPSHOT_ROOT = 'auto-backups/'
+ZIP_ROOT = 'live-sync/backups/'
+SNAPSHOT_DAYS = 7
+SNAPSHOT_EVERY = timedelta(minutes=2)
+FILES = 20
+ZIP_FILES = 300
+MAX_ZIP_VERSIONS = 80
+POLICY = RetentionPolicy(keep_last=5, hourly=24, daily=7, weekly=4, max_versions=10)
+
+def build_snapshots(client, rng):
+    """Incremental snapshots: each uploads one changed file and indexes the rest."""
+    latest = {}
+    when = datetime(2025, 7, 1)
+    count = int(timedelta(days=SNAPSHOT_DAYS) / SNAPSHOT_EVERY)
+    for i in range(count):
+        prefix = f"{SNAPSHOT_ROOT}{when.strftime(SNAPSHOT_TIME_FORMAT)}/"
+        client.put_object(Bucket=BUCKET, Key=prefix)
+        changed = [f"file{n:02d}.txt" for n in range(FILES)] if i == 0 else [f"file{rng.randrange(FILES):02d}.txt"]
+        for name in changed:
+            body = b'x' * rng.randint(1000, 50000)
+            client.put_object(Bucket=BUCKET, Key=prefix + name, Body=body)
+            latest[name] = {'key': prefix + name, 'size': len(body), 'sha256': ''}
+        client.put_object(Bucket=BUCKET, Key=prefix + '_index.json', Body=json.dumps(latest))
+        when += SNAPSHOT_EVERY
+    return count
+
+def build_zip_versions(client, rng):
+    versions = 0
+    for n in range(ZIP_FILES):
+        key = f"{ZIP_ROOT}doc{n:03d}.zip"
+        for _ in range(rng.randint(1, MAX_ZIP_VERSIONS)):
+            client.put_object(Bucket=BUCKET, Key=key, Body=b'z' * rng.randint(500, 5000))
+            versions += 1
+        if rng.random() < 0.1:
+            client.delete_object(Bucket=BUCKET, Key=key)  # file deleted locally: delete marker on top
+    return versions
+
+def run(client, root, snapshots):
+    client.calls.clear()
+    plan = plan_retention(client, BUCKET, root, POLICY, snapshots)
+    list_calls = client.calls['ListObjectVersions']
+    start = time.monotonic()
+    report = apply_plan(client, BUCKET, plan)
+    apply_time = time.monotonic() - start
+    print(f"\n{root}")
+    print(f"  Versions walked        : {plan.versions_seen} in {list_calls} list call(s)")
+    print(f"  Plan time              : {plan.elapsed:.2f}s")
+    if snapshots:
+        print(f"  Snapshots kept/expired : {len(plan.kept_snapshots)}/{len(plan.expired_snapshots)}")
+        print(f"  Referenced, kept       : {plan.protected}")
+    print(f"  Versions deleted       : {report.succeeded} ({plan.bytes_reclaimed} bytes), {len(report.failed)} failed")
+    print(f"  Delete requests        : {client.calls['DeleteObjects']} batched "
+          f"(vs {len(plan.deletions)} single deletes; batch size {DELETE_BATCH_SIZE})")
+    print(f"  Apply time             : {apply_time:.2f}s")
+    return plan
+
+def verify(client, plan):
+    for name in plan.kept_snapshots:
+        prefix = f"{SNAPSHOT_ROOT}{name}/"
+        index = json.loads(client.get_object(Bucket=BUCKET, Key=prefix + '_index.json')['Body'].read())
+        for entry in index.values():
+            client.head_object(Bucket=BUCKET, Key=entry['key'])  # raises if a referenced object is gone
+    worst = max(sum(1 for v in history if not v.get('marker'))
+                for (_, key), history in client.versions.items())
+    assert worst <= POLICY.max_versions, worst
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(7)
+    client = LocalS3(versioned=True)
+    snapshots = build_snapshots(client, rng)
+    zip_versions = build_zip_versions(client, rng)
+    print(f"Synthetic history: {snapshots} snapshots under {SNAPSHOT_ROOT}, "
+          f"{zip_versions} ZIP versions of {ZIP_FILES} files under {ZIP_ROOT}")
+    print(f"Policy: {POLICY}")
+
+    snapshot_plan = run(client, SNAPSHOT_ROOT, True)
+    run(client, ZIP_ROOT, False)
+    verify(client, snapshot_plan)
+    print("\nKept snapshots restore, version cap holds : OK")
+
+if __name__ == "__main__":
+    main()
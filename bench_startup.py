@@ -0,0 +1,119 @@
+"""
+Cold-start benchmark for the sync/backup scripts.
+- import: wall time to import each script in a fresh interpreter (best of
+  IMPORT_RUNS), whether that pulled in boto3, and how many S3 clients it created.
+- client: building the shared S3 client on first use, then fetching it again.
+- bootstrap: the watcher's start-up setup (two folder markers + a versioning check)
+  against a LocalS3 stand-in that sleeps ROUND_TRIP seconds per request. "every
+  start" is the old sequence run unconditionally; "cold"/"warm" go through a fresh
+  and an already filled BootstrapCache.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from local_s3 import LocalS3
+from s3_clients import get_client, BootstrapCache, ensure_folder, ensure_versioning
+
+MODULES = ('upload_engine', 'auto_sync_on_change', 'automaticbackup', 'supportfile', 'bucketchecker', 'crud')
+IMPORT_RUNS = 5
+ROUND_TRIP = 0.03  # seconds, a typical S3 request from outside the region
+BUCKET = 'bench-bucket'
+FOLDERS = ('live-sync/logs/', 'live-sync/backups/')
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+import s3_clients
+print(elapsed, 'boto3' in sys.modules, len(s3_clients._clients))
+"""
+
+class SlowClient:
+    """Adds a fixed round trip to every call of the wrapped client."""
+
+    def __init__(self, client, delay):
+        self.client = client
+        self.delay = delay
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self.delay)
+            return attr(*args, **kwargs)
+        return call
+
+def import_cost(module):
+    best = None
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    here = os.path.dirname(os.path.abspath(__file__))
+    for _ in range(IMPORT_RUNS):
+        out = subprocess.run([sys.executable, '-c', IMPORT_PROBE.format(module=module)], cwd=here, env=env,
+                             capture_output=True, text=True)
+        if out.returncode:
+            return None, out.stderr.strip().splitlines()[-1]
+        elapsed, boto3_loaded, clients = out.stdout.split()
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+    return best, f"boto3 loaded: {boto3_loaded}, clients: {clients}"
+
+def every_start(client):
+    for key in FOLDERS:
+        client.put_object(Bucket=BUCKET, Key=key)
+    if client.get_bucket_versioning(Bucket=BUCKET).get('Status') != 'Enabled':
+        client.put_bucket_versioning(Bucket=BUCKET, VersioningConfiguration={'Status': 'Enabled'})
+
+def cached_start(client, cache):
+    for key in FOLDERS:
+        ensure_folder(client, BUCKET, key, cache)
+    ensure_versioning(client, BUCKET, cache)
+
+def timed_start(label, fn, local):
+    before = sum(local.calls.values())
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34}{elapsed * 1000:>9.1f} ms{sum(local.calls.values()) - before:>5} request(s)")
+
+def main():
+    print("--- import (fresh interpreter) ---")
+    for module in MODULES:
+        elapsed, detail = import_cost(module)
+        if elapsed is None:
+            print(f"{module:<34}  failed: {detail}")
+        else:
+            print(f"{module:<34}{elapsed * 1000:>9.1f} ms  ({detail})")
+
+    print("\n--- shared client ---")
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    start = time.perf_counter()
+    first = get_client()
+    print(f"{'get_client() first call':<34}{(time.perf_counter() - start) * 1000:>9.1f} ms")
+    start = time.perf_counter()
+    again = get_client()
+    print(f"{'get_client() again':<34}{(time.perf_counter() - start) * 1000:>9.3f} ms  (same client: {first is again})")
+
+    print(f"\n--- bootstrap ({ROUND_TRIP * 1000:.0f} ms per request) ---")
+    local = LocalS3()
+    client = SlowClient(local, ROUND_TRIP)
+    timed_start("every start (old)", lambda: every_start(client), local)
+    cache_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        local.versioned = False
+        cache = BootstrapCache(os.path.join(cache_dir, 'bootstrap.sqlite'))
+        timed_start("cold cache (first start)", lambda: cached_start(client, cache), local)
+        cache.close()
+        for run in range(1, 3):
+            cache = BootstrapCache(os.path.join(cache_dir, 'bootstrap.sqlite'))
+            timed_start(f"warm cache (start {run + 1})", lambda: cached_start(client, cache), local)
+            cache.close()
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
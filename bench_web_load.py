@@ -0,0 +1,112 @@
+"""
+Load test for the web demo's list and download endpoints against the local S3 stand-in.
+- LocalS3 is wrapped so every call costs S3_LATENCY seconds and holds one of a
+  limited number of pooled connections (like botocore's max_pool_connections).
+- Three setups are compared at the same client concurrency:
+  one sync worker (single-threaded server, default 10-connection pool),
+  the old dev server (threaded, default 10-connection pool),
+  and serve.py's mode (threaded, pool sized to WEB_THREADS).
+- The local index and object cache are switched off so every request reaches "S3".
+- Reports requests/sec and p50/p95 latency per endpoint.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.update(S3_BUCKET='bench-bucket', S3_LOCAL_INDEX='0', S3_OBJECT_CACHE_BYTES='0')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'webdemo'))
+
+from werkzeug.serving import make_server
+from local_s3 import LocalS3, LocalPaginator
+import app as webdemo
+
+S3_LATENCY = 0.02      # seconds per S3 call
+CLIENTS = 32           # concurrent HTTP clients
+DURATION = 3           # seconds per endpoint
+DEFAULT_POOL = 10      # botocore's default max_pool_connections
+WEB_THREADS = 32
+ENDPOINTS = {
+    'list': '/api/list-files?prefix=docs/&page_size=100',
+    'download': '/api/download?key=docs/file0007.txt',
+}
+
+class SlowPooledClient:
+    """Adds per-call latency and a connection-pool limit to a LocalS3 client."""
+
+    def __init__(self, client, latency, pool_size):
+        self.client = client
+        self.latency = latency
+        self.pool = threading.BoundedSemaphore(pool_size)
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            with self.pool:
+                time.sleep(self.latency)
+                return method(*args, **kwargs)
+        return call
+
+    def get_paginator(self, operation):
+        return LocalPaginator(getattr(self, operation))
+
+def load(port, path):
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + DURATION
+
+    def client():
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            conn.close()
+            assert resp.status == 200, resp.status
+            with lock:
+                latencies.append(time.monotonic() - start)
+
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        for _ in range(CLIENTS):
+            pool.submit(client)
+    latencies.sort()
+    return (len(latencies) / DURATION, latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.95)] * 1000)
+
+def run(label, local, threaded, pool_size):
+    webdemo.s3 = SlowPooledClient(local, S3_LATENCY, pool_size)
+    server = make_server('127.0.0.1', 0, webdemo.app, threaded=threaded)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    results = {}
+    try:
+        for name, path in ENDPOINTS.items():
+            results[name] = load(server.server_port, path)
+    finally:
+        server.shutdown()
+    for name, (rps, p50, p95) in results.items():
+        print(f"{label:<34}{name:<10}{rps:>10.1f}{p50:>10.1f}{p95:>10.1f}")
+    return results
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    local = LocalS3()
+    for i in range(500):
+        local.put_object(Bucket='bench-bucket', Key=f'docs/file{i:04d}.txt', Body=b'x' * 32 * 1024)
+    print(f"S3 latency {S3_LATENCY * 1000:.0f} ms/call, {CLIENTS} concurrent clients, {DURATION}s per endpoint\n")
+    print(f"{'setup':<34}{'endpoint':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    sync = run('sync worker, pool 10', local, False, DEFAULT_POOL)
+    run('dev server (threaded), pool 10', local, True, DEFAULT_POOL)
+    served = run(f'serve.py (threaded), pool {WEB_THREADS}', local, True, WEB_THREADS)
+    print()
+    for name in ENDPOINTS:
+        print(f"{name}: {served[name][0] / sync[name][0]:.1f}x the requests/sec of one sync worker")
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,48 @@
 """
-Lists all folders and their contents in a specified S3 bucket.
-- Shows top-level folders and their files.
-- Also lists files directly under the bucket root.
+Inventories every object in a specified S3 bucket.
+- Splits the bucket into prefix shards (top-level folders, optionally deeper / by key range)
+  and lists them concurrently with full pagination, so large folders aren't truncated.
+- Logs per-folder totals: object count, bytes, oldest and newest object.
+- Writes the full object list (CSV, or Parquet if the path ends in .parquet) and a summary CSV.
 - Logs all output and handles AWS errors.
 """
-import boto3
+import time
 import logging
 from botocore.exceptions import ClientError, BotoCoreError
-
-# --- Logging Setup ---
-logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+from s3_clients import get_client
+from inventory import run_inventory, MAX_WORKERS
 
 # --- Config ---
-s3 = boto3.client('s3')
 bucket_name = '24030142014'
-
-try:
-    logging.info(f"📂 Listing folders and contents in bucket: {bucket_name}")
-
-    # --- 1. Get all top-level folders (prefixes)
-    top_level = s3.list_objects_v2(Bucket=bucket_name, Delimiter='/')
-    prefixes = top_level.get('CommonPrefixes', [])
-
-    if not prefixes:
-        logging.info("No folders found at root level.")
-    else:
-        for prefix in prefixes:
-            folder = prefix['Prefix']
-            logging.info(f"\n📁 Folder: {folder}")
-
-            # --- 2. List contents inside each folder
-            contents = s3.list_objects_v2(Bucket=bucket_name, Prefix=folder)
-            for obj in contents.get('Contents', []):
-                if obj['Key'] != folder:  # Skip the folder marker itself
-                    size = obj['Size']
-                    modified = obj['LastModified']
-                    logging.info(f"   └── 🗂️ {obj['Key']} | {size} bytes | Modified: {modified}")
-
-    # --- 3. List files directly under root (not in folders)
-    root_files = [
-        obj for obj in top_level.get('Contents', [])
-        if '/' not in obj['Key']
-    ]
-    if root_files:
-        logging.info("\n📄 Files directly under root:")
-        for obj in root_files:
-            logging.info(f" - {obj['Key']} | {obj['Size']} bytes | Modified: {obj['LastModified']}")
-    else:
-        logging.info("\nNo files found in bucket root.")
-
-except (ClientError, BotoCoreError) as e:
-    logging.critical(f"🛑 AWS Error: {e}")
-except Exception as ex:
-    logging.critical(f"🛑 Unexpected Error: {ex}")
+INVENTORY_PATH = 'inventory.csv'        # use 'inventory.parquet' for Parquet (needs pyarrow)
+SUMMARY_PATH = 'inventory_summary.csv'
+SHARD_DEPTH = 1          # folder levels to shard (and summarise) by
+RANGE_SPLITS = 1         # split each folder into this many key ranges (raise for huge folders)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+    s3 = get_client(MAX_WORKERS)
+    try:
+        logging.info(f"📂 Inventorying bucket: {bucket_name}")
+        start = time.monotonic()
+        stats = run_inventory(s3, bucket_name, depth=SHARD_DEPTH, range_splits=RANGE_SPLITS,
+                              objects_path=INVENTORY_PATH, summary_path=SUMMARY_PATH)
+
+        if not stats:
+            logging.info("No objects found in bucket.")
+        for prefix in sorted(stats):
+            s = stats[prefix]
+            icon = '📄' if prefix == '(root)' else '📁'
+            logging.info(f"{icon} {prefix} | {s.count} objects | {s.bytes} bytes")
+            logging.info(f"   ├── Oldest: {s.oldest[0]} ({s.oldest[1]})")
+            logging.info(f"   └── Newest: {s.newest[0]} ({s.newest[1]})")
+
+        total = sum(s.count for s in stats.values())
+        total_bytes = sum(s.bytes for s in stats.values())
+        logging.info(f"✅ {total} objects, {total_bytes} bytes in {time.monotonic() - start:.1f}s "
+                     f"→ {INVENTORY_PATH}, {SUMMARY_PATH}")
+
+    except (ClientError, BotoCoreError) as e:
+        logging.critical(f"🛑 AWS Error: {e}")
+    except Exception as ex:
+        logging.critical(f"🛑 Unexpected Error: {ex}")
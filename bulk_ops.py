@@ -0,0 +1,279 @@
+"""
+Bulk delete / copy / move within a bucket.
+- Deletes are batched into delete_objects calls of up to 1,000 keys and the batches
+  run concurrently, so removing a folder costs N/1000 requests instead of N.
+- Whole-prefix operations stream keys from a paginated listing; only a bounded
+  window of batches is ever in memory.
+- Copies are server-side (copy_object) and run concurrently; a move is a copy
+  followed by a batched delete of the sources that copied successfully.
+- Every operation returns a BulkReport with per-key failures and accepts a
+  progress callback that is called after each finished batch.
+- DeleteBatcher collects single deletes (e.g. watcher events) and flushes them
+  in batches after a short delay.
+"""
+import time
+import logging
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+DELETE_BATCH_SIZE = 1000   # S3 maximum keys per delete_objects call
+COPY_BATCH_SIZE = 100      # copies handed to a worker at a time (for progress reporting)
+MAX_WORKERS = 8
+BATCH_DELAY = 1.0          # DeleteBatcher waits this long to gather more keys
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+def iter_prefix_keys(client, bucket, prefix, with_size=False):
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield (obj['Key'], obj['Size']) if with_size else obj['Key']
+
+# --- Report ---
+class BulkReport:
+    def __init__(self, action):
+        self.action = action
+        self.succeeded = 0
+        self.failed = []        # [{'Key', 'Code', 'Message'}]
+        self.batches = 0
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, succeeded, failed):
+        with self.lock:
+            self.succeeded += succeeded
+            self.failed.extend(failed)
+            self.batches += 1
+
+    def as_dict(self, include_failures=True):
+        with self.lock:
+            result = {
+                'action': self.action,
+                'succeeded': self.succeeded,
+                'failed': len(self.failed),
+                'batches': self.batches,
+                'elapsed': round(time.monotonic() - self.start, 3)
+            }
+            if include_failures:
+                result['failures'] = list(self.failed)
+        return result
+
+def _failure(key, error):
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code', type(error).__name__)
+    return {'Key': key, 'Code': code, 'Message': str(error)}
+
+def _run_batches(batches, work, report, max_workers, progress):
+    """Run work(batch) -> (succeeded, failed) over a bounded window of batches."""
+    window = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                report.add(*future.result())
+                if progress:
+                    progress(report)
+
+        for batch in batches:
+            pending.add(pool.submit(work, batch))
+            if len(pending) >= window:
+                drain(FIRST_COMPLETED)
+        while pending:
+            drain(FIRST_COMPLETED)
+    return report
+
+# --- Delete ---
+def _delete_item(item):
+    if isinstance(item, str):
+        return {'Key': item}
+    key, version_id = item
+    return {'Key': key, 'VersionId': version_id}
+
+def delete_batch(client, bucket, items):
+    """
+    One delete_objects call. Items are keys, or (key, version_id) pairs to remove
+    specific versions for good. Returns (deleted items, failures).
+    """
+    try:
+        resp = client.delete_objects(Bucket=bucket, Delete={
+            'Objects': [_delete_item(item) for item in items], 'Quiet': True})
+    except Exception as e:
+        return [], [_failure(item if isinstance(item, str) else item[0], e) for item in items]
+    failures, failed = [], set()
+    for err in resp.get('Errors', []):
+        failure = {'Key': err['Key'], 'Code': err.get('Code', ''), 'Message': err.get('Message', '')}
+        if err.get('VersionId'):
+            failure['VersionId'] = err['VersionId']
+        failures.append(failure)
+        failed.add((err['Key'], err.get('VersionId')))
+    deleted = [item for item in items
+               if ((item, None) if isinstance(item, str) else tuple(item)) not in failed]
+    return deleted, failures
+
+def delete_keys(client, bucket, keys, max_workers=MAX_WORKERS, progress=None, index=None,
+                on_deleted=None):
+    report = BulkReport('delete')
+
+    def work(batch):
+        deleted, failures = delete_batch(client, bucket, batch)
+        for key in deleted:
+            if index is not None:
+                index.record_delete(key)
+            if on_deleted:
+                on_deleted(key)
+        return len(deleted), failures
+
+    return _run_batches(batched(keys, DELETE_BATCH_SIZE), work, report, max_workers, progress)
+
+def delete_prefix(client, bucket, prefix, max_workers=MAX_WORKERS, progress=None, index=None):
+    if not prefix:
+        raise ValueError("Refusing to delete an empty prefix (the whole bucket)")
+    return delete_keys(client, bucket, iter_prefix_keys(client, bucket, prefix),
+                       max_workers, progress, index)
+
+# --- Copy / Move ---
+def copy_pairs(client, bucket, pairs, max_workers=MAX_WORKERS, progress=None, index=None,
+               action='copy'):
+    """Server-side copy of (source key, destination key) pairs within the bucket."""
+    report = BulkReport(action)
+    copied = []   # sources that made it, for move
+    copied_lock = threading.Lock()
+
+    def work(batch):
+        done, failures = 0, []
+        for src, dst in batch:
+            try:
+                resp = client.copy_object(Bucket=bucket, Key=dst, CopySource={'Bucket': bucket, 'Key': src})
+            except Exception as e:
+                failures.append(_failure(src, e))
+                continue
+            done += 1
+            with copied_lock:
+                copied.append(src)
+            if index is not None:
+                source = index.get(src)
+                index.record_put(dst, source['Size'] if source else 0,
+                                 resp.get('CopyObjectResult', {}).get('ETag'), resp.get('VersionId'))
+        return done, failures
+
+    _run_batches(batched(pairs, COPY_BATCH_SIZE), work, report, max_workers, progress)
+    report.copied_sources = copied
+    return report
+
+def prefix_pairs(client, bucket, src_prefix, dst_prefix):
+    for key in iter_prefix_keys(client, bucket, src_prefix):
+        yield key, dst_prefix + key[len(src_prefix):]
+
+def copy_prefix(client, bucket, src_prefix, dst_prefix, max_workers=MAX_WORKERS, progress=None, index=None):
+    return copy_pairs(client, bucket, prefix_pairs(client, bucket, src_prefix, dst_prefix),
+                      max_workers, progress, index)
+
+def move_pairs(client, bucket, pairs, max_workers=MAX_WORKERS, progress=None, index=None):
+    """Copy, then delete the sources that copied. A key only counts as moved once both steps succeed."""
+    pairs = [(src, dst) for src, dst in pairs if src != dst]
+    report = copy_pairs(client, bucket, pairs, max_workers, progress, index, action='move')
+    copied = report.copied_sources
+    report.succeeded = 0
+    cleanup = delete_keys(client, bucket, copied, max_workers, index=index)
+    report.add(cleanup.succeeded, cleanup.failed)
+    if progress:
+        progress(report)
+    return report
+
+def move_prefix(client, bucket, src_prefix, dst_prefix, max_workers=MAX_WORKERS, progress=None, index=None):
+    if dst_prefix.startswith(src_prefix):
+        raise ValueError("Destination prefix can't be inside the source prefix")
+    # Materialise the listing first so the copies can't show up in it
+    pairs = list(prefix_pairs(client, bucket, src_prefix, dst_prefix))
+    return move_pairs(client, bucket, pairs, max_workers, progress, index)
+
+# --- Batched single deletes ---
+class DeleteBatcher:
+    """
+    Gathers keys from add() and deletes them with delete_objects once BATCH_DELAY
+    has passed or DELETE_BATCH_SIZE keys are waiting. discard() withdraws a key
+    (e.g. the file came back) and waits for any batch already in flight.
+    """
+
+    def __init__(self, client, bucket, delay=BATCH_DELAY, on_deleted=None, on_failed=None, logger=None):
+        self.client = client
+        self.bucket = bucket
+        self.delay = delay
+        self.on_deleted = on_deleted
+        self.on_failed = on_failed
+        self.logger = logger or logging.getLogger(__name__)
+        self.pending = {}           # key -> time added
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+    def add(self, key):
+        with self.cond:
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(target=self._loop, name="delete-batcher", daemon=True)
+                self.thread.start()
+            was_empty = not self.pending
+            self.pending.setdefault(key, time.monotonic())
+            # An idle worker sleeps without a timeout: wake it to start the delay
+            if was_empty or len(self.pending) >= DELETE_BATCH_SIZE:
+                self.cond.notify()
+
+    def discard(self, key):
+        with self.cond:
+            self.pending.pop(key, None)
+        with self.flush_lock:
+            pass
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.closed:
+                    if len(self.pending) >= DELETE_BATCH_SIZE:
+                        break
+                    if self.pending:
+                        wait_for = self.delay - (time.monotonic() - min(self.pending.values()))
+                        if wait_for <= 0:
+                            break
+                    else:
+                        wait_for = None
+                    self.cond.wait(wait_for)
+                if self.closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.cond:
+                keys = list(self.pending)[:DELETE_BATCH_SIZE]
+                for key in keys:
+                    del self.pending[key]
+            if not keys:
+                return 0
+            deleted, failures = delete_batch(self.client, self.bucket, keys)
+            for key in deleted:
+                if self.on_deleted:
+                    self.on_deleted(key)
+            for failure in failures:
+                self.logger.error(f"❌ Failed to delete {failure['Key']}: {failure['Code']} {failure['Message']}")
+                if self.on_failed:
+                    self.on_failed(failure)
+            return len(deleted)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+        while self.pending:
+            self.flush()
@@ -0,0 +1,199 @@
+"""
+Keyed event pipeline for the folder watchers.
+- Watchdog handlers only enqueue work; a bounded pool of worker threads runs it.
+- Work for different keys runs in parallel; work for the same key runs in order.
+- A queued 'modified' event for a key is coalesced with the next one, so only
+  the latest content is synced.
+- A bound on pending events applies backpressure to the observer thread.
+- stats() exposes queue depth, in-flight count and lag; each task's wait is also
+  observed in the metrics queue wait histogram.
+- CoalescingScheduler turns a burst of modify events into one trailing-edge sync.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque, namedtuple
+import metrics
+
+MAX_WORKERS = 4
+MAX_PENDING = 1000
+
+Task = namedtuple('Task', 'key kind fn args enqueued')
+
+class EventPipeline:
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.ready = queue.Queue()
+        self.backlog = {}                 # key -> deque of tasks waiting behind an active one
+        self.active = set()               # keys currently owned by a worker
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.workers = [threading.Thread(target=self._worker, name=f"sync-worker-{i}", daemon=True)
+                        for i in range(max_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, key, kind, fn, *args):
+        """Queue fn(*args) for key. Blocks when max_pending events are already waiting."""
+        task = Task(key, kind, fn, args, time.monotonic())
+        with self.lock:
+            waiting = self.backlog.get(key)
+            if waiting and waiting[-1].kind == kind == 'modified':
+                # Same file modified again before we got to it: keep only the latest
+                waiting[-1] = task
+                self.coalesced += 1
+                return
+        self.slots.acquire()
+        with self.lock:
+            self.pending += 1
+            if key in self.active:
+                self.backlog.setdefault(key, deque()).append(task)
+                return
+            self.active.add(key)
+        self.ready.put(task)
+
+    def _worker(self):
+        while True:
+            task = self.ready.get()
+            if task is None:
+                return
+            # Drain this key's backlog on the same worker to keep per-key order
+            while task is not None:
+                self._run(task)
+                with self.lock:
+                    waiting = self.backlog.get(task.key)
+                    if waiting:
+                        task = waiting.popleft()
+                        if not waiting:
+                            del self.backlog[task.key]
+                    else:
+                        self.active.discard(task.key)
+                        task = None
+
+    def _run(self, task):
+        with self.lock:
+            self.in_flight += 1
+            self.last_lag = time.monotonic() - task.enqueued
+        metrics.QUEUE_WAIT.observe(self.last_lag, queue='events')
+        try:
+            task.fn(*task.args)
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+            self.logger.error(f"❌ {task.kind} handler failed for {task.key}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.pending -= 1
+                self.processed += 1
+            self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            queued = [t for t in list(self.ready.queue) if t is not None]
+            queued += [t for waiting in self.backlog.values() for t in waiting]
+            oldest = min((t.enqueued for t in queued), default=None)
+            return {
+                'queue_depth': self.pending - self.in_flight,
+                'in_flight': self.in_flight,
+                'processed': self.processed,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'last_lag_seconds': round(self.last_lag, 3),
+                'oldest_wait_seconds': round(time.monotonic() - oldest, 3) if oldest else 0.0
+            }
+
+    def stop(self, timeout=None):
+        for _ in self.workers:
+            self.ready.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+
+# --- Trailing-edge debounce ---
+QUIET_WINDOW = 2.0
+
+def stat_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+class CoalescingScheduler:
+    """
+    Fires fire(key, path) once per burst of events, after the key has been quiet
+    for `quiet` seconds. With check_stable, a file whose size/mtime still moved
+    during the window is given another window, so half-written files aren't synced.
+    Entries are dropped as soon as they fire, so idle keys cost nothing.
+    """
+
+    def __init__(self, fire, quiet=QUIET_WINDOW, check_stable=True, logger=None):
+        self.fire = fire
+        self.quiet = quiet
+        self.check_stable = check_stable
+        self.logger = logger or logging.getLogger(__name__)
+        self.due = {}                     # key -> [deadline, path, stat signature]
+        self.cond = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="sync-debounce", daemon=True)
+        self.thread.start()
+
+    def touch(self, key, path):
+        signature = stat_signature(path) if self.check_stable else None
+        with self.cond:
+            self.due[key] = [time.monotonic() + self.quiet, path, signature]
+            self.cond.notify()
+
+    def cancel(self, key):
+        with self.cond:
+            self.due.pop(key, None)
+
+    def pending(self):
+        with self.cond:
+            return len(self.due)
+
+    def _loop(self):
+        while True:
+            ready = []
+            with self.cond:
+                if not self.running:
+                    return
+                now = time.monotonic()
+                for key, (deadline, path, signature) in list(self.due.items()):
+                    if deadline > now:
+                        continue
+                    if self.check_stable:
+                        current = stat_signature(path)
+                        if current != signature:
+                            # Still being written: wait for another quiet window
+                            self.due[key] = [now + self.quiet, path, current]
+                            continue
+                    del self.due[key]
+                    ready.append((key, path))
+                if not ready:
+                    next_deadline = min((entry[0] for entry in self.due.values()), default=None)
+                    self.cond.wait(None if next_deadline is None else max(0, next_deadline - now))
+                    continue
+            for key, path in ready:
+                try:
+                    self.fire(key, path)
+                except Exception as e:
+                    self.logger.error(f"❌ Failed to schedule sync for {key}: {e}")
+
+    def stop(self, flush=True):
+        with self.cond:
+            self.running = False
+            ready = list(self.due.items()) if flush else []
+            self.due.clear()
+            self.cond.notify()
+        self.thread.join()
+        for key, (_, path, _) in ready:
+            self.fire(key, path)
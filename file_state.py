@@ -0,0 +1,258 @@
+"""
+Stat-first, hash-on-demand file state for the upload scripts.
+- iter_files() walks a folder with os.scandir, so type checks and stat data come
+  from the directory listing instead of separate isfile()/getmtime() calls.
+- FileStateCache (SQLite) remembers size, mtime and inode per path together with
+  the file's content hash; a file is only re-hashed when its stat data changes.
+- The hash is the S3 ETag the file would get: MD5 for single-part uploads, or
+  MD5-of-part-MD5s plus "-N" for multipart ones, with part sizes chosen the way
+  boto3 chooses them. A local file can therefore be compared with the ETag in a
+  bucket listing to skip re-uploading it.
+- Large files are hashed through mmap (no copies); many files are hashed in
+  parallel. hashlib releases the GIL, so threads already use every core; a
+  process pool is available for callers whose main module is import-safe.
+"""
+import os
+import mmap
+import math
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from upload_engine import MULTIPART_CHUNK_SIZE, MULTIPART_THRESHOLD
+
+FILE_STATE_CACHE_NAME = '.file_state_cache.sqlite'
+MMAP_THRESHOLD = 4 * 1024 * 1024     # files at least this big are hashed through mmap
+HASH_WORKERS = os.cpu_count() or 4
+MAX_PARTS = 10000
+
+FileState = namedtuple('FileState', 'path rel size mtime_ns inode etag')
+
+# --- Scanning ---
+def iter_files(root, allowed_extensions=None, skip=(), recursive=True):
+    """Yield (relative path, os.DirEntry) for regular files under root, hidden names excluded."""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError as e:
+            logging.warning(f"⚠️ Can't scan {current}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    if allowed_extensions and not entry.name.lower().endswith(allowed_extensions):
+                        continue
+                    rel = os.path.relpath(entry.path, root).replace(os.sep, '/')
+                    if skip and rel.startswith(skip):
+                        continue
+                    yield rel, entry
+
+# --- ETags ---
+def part_size_for(size, chunk_size=MULTIPART_CHUNK_SIZE):
+    """Part size boto3's transfer manager uses: the chunk size, doubled until <= MAX_PARTS parts."""
+    while math.ceil(size / chunk_size) > MAX_PARTS:
+        chunk_size *= 2
+    return chunk_size
+
+def guess_part_size(size, etag, chunk_size=MULTIPART_CHUNK_SIZE):
+    """Part size that would give a multipart ETag its part count (None for single-part ETags)."""
+    etag = etag.strip('"')
+    if '-' not in etag:
+        return None
+    parts = int(etag.rsplit('-', 1)[1])
+    candidate = part_size_for(size, chunk_size)
+    if math.ceil(size / candidate) == parts:
+        return candidate
+    mib = 1024 * 1024
+    for candidate in (mib * n for n in (5, 8, 16, 32, 64, 128, 256, 512)):
+        if math.ceil(size / candidate) == parts:
+            return candidate
+    return math.ceil(size / parts)
+
+def _hash_parts(view, size, part_size):
+    if part_size is None:
+        return hashlib.md5(view).hexdigest()
+    digests = [hashlib.md5(view[offset:offset + part_size]).digest()
+               for offset in range(0, size, part_size)]
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+def etag_with_parts(path, part_size):
+    # part_size None hashes the file as a single part
+    size = os.path.getsize(path)
+    if size < MMAP_THRESHOLD:
+        with open(path, 'rb') as f:
+            return _hash_parts(f.read(), size, part_size)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            return _hash_parts(view, size, part_size)
+
+def file_etag(path, threshold=MULTIPART_THRESHOLD, chunk_size=MULTIPART_CHUNK_SIZE):
+    """The ETag S3 would report for this file after an upload through UploadEngine."""
+    size = os.path.getsize(path)
+    return etag_with_parts(path, part_size_for(size, chunk_size) if size >= threshold else None)
+
+def _etag_job(args):
+    path, part_size = args
+    try:
+        return path, part_size, etag_with_parts(path, part_size)
+    except OSError:
+        return path, part_size, None
+
+# --- Cache ---
+class FileStateCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                part_size INTEGER,
+                etag TEXT
+            ) WITHOUT ROWID
+        """)
+        with self.lock:
+            self.entries = {row[0]: row[1:] for row in self.db.execute(
+                "SELECT path, size, mtime_ns, inode, part_size, etag FROM files")}
+        self.dirty = {}
+
+    def lookup(self, path, size, mtime_ns, inode, part_size):
+        """Cached ETag when the stat data (and part size) still match, else None."""
+        entry = self.entries.get(path)
+        if entry and entry[:4] == (size, mtime_ns, inode, part_size):
+            return entry[4]
+        return None
+
+    def store(self, path, size, mtime_ns, inode, part_size, etag):
+        with self.lock:
+            self.entries[path] = self.dirty[path] = (size, mtime_ns, inode, part_size, etag)
+
+    def save(self):
+        with self.lock:
+            rows = [(path,) + entry for path, entry in self.dirty.items()]
+            self.dirty = {}
+            if rows:
+                self.db.execute('BEGIN')
+                self.db.executemany("INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, part_size, etag) "
+                                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self.db.execute('COMMIT')
+
+    def close(self):
+        self.save()
+        with self.lock:
+            self.db.close()
+
+# --- Scanner ---
+class FileScanner:
+    def __init__(self, cache_path, workers=HASH_WORKERS, use_processes=False,
+                 threshold=MULTIPART_THRESHOLD, chunk_size=MULTIPART_CHUNK_SIZE):
+        self.cache = FileStateCache(cache_path)
+        self.workers = workers
+        self.use_processes = use_processes
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+        self.hashed = 0
+        self.cache_hits = 0
+
+    def scan(self, root, allowed_extensions=None, skip=(), recursive=True):
+        """Stat-only pass: FileStates with etag filled from the cache where still valid."""
+        states = []
+        for rel, entry in iter_files(root, allowed_extensions, skip, recursive):
+            st = entry.stat(follow_symlinks=False)
+            part_size = self.default_part_size(st.st_size)
+            etag = self.cache.lookup(entry.path, st.st_size, st.st_mtime_ns, st.st_ino, part_size)
+            states.append(FileState(entry.path, rel, st.st_size, st.st_mtime_ns, st.st_ino, etag))
+        return states
+
+    def default_part_size(self, size):
+        return part_size_for(size, self.chunk_size) if size >= self.threshold else None
+
+    def hash(self, states, part_sizes=None):
+        """
+        Return states with etag filled in, hashing only files without a valid
+        cached ETag. part_sizes optionally maps path -> part size to match a
+        remote multipart ETag made with different parts.
+        """
+        part_sizes = part_sizes or {}
+        result, todo = {}, []
+        for state in states:
+            part_size = part_sizes.get(state.path, self.default_part_size(state.size))
+            etag = self.cache.lookup(state.path, state.size, state.mtime_ns, state.inode, part_size)
+            if etag is not None:
+                self.cache_hits += 1
+                result[state.path] = state._replace(etag=etag)
+            else:
+                todo.append((state, part_size))
+
+        if todo:
+            by_path = {state.path: state for state, _ in todo}
+            jobs = [(state.path, part_size) for state, part_size in todo]
+            # Small batches aren't worth a pool's startup cost
+            if len(jobs) == 1 or self.workers <= 1:
+                hashed = map(_etag_job, jobs)
+                pool = None
+            else:
+                pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+                pool = pool_class(max_workers=self.workers)
+                hashed = pool.map(_etag_job, jobs, **({'chunksize': 64} if self.use_processes else {}))
+            try:
+                for path, part_size, etag in hashed:
+                    state = by_path[path]
+                    if etag is not None:
+                        self.hashed += 1
+                        self.cache.store(path, state.size, state.mtime_ns, state.inode, part_size, etag)
+                    result[path] = state._replace(etag=etag)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+            self.cache.save()
+        return [result[state.path] for state in states]
+
+    def unchanged(self, states, remote):
+        """
+        Split states into (unchanged, changed) against remote {rel: (size, etag)},
+        e.g. from one bucket listing. Only files whose size matches are hashed.
+        """
+        candidates, part_sizes, changed = [], {}, []
+        for state in states:
+            size_etag = remote.get(state.rel)
+            if size_etag is None or size_etag[0] != state.size or not size_etag[1]:
+                changed.append(state)
+                continue
+            part_size = guess_part_size(state.size, size_etag[1], self.chunk_size)
+            if part_size is not None or state.size >= self.threshold:
+                part_sizes[state.path] = part_size
+            candidates.append(state)
+        same = []
+        for state in self.hash(candidates, part_sizes):
+            if state.etag and state.etag == remote[state.rel][1].strip('"'):
+                same.append(state)
+            else:
+                changed.append(state)
+        return same, changed
+
+    def close(self):
+        self.cache.close()
+
+def remote_state(client, bucket, prefix):
+    """{relative key: (size, etag)} for everything under prefix, from one paginated listing."""
+    found = {}
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            found[obj['Key'][len(prefix):]] = (obj['Size'], obj.get('ETag', '').strip('"'))
+    return found
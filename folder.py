@@ -2,12 +2,14 @@
 Creates a folder (prefix) in S3 and uploads specified local files to it.
 - Demonstrates how to create a folder marker in S3.
 - Uploads a hardcoded list of local files to the new S3 folder.
+- Runs only as a script; importing it does nothing.
 """
-import boto3
 import os
+from upload_engine import UploadEngine
+from object_index import ObjectIndex
+from s3_clients import get_client
 
 # --- Setup ---
-s3 = boto3.client('s3')
 bucket_name = '24030142014'
 folder_name = 'folder_creation/'  # S3 folder
 
@@ -17,13 +19,22 @@ local_files = [
     '/Volumes/study/cloud web/aws 4th july/shopycloud.jpg'
 ]
 
-# --- 1. Create Folder ---
-s3.put_object(Bucket=bucket_name, Key=folder_name)
-print(f"✅ Created folder '{folder_name}' in bucket '{bucket_name}'")
+def main():
+    s3 = get_client()
+    engine = UploadEngine(s3, index=ObjectIndex())
 
-# --- 2. Upload Files ---
-for file_path in local_files:
-    file_name = os.path.basename(file_path)
-    s3_key = folder_name + file_name
-    s3.upload_file(file_path, bucket_name, s3_key)
-    print(f"📤 Uploaded '{file_name}' to '{s3_key}'")
+    # --- 1. Create Folder ---
+    s3.put_object(Bucket=bucket_name, Key=folder_name)
+    print(f"✅ Created folder '{folder_name}' in bucket '{bucket_name}'")
+
+    # --- 2. Upload Files ---
+    jobs = [(file_path, bucket_name, folder_name + os.path.basename(file_path)) for file_path in local_files]
+    for result in engine.upload_many(jobs):
+        file_name = os.path.basename(result.path)
+        if result.error:
+            print(f"❌ Failed to upload '{file_name}': {result.error}")
+        else:
+            print(f"📤 Uploaded '{file_name}' to '{result.key}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Parallel, prefix-sharded bucket inventory.
+- Splits the keyspace into shards by delimiter (top-level folders, optionally deeper)
+  and, optionally, each folder into key ranges.
+- Lists every shard concurrently with full pagination (no 1,000-key truncation).
+- Streams pages back to one consumer through a bounded queue, so memory stays flat.
+- Aggregates per prefix: object count, total bytes, oldest and newest object.
+- Writes objects as CSV (or Parquet when pyarrow is installed) plus a summary CSV.
+"""
+import csv
+import queue
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+MAX_WORKERS = 16
+PAGE_QUEUE_SIZE = 64
+KEY_MAX = '\U0010ffff'
+# Split points used when a folder is further divided into key ranges
+RANGE_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+OBJECT_FIELDS = ['key', 'size', 'last_modified', 'etag', 'storage_class']
+
+Shard = namedtuple('Shard', 'prefix start_after stop_at delimiter')
+
+# --- Shard planning ---
+def discover_prefixes(client, bucket, prefix='', depth=1):
+    """Return (folder prefixes `depth` levels down, whether loose keys exist above them)."""
+    paginator = client.get_paginator('list_objects_v2')
+    folders, loose = [], set()
+    level = [prefix]
+    for _ in range(depth):
+        next_level = []
+        for current in level:
+            for page in paginator.paginate(Bucket=bucket, Prefix=current, Delimiter='/'):
+                next_level.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+                if page.get('Contents'):
+                    loose.add(current)
+        level = next_level
+    folders = level
+    return folders, sorted(loose)
+
+def range_shards(prefix, splits):
+    """Split one prefix into `splits` contiguous key ranges."""
+    if splits <= 1:
+        return [Shard(prefix, None, None, None)]
+    step = len(RANGE_ALPHABET) / splits
+    bounds = [RANGE_ALPHABET[int(i * step)] for i in range(1, splits)]
+    shards = []
+    start = None
+    for bound in bounds:
+        stop = prefix + bound
+        shards.append(Shard(prefix, start, stop, None))
+        # StartAfter is exclusive: begin just after every key sorting before `stop`
+        start = prefix + chr(ord(bound) - 1) + KEY_MAX
+    shards.append(Shard(prefix, start, None, None))
+    return shards
+
+def plan_shards(client, bucket, prefix='', depth=1, range_splits=1):
+    folders, loose = discover_prefixes(client, bucket, prefix, depth)
+    shards = []
+    for folder in folders:
+        shards.extend(range_shards(folder, range_splits))
+    # Keys that sit directly in a parent level (not inside any folder)
+    for parent in loose:
+        shards.append(Shard(parent, None, None, '/'))
+    return shards
+
+# --- Listing ---
+def list_shard(client, bucket, shard, out, cancelled=None):
+    params = {'Bucket': bucket, 'Prefix': shard.prefix}
+    if shard.start_after:
+        params['StartAfter'] = shard.start_after
+    if shard.delimiter:
+        params['Delimiter'] = shard.delimiter
+    paginator = client.get_paginator('list_objects_v2')
+    count = 0
+    for page in paginator.paginate(**params):
+        if cancelled is not None and cancelled.is_set():
+            break
+        contents = page.get('Contents', [])
+        if shard.stop_at:
+            kept = [obj for obj in contents if obj['Key'] < shard.stop_at]
+            out.put(kept)
+            count += len(kept)
+            if len(kept) < len(contents):
+                break
+        else:
+            out.put(contents)
+            count += len(contents)
+    return count
+
+def iter_inventory(client, bucket, shards, max_workers=MAX_WORKERS):
+    """Yield object dicts from all shards as pages arrive (order across shards is not defined)."""
+    pages = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+    done = object()
+    errors = []
+    cancelled = threading.Event()
+
+    def run(shard):
+        try:
+            list_shard(client, bucket, shard, pages, cancelled)
+        except Exception as e:
+            errors.append((shard, e))
+            logging.error(f"❌ Shard {shard.prefix} failed: {e}")
+        finally:
+            pages.put(done)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for shard in shards:
+            pool.submit(run, shard)
+        remaining = len(shards)
+        try:
+            while remaining:
+                page = pages.get()
+                if page is done:
+                    remaining -= 1
+                    continue
+                yield from page
+        finally:
+            # Consumer stopped early: unblock the workers so the pool can shut down
+            cancelled.set()
+            while remaining:
+                if pages.get() is done:
+                    remaining -= 1
+    if errors:
+        raise RuntimeError(f"{len(errors)} shard(s) failed; inventory is incomplete")
+
+# --- Aggregation ---
+class PrefixStats:
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.oldest = None
+        self.newest = None
+
+    def add(self, obj):
+        self.count += 1
+        self.bytes += obj['Size']
+        modified = obj['LastModified']
+        if self.oldest is None or modified < self.oldest[1]:
+            self.oldest = (obj['Key'], modified)
+        if self.newest is None or modified > self.newest[1]:
+            self.newest = (obj['Key'], modified)
+
+def group_of(key, depth, prefix=''):
+    """Summary group of a key: its folder `depth` levels below `prefix`."""
+    parts = key[len(prefix):].split('/')  # every listed key starts with the prefix
+    if len(parts) <= 1:
+        return prefix or '(root)'
+    return prefix + '/'.join(parts[:min(depth, len(parts) - 1)]) + '/'
+
+# --- Writers ---
+class CsvObjectWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(OBJECT_FIELDS)
+
+    def write(self, obj):
+        self.writer.writerow([obj['Key'], obj['Size'], obj['LastModified'].isoformat(),
+                              obj.get('ETag', '').strip('"'), obj.get('StorageClass', '')])
+
+    def close(self):
+        self.file.close()
+
+class ParquetObjectWriter:
+    BATCH = 50000
+
+    def __init__(self, path):
+        self.schema = pyarrow.schema([
+            ('key', pyarrow.string()), ('size', pyarrow.int64()),
+            ('last_modified', pyarrow.timestamp('ms', tz='UTC')),
+            ('etag', pyarrow.string()), ('storage_class', pyarrow.string())
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.rows = {name: [] for name in OBJECT_FIELDS}
+
+    def write(self, obj):
+        self.rows['key'].append(obj['Key'])
+        self.rows['size'].append(obj['Size'])
+        self.rows['last_modified'].append(obj['LastModified'])
+        self.rows['etag'].append(obj.get('ETag', '').strip('"'))
+        self.rows['storage_class'].append(obj.get('StorageClass', ''))
+        if len(self.rows['key']) >= self.BATCH:
+            self._flush()
+
+    def _flush(self):
+        if self.rows['key']:
+            self.writer.write_table(pyarrow.table(self.rows, schema=self.schema))
+            self.rows = {name: [] for name in OBJECT_FIELDS}
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+def object_writer(path):
+    if path.endswith('.parquet'):
+        if pyarrow is None:
+            logging.warning("⚠️ pyarrow is not installed; writing CSV instead of Parquet")
+            return CsvObjectWriter(path[:-len('.parquet')] + '.csv')
+        return ParquetObjectWriter(path)
+    return CsvObjectWriter(path)
+
+def write_summary(path, stats):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['prefix', 'objects', 'bytes', 'oldest_key', 'oldest_modified',
+                         'newest_key', 'newest_modified'])
+        for prefix in sorted(stats):
+            s = stats[prefix]
+            writer.writerow([prefix, s.count, s.bytes, s.oldest[0], s.oldest[1].isoformat(),
+                             s.newest[0], s.newest[1].isoformat()])
+
+# --- Entry point ---
+def run_inventory(client, bucket, prefix='', depth=1, range_splits=1, max_workers=MAX_WORKERS,
+                  objects_path=None, summary_path=None, on_object=None):
+    """Inventory a bucket. Returns {prefix group: PrefixStats}."""
+    shards = plan_shards(client, bucket, prefix, depth, range_splits)
+    logging.info(f"🧭 Planned {len(shards)} shard(s) across {max_workers} worker(s)")
+    stats = {}
+    writer = object_writer(objects_path) if objects_path else None
+    try:
+        for obj in iter_inventory(client, bucket, shards, max_workers):
+            group = group_of(obj['Key'], depth, prefix)
+            if group not in stats:
+                stats[group] = PrefixStats()
+            stats[group].add(obj)
+            if writer:
+                writer.write(obj)
+            if on_object:
+                on_object(obj)
+    finally:
+        if writer:
+            writer.close()
+    if summary_path:
+        write_summary(summary_path, stats)
+    return stats
@@ -0,0 +1,369 @@
+"""
+In-memory stand-in for the boto3 S3 client, used by the benchmarks.
+- Implements the subset of client calls the sync/backup scripts rely on.
+- Raises botocore ClientError with S3-style error codes, like the real client.
+- Counts requests and bytes sent so benchmarks can report upload savings.
+- LocalS3(versioned=True) keeps every version and delete marker, like a bucket
+  with versioning enabled (list_object_versions, VersionId on get/delete);
+  put_bucket_versioning switches it on like the real call.
+- Multipart uploads (create/upload_part/list_parts/complete/abort and
+  list_multipart_uploads) are held in memory until completed or aborted.
+"""
+import io
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timezone
+from collections import Counter
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+def client_error(code, status, operation):
+    return ClientError({
+        'Error': {'Code': code, 'Message': code},
+        'ResponseMetadata': {'HTTPStatusCode': status}
+    }, operation)
+
+def read_body(body):
+    if body is None:
+        return b''
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return bytes(body)
+    return body.read()
+
+class LocalS3:
+    def __init__(self, versioned=False):
+        self.objects = {}          # (bucket, key) -> dict(body, etag, modified, content_type)
+        self.versions = {}         # (bucket, key) -> [versions, newest first] when versioned
+        self.versioned = versioned
+        self.version_seq = 0
+        self.uploads = {}          # upload id -> dict(bucket, key, initiated, parts {number: (etag, data)})
+        self.calls = Counter()
+        self.bytes_uploaded = 0
+        self.lock = threading.Lock()
+
+    # --- Versions ---
+    def _add_version(self, Bucket, Key, obj):
+        # Caller holds the lock
+        if not self.versioned:
+            return None
+        self.version_seq += 1
+        obj['version_id'] = '%016d' % self.version_seq
+        self.versions.setdefault((Bucket, Key), []).insert(0, obj)
+        return obj['version_id']
+
+    def _delete(self, Bucket, Key, VersionId=None):
+        # Caller holds the lock. Returns the Deleted entry S3 would report.
+        if VersionId is None:
+            self.objects.pop((Bucket, Key), None)
+            if not self.versioned:
+                return {'Key': Key}
+            marker = {'marker': True, 'modified': datetime.now(timezone.utc)}
+            marker_id = self._add_version(Bucket, Key, marker)
+            return {'Key': Key, 'DeleteMarker': True, 'DeleteMarkerVersionId': marker_id}
+        history = self.versions.get((Bucket, Key), [])
+        history[:] = [v for v in history if v['version_id'] != VersionId]
+        if history and not history[0].get('marker'):
+            self.objects[(Bucket, Key)] = history[0]
+        else:
+            self.objects.pop((Bucket, Key), None)
+        if not history:
+            self.versions.pop((Bucket, Key), None)
+        return {'Key': Key, 'VersionId': VersionId}
+
+    # --- Objects ---
+    def put_object(self, Bucket, Key, Body=None, ContentType='binary/octet-stream', **kwargs):
+        data = read_body(Body)
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        with self.lock:
+            self.calls['PutObject'] += 1
+            self.bytes_uploaded += len(data)
+            obj = {
+                'body': data,
+                'etag': etag,
+                'modified': datetime.now(timezone.utc),
+                'content_type': ContentType
+            }
+            version_id = self._add_version(Bucket, Key, obj)
+            self.objects[(Bucket, Key)] = obj
+        resp = {'ETag': etag}
+        if version_id:
+            resp['VersionId'] = version_id
+        return resp
+
+    def _get(self, Bucket, Key, operation, VersionId=None):
+        with self.lock:
+            self.calls[operation] += 1
+            if VersionId is None:
+                obj = self.objects.get((Bucket, Key))
+            else:
+                obj = next((v for v in self.versions.get((Bucket, Key), [])
+                            if v['version_id'] == VersionId and not v.get('marker')), None)
+        if obj is None:
+            raise client_error('NoSuchKey' if operation == 'GetObject' else '404', 404, operation)
+        return obj
+
+    def head_object(self, Bucket, Key, VersionId=None, **kwargs):
+        obj = self._get(Bucket, Key, 'HeadObject', VersionId)
+        return {
+            'ContentLength': len(obj['body']),
+            'ETag': obj['etag'],
+            'LastModified': obj['modified'],
+            'ContentType': obj['content_type']
+        }
+
+    def get_object(self, Bucket, Key, Range=None, VersionId=None, IfNoneMatch=None, **kwargs):
+        obj = self._get(Bucket, Key, 'GetObject', VersionId)
+        if IfNoneMatch and IfNoneMatch in (obj['etag'], '*'):
+            raise client_error('304', 304, 'GetObject')
+        data = obj['body']
+        resp = {
+            'ETag': obj['etag'],
+            'LastModified': obj['modified'],
+            'ContentType': obj['content_type']
+        }
+        if Range:
+            start, _, end = Range.replace('bytes=', '').partition('-')
+            start, end = int(start), int(end) if end else len(data) - 1
+            resp['ContentRange'] = f"bytes {start}-{min(end, len(data) - 1)}/{len(data)}"
+            data = data[start:end + 1]
+        resp['ContentLength'] = len(data)
+        resp['Body'] = StreamingBody(io.BytesIO(data), len(data))
+        return resp
+
+    def delete_object(self, Bucket, Key, VersionId=None, **kwargs):
+        with self.lock:
+            self.calls['DeleteObject'] += 1
+            deleted = self._delete(Bucket, Key, VersionId)
+        return {k: v for k, v in deleted.items() if k != 'Key'}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        with self.lock:
+            self.calls['DeleteObjects'] += 1
+            deleted = [self._delete(Bucket, item['Key'], item.get('VersionId')) for item in Delete['Objects']]
+        if Delete.get('Quiet'):
+            return {}
+        return {'Deleted': deleted}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        src = self._get(CopySource['Bucket'], CopySource['Key'], 'CopyObject', CopySource.get('VersionId'))
+        with self.lock:
+            obj = dict(src, modified=datetime.now(timezone.utc))
+            obj.pop('version_id', None)
+            version_id = self._add_version(Bucket, Key, obj)
+            self.objects[(Bucket, Key)] = obj
+        resp = {'CopyObjectResult': {'ETag': src['etag']}}
+        if version_id:
+            resp['VersionId'] = version_id
+        return resp
+
+    # --- Multipart ---
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.calls['CreateMultipartUpload'] += 1
+            self.uploads[upload_id] = {'bucket': Bucket, 'key': Key, 'parts': {},
+                                       'initiated': datetime.now(timezone.utc)}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def _upload(self, UploadId, operation):
+        # Caller holds the lock
+        upload = self.uploads.get(UploadId)
+        if upload is None:
+            raise client_error('NoSuchUpload', 404, operation)
+        return upload
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body=None, **kwargs):
+        data = read_body(Body)
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        with self.lock:
+            self.calls['UploadPart'] += 1
+            self.bytes_uploaded += len(data)
+            self._upload(UploadId, 'UploadPart')['parts'][PartNumber] = (etag, data)
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId, **kwargs):
+        with self.lock:
+            self.calls['ListParts'] += 1
+            parts = sorted(self._upload(UploadId, 'ListParts')['parts'].items())
+        return {'IsTruncated': False, 'Parts': [{'PartNumber': number, 'ETag': etag, 'Size': len(data)}
+                                                for number, (etag, data) in parts]}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        with self.lock:
+            self.calls['CompleteMultipartUpload'] += 1
+            stored = self._upload(UploadId, 'CompleteMultipartUpload')['parts']
+            chosen = []
+            for part in MultipartUpload['Parts']:
+                etag, data = stored.get(part['PartNumber'], (None, None))
+                if etag != part['ETag']:
+                    raise client_error('InvalidPart', 400, 'CompleteMultipartUpload')
+                chosen.append(data)
+            del self.uploads[UploadId]
+            digests = b''.join(hashlib.md5(data).digest() for data in chosen)
+            obj = {
+                'body': b''.join(chosen),
+                'etag': '"%s-%d"' % (hashlib.md5(digests).hexdigest(), len(chosen)),
+                'modified': datetime.now(timezone.utc),
+                'content_type': 'binary/octet-stream'
+            }
+            version_id = self._add_version(Bucket, Key, obj)
+            self.objects[(Bucket, Key)] = obj
+        resp = {'Bucket': Bucket, 'Key': Key, 'ETag': obj['etag']}
+        if version_id:
+            resp['VersionId'] = version_id
+        return resp
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self.lock:
+            self.calls['AbortMultipartUpload'] += 1
+            self._upload(UploadId, 'AbortMultipartUpload')
+            del self.uploads[UploadId]
+        return {}
+
+    def list_multipart_uploads(self, Bucket, Prefix='', **kwargs):
+        with self.lock:
+            self.calls['ListMultipartUploads'] += 1
+            uploads = [{'Key': u['key'], 'UploadId': upload_id, 'Initiated': u['initiated']}
+                       for upload_id, u in self.uploads.items()
+                       if u['bucket'] == Bucket and u['key'].startswith(Prefix)]
+        return {'IsTruncated': False, 'Uploads': sorted(uploads, key=lambda u: (u['Key'], u['Initiated']))}
+
+    # --- Bucket settings ---
+    def get_bucket_versioning(self, Bucket, **kwargs):
+        with self.lock:
+            self.calls['GetBucketVersioning'] += 1
+            return {'Status': 'Enabled'} if self.versioned else {}
+
+    def put_bucket_versioning(self, Bucket, VersioningConfiguration, **kwargs):
+        with self.lock:
+            self.calls['PutBucketVersioning'] += 1
+            self.versioned = VersioningConfiguration.get('Status') == 'Enabled'
+        return {}
+
+    # --- Files ---
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, 'rb') as f:
+            data = f.read()
+        self.put_object(Bucket=Bucket, Key=Key, Body=data)
+        if Callback:
+            Callback(len(data))
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None, Callback=None, Config=None):
+        data = self._get(Bucket, Key, 'GetObject')['body']
+        with open(Filename, 'wb') as f:
+            f.write(data)
+
+    # --- Listing ---
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter='', MaxKeys=1000,
+                        ContinuationToken=None, StartAfter='', **kwargs):
+        with self.lock:
+            self.calls['ListObjectsV2'] += 1
+            keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        after = ContinuationToken or StartAfter
+        contents, prefixes, truncated, last = [], [], False, None
+        for key in keys:
+            if after and key <= after:
+                continue
+            common = None
+            if Delimiter:
+                idx = key.find(Delimiter, len(Prefix))
+                if idx != -1:
+                    common = key[:idx + len(Delimiter)]
+                    if prefixes and prefixes[-1] == common:
+                        continue
+            if len(contents) + len(prefixes) >= MaxKeys:
+                truncated = True
+                break
+            if common:
+                prefixes.append(common)
+                # Skip the rest of this prefix on the next page
+                last = common + '\U0010ffff'
+                continue
+            last = key
+            obj = self.objects[(Bucket, key)]
+            contents.append({
+                'Key': key,
+                'Size': len(obj['body']),
+                'ETag': obj['etag'],
+                'LastModified': obj['modified']
+            })
+        resp = {'KeyCount': len(contents) + len(prefixes), 'IsTruncated': truncated}
+        if contents:
+            resp['Contents'] = contents
+        if prefixes:
+            resp['CommonPrefixes'] = [{'Prefix': p} for p in prefixes]
+        if truncated:
+            resp['NextContinuationToken'] = last
+        return resp
+
+    def list_object_versions(self, Bucket, Prefix='', MaxKeys=1000, KeyMarker='', VersionIdMarker='', **kwargs):
+        with self.lock:
+            self.calls['ListObjectVersions'] += 1
+            if self.versioned:
+                histories = {k: list(v) for (b, k), v in self.versions.items() if b == Bucket and k.startswith(Prefix)}
+            else:
+                histories = {k: [dict(v, version_id='null')] for (b, k), v in self.objects.items()
+                             if b == Bucket and k.startswith(Prefix)}
+        versions, markers, truncated, count = [], [], False, 0
+        last_key = last_version = None
+        for key in sorted(histories):
+            if KeyMarker and key < KeyMarker:
+                continue
+            history = histories[key]
+            if key == KeyMarker:
+                # KeyMarker alone means "after this key"; with VersionIdMarker, "after this version"
+                ids = [v['version_id'] for v in history]
+                if not VersionIdMarker or VersionIdMarker not in ids:
+                    continue
+                history = history[ids.index(VersionIdMarker) + 1:]
+            for position, v in enumerate(history):
+                if count >= MaxKeys:
+                    truncated = True
+                    break
+                entry = {
+                    'Key': key,
+                    'VersionId': v['version_id'],
+                    'IsLatest': position == 0 and history is histories[key],
+                    'LastModified': v['modified']
+                }
+                if v.get('marker'):
+                    markers.append(entry)
+                else:
+                    entry.update(Size=len(v['body']), ETag=v['etag'])
+                    versions.append(entry)
+                count += 1
+                last_key, last_version = key, v['version_id']
+            if truncated:
+                break
+        resp = {'IsTruncated': truncated, 'KeyMarker': KeyMarker, 'MaxKeys': MaxKeys}
+        if versions:
+            resp['Versions'] = versions
+        if markers:
+            resp['DeleteMarkers'] = markers
+        if truncated:
+            resp['NextKeyMarker'] = last_key
+            resp['NextVersionIdMarker'] = last_version
+        return resp
+
+    def get_paginator(self, operation):
+        return LocalPaginator(getattr(self, operation))
+
+class LocalPaginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        page_size = (PaginationConfig or {}).get('PageSize', 1000)
+        while True:
+            page = self.method(MaxKeys=page_size, **kwargs)
+            yield page
+            if page.get('NextContinuationToken'):
+                kwargs['ContinuationToken'] = page['NextContinuationToken']
+            elif page.get('IsTruncated') and page.get('NextKeyMarker'):
+                kwargs['KeyMarker'] = page['NextKeyMarker']
+                kwargs['VersionIdMarker'] = page.get('NextVersionIdMarker', '')
+            else:
+                return
@@ -0,0 +1,131 @@
+"""
+Batched log shipping to S3.
+- S3LogShipper is a logging.Handler: emit() only appends to an in-memory buffer.
+- A background thread flushes the buffer when it reaches FLUSH_BYTES or FLUSH_INTERVAL.
+- Each flush writes a new gzip-compressed segment under the log prefix
+  (e.g. 'live-sync/logs/2025-07-04/s3_sync_16-25-45_000001.log.gz')
+  instead of re-uploading one ever-growing log file.
+- Failed flushes are retried; the buffer is capped so a long outage can't exhaust memory.
+- stats() reports buffered/dropped records and uploaded segments for the metrics endpoint.
+"""
+import gzip
+import time
+import logging
+import threading
+from datetime import datetime
+import metrics
+
+FLUSH_BYTES = 256 * 1024        # flush once this much log text is buffered
+FLUSH_INTERVAL = 60             # ...or once the oldest buffered record is this old
+MAX_BUFFER_BYTES = 16 * 1024 * 1024
+
+class S3LogShipper(logging.Handler):
+    def __init__(self, client, bucket, prefix, name='s3_sync',
+                 flush_bytes=FLUSH_BYTES, flush_interval=FLUSH_INTERVAL,
+                 max_buffer_bytes=MAX_BUFFER_BYTES):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.segment_name = name
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.oldest = None
+        self.sequence = 0
+        self.dropped = 0
+        self.segments_uploaded = 0
+        self.bytes_uploaded = 0
+        self.cond = threading.Condition()
+        self.ship_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + '\n'
+        except Exception:
+            self.handleError(record)
+            return
+        with self.cond:
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(target=self._loop, name="log-shipper", daemon=True)
+                self.thread.start()
+            self.buffer.append(line)
+            self.buffered_bytes += len(line)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            while self.buffered_bytes > self.max_buffer_bytes and len(self.buffer) > 1:
+                self.buffered_bytes -= len(self.buffer.pop(0))
+                self.dropped += 1
+            if self.buffered_bytes >= self.flush_bytes:
+                self.cond.notify()
+
+    def _due(self):
+        if not self.buffer:
+            return False
+        return (self.buffered_bytes >= self.flush_bytes
+                or time.monotonic() - self.oldest >= self.flush_interval)
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.closed and not self._due():
+                    timeout = self.flush_interval
+                    if self.oldest is not None:
+                        timeout = max(0.05, self.flush_interval - (time.monotonic() - self.oldest))
+                    self.cond.wait(timeout)
+                if self.closed:
+                    return
+            if self.ship() is None:
+                # Upload failed: back off before retrying
+                with self.cond:
+                    self.cond.wait(self.flush_interval)
+
+    def ship(self):
+        """Upload everything buffered so far as one compressed segment."""
+        with self.ship_lock:
+            with self.cond:
+                if not self.buffer:
+                    return 0
+                lines, self.buffer = self.buffer, []
+                self.buffered_bytes, self.oldest = 0, None
+                self.sequence += 1
+                sequence = self.sequence
+            body = gzip.compress(''.join(lines).encode('utf-8'))
+            now = datetime.now()
+            key = f"{self.prefix}{now:%Y-%m-%d}/{self.segment_name}_{now:%H-%M-%S}_{sequence:06d}.log.gz"
+            try:
+                with metrics.stage('log_ship', nbytes=len(body), key=key):
+                    self.client.put_object(Bucket=self.bucket, Key=key, Body=body,
+                                           ContentType='text/plain', ContentEncoding='gzip')
+            except Exception:
+                # Put the records back so the next flush retries them
+                with self.cond:
+                    self.buffer[:0] = lines
+                    self.buffered_bytes += sum(len(line) for line in lines)
+                    self.oldest = time.monotonic()
+                return None
+            self.segments_uploaded += 1
+            self.bytes_uploaded += len(body)
+            return len(body)
+
+    def stats(self):
+        with self.cond:
+            return {'buffered_bytes': self.buffered_bytes, 'buffered_records': len(self.buffer),
+                    'dropped': self.dropped, 'segments_uploaded': self.segments_uploaded,
+                    'bytes_uploaded': self.bytes_uploaded}
+
+    def flush(self):
+        self.ship()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+        self.ship()
+        super().close()
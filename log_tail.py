@@ -0,0 +1,242 @@
+"""
+Range reads, tailing and filtering for the sync log.
+- Positions in the log are byte offsets, used as cursors: read_after() returns only
+  the complete lines written since a cursor, tail() seeks back from the end, and
+  read_before() pages further back. Cost is proportional to the lines returned.
+- LogIndex keeps a small SQLite sidecar with one row per line (offset, level,
+  file name mentioned), appended incrementally, so level/file filters read just
+  the matching lines.
+- A log that shrinks (truncated or rotated) resets the index and the cursors.
+- Lines are split on b'\n' only, so offsets stay exact with '\r\n', invalid UTF-8
+  or U+2028 in the log. LineFilter applies the same level/file test as the index
+  for lines read straight from the file (the live stream).
+"""
+import os
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+
+READ_BLOCK_SIZE = 64 * 1024
+MAX_READ_BYTES = 256 * 1024      # per range read
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+LEVEL_PATTERN = re.compile(r' - (DEBUG|INFO|WARNING|ERROR|CRITICAL): ')
+FILE_PATTERN = re.compile(r'([^\s/\\→:\'"]+\.[A-Za-z0-9]{1,5})\b')
+
+# rows: matching (offset, line) pairs. start/end: byte range of every line the index
+# scanned (matching or not), for cursors. full: the scan hit the limit, more may follow.
+LogPage = namedtuple('LogPage', 'rows start end full')
+
+def line_level(line):
+    match = LEVEL_PATTERN.search(line)
+    return LEVELS[match.group(1)] if match else None
+
+def line_file(line):
+    """Last file name mentioned in a line (lower-case), used as the filter key."""
+    names = FILE_PATTERN.findall(line.split(': ', 1)[-1])
+    return names[-1].lower() if names else None
+
+def file_key(file):
+    """Index key for a file= filter value."""
+    return line_file(file) or file.lower()
+
+def _decode_line(raw):
+    return raw.decode('utf-8', errors='replace').rstrip('\r')
+
+class LineFilter:
+    """
+    The test LogIndex.query applies, for lines read in order: lines without a
+    level (tracebacks) inherit the previous line's, and file= must be the line's
+    last file name and appear in the line.
+    """
+
+    def __init__(self, min_level=None, file=None, last_level=LEVELS['INFO']):
+        self.min_level = min_level
+        self.file = file.lower() if file else None
+        self.key = file_key(file) if file else None
+        self.last_level = last_level
+
+    def __call__(self, line):
+        level = line_level(line)
+        if level is None:
+            level = self.last_level
+        self.last_level = level
+        if self.min_level and level < self.min_level:
+            return False
+        return not self.file or (line_file(line) == self.key and self.file in line.lower())
+
+# --- Range reads ---
+def read_entries_after(path, cursor, max_bytes=MAX_READ_BYTES):
+    """
+    Complete lines after byte offset `cursor` as (offset after the line, line).
+    Returns (entries, new cursor, more).
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        if cursor > size:
+            cursor = 0  # the file was truncated or rotated
+        f.seek(cursor)
+        data = f.read(max_bytes)
+    end = data.rfind(b'\n') + 1
+    if end == 0 and len(data) >= max_bytes:
+        end = len(data)  # one huge line: hand it over in pieces
+    more = len(data) >= max_bytes and cursor + end < size
+    pieces = data[:end].split(b'\n')
+    if not pieces[-1]:
+        pieces.pop()  # nothing after the final newline
+    entries, offset = [], cursor
+    for raw in pieces:
+        offset = min(offset + len(raw) + 1, cursor + end)  # a piece of a huge line has no newline
+        entries.append((offset, _decode_line(raw)))
+    return entries, cursor + end, more
+
+def read_after(path, cursor, max_bytes=MAX_READ_BYTES):
+    """Complete lines after byte offset `cursor`. Returns (lines, new cursor, more)."""
+    entries, cursor, more = read_entries_after(path, cursor, max_bytes)
+    return [line for _, line in entries], cursor, more
+
+def read_before(path, offset, count):
+    """Up to `count` complete lines ending before byte offset `offset`. Returns (lines, start offset)."""
+    with open(path, 'rb') as f:
+        offset = position = min(offset, f.seek(0, os.SEEK_END))
+        data = b''
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(READ_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    if position > 0:
+        # Drop the partial first line; it belongs to the next page back
+        cut = data.find(b'\n') + 1
+        data, position = data[cut:], position + cut
+    lines = data.split(b'\n')
+    if lines and lines[-1] == b'':
+        lines.pop()
+    lines = lines[-count:] if count else []
+    start = offset - sum(len(line) + 1 for line in lines)
+    return [_decode_line(line) for line in lines], max(start, 0)
+
+def complete_end(path):
+    """Offset just past the last complete line (a line still being written is left out)."""
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(READ_BLOCK_SIZE, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b'\n')
+            if newline != -1:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+def tail(path, count):
+    """Last `count` lines. Returns (lines, start offset, end cursor)."""
+    end = complete_end(path)
+    lines, start = read_before(path, end, count)
+    return lines, start, end
+
+# --- Filter index ---
+class LogIndex:
+    def __init__(self, log_path, index_path=None):
+        self.log_path = log_path
+        self.index_path = index_path or log_path + '.idx.sqlite'
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS lines (
+                offset INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL,
+                level INTEGER,
+                file TEXT
+            );
+            CREATE INDEX IF NOT EXISTS lines_level ON lines (level, offset);
+            CREATE INDEX IF NOT EXISTS lines_file ON lines (file, offset);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+        """)
+
+    def _meta(self, name):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def catch_up(self):
+        """Index lines appended since the last call. Returns the indexed end offset."""
+        with self.lock:
+            indexed = self._meta('indexed_to')
+            last_level = self._meta('last_level') or LEVELS['INFO']
+            try:
+                size = os.path.getsize(self.log_path)
+            except OSError:
+                return 0
+            if size < indexed:
+                self.db.execute("DELETE FROM lines")
+                indexed = 0
+            if size == indexed:
+                return indexed
+            rows = []
+            with open(self.log_path, 'rb') as f:
+                f.seek(indexed)
+                offset = indexed
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break  # still being written
+                    line = raw.decode('utf-8', errors='replace')
+                    level = line_level(line)
+                    if level is None:
+                        level = last_level  # traceback / continuation line
+                    last_level = level
+                    rows.append((offset, len(raw), level, line_file(line)))
+                    offset += len(raw)
+            self.db.execute('BEGIN')
+            self.db.executemany("INSERT OR REPLACE INTO lines (offset, length, level, file) VALUES (?, ?, ?, ?)", rows)
+            self._set_meta('indexed_to', offset)
+            self._set_meta('last_level', last_level)
+            self.db.execute('COMMIT')
+            return offset
+
+    def query(self, min_level=None, file=None, after=None, before=None, limit=200):
+        """
+        Matching lines, oldest first. With `before` (or no bounds) the newest `limit`
+        index rows are scanned; with `after` the oldest ones. Rows that fail the full
+        file= text check are dropped, so page from the returned LogPage's start/end
+        rather than from the matches.
+        """
+        self.catch_up()
+        clauses, params = [], []
+        if min_level:
+            clauses.append("level >= ?")
+            params.append(min_level)
+        if file:
+            clauses.append("file = ?")
+            params.append(file_key(file))
+        if after is not None:
+            clauses.append("offset >= ?")
+            params.append(after)
+        if before is not None:
+            clauses.append("offset < ?")
+            params.append(before)
+        where = ' AND '.join(clauses) or '1'
+        order = 'ASC' if after is not None else 'DESC'
+        with self.lock:
+            rows = self.db.execute(f"SELECT offset, length FROM lines WHERE {where} "
+                                   f"ORDER BY offset {order} LIMIT ?", params + [limit]).fetchall()
+        rows.sort()
+        if not rows:
+            return LogPage([], None, None, False)
+        result = []
+        with open(self.log_path, 'rb') as f:
+            for offset, length in rows:
+                f.seek(offset)
+                line = _decode_line(f.read(length).rstrip(b'\n'))
+                # The index narrows by the last file name; confirm the full filter text
+                if file and file.lower() not in line.lower():
+                    continue
+                result.append((offset, line))
+        return LogPage(result, rows[0][0], rows[-1][0] + rows[-1][1], len(rows) == limit)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,305 @@
+"""
+In-process metrics and trace spans for the sync scripts and the web demo.
+- Counters, gauges and histograms with labels, rendered in the Prometheus text
+  format by render(). No dependencies; everything is guarded by one lock.
+- stage(name) times a pipeline stage: a latency histogram, a bytes counter (for
+  bytes/sec via rate()), an error counter and a trace span, all labelled by stage.
+- instrument_client(s3) hooks botocore's events to record per-operation S3
+  latency, retries and errors for every call made through that client.
+- add_collector(prefix, fn) exports an existing stats() dict (pipeline queue depth,
+  cache hits, ...) as gauges, read fresh on every scrape.
+- span(name) records nested spans (trace id, parent, duration, attributes) in a
+  small ring buffer; recent_spans() returns them for /traces.
+- serve(port) starts a tiny HTTP server with /metrics and /traces in a daemon thread.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TRACE_BUFFER = 1000        # finished spans kept for /traces
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# --- Metric types ---
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, lock):
+        self.name = name
+        self.help = help
+        self.lock = lock
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(_label_key(labels), 0)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self.values.items()]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, lock, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.lock = lock
+        self.buckets = tuple(buckets)
+        self.values = {}   # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self.lock:
+            state = self.values.get(_label_key(labels))
+            return state[-1] if state else 0
+
+    def samples(self):
+        rows = []
+        for key, state in self.values.items():
+            for bound, hits in zip(self.buckets, state):
+                rows.append((self.name + '_bucket', key + (('le', _format_value(float(bound))),), hits))
+            rows.append((self.name + '_bucket', key + (('le', '+Inf'),), state[-1]))
+            rows.append((self.name + '_sum', key, state[-2]))
+            rows.append((self.name + '_count', key, state[-1]))
+        return rows
+
+# --- Registry ---
+class Registry:
+    def __init__(self, namespace='s3sync'):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+
+    def _get(self, cls, name, help, **kwargs):
+        name = f"{self.namespace}_{name}" if self.namespace else name
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, self.lock, **kwargs)
+            return metric
+
+    def counter(self, name, help=''):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=''):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help='', buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def add_collector(self, prefix, fn, **labels):
+        """Export the numeric values of fn()'s dict as gauges named <prefix>_<key>."""
+        with self.lock:
+            self.collectors.append((prefix, fn, labels))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                for name, key, value in metric.samples():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            collectors = list(self.collectors)
+        for prefix, fn, labels in collectors:
+            try:
+                stats = fn()
+            except Exception:
+                continue  # a broken collector must not break the scrape
+            for field, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{self.namespace}_{prefix}_{field}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# --- Shared metrics ---
+STAGE_SECONDS = REGISTRY.histogram('stage_duration_seconds', 'Time spent in each pipeline stage')
+STAGE_BYTES = REGISTRY.counter('stage_bytes_total', 'Bytes processed by each pipeline stage')
+STAGE_ERRORS = REGISTRY.counter('stage_errors_total', 'Pipeline stage failures')
+QUEUE_WAIT = REGISTRY.histogram('queue_wait_seconds', 'Time a unit of work waited before a worker picked it up')
+S3_SECONDS = REGISTRY.histogram('s3_request_duration_seconds', 'S3 API call latency, retries included')
+S3_RETRIES = REGISTRY.counter('s3_retries_total', 'S3 request attempts retried by botocore')
+S3_ERRORS = REGISTRY.counter('s3_errors_total', 'S3 API calls that failed')
+
+# --- Trace spans ---
+_spans = deque(maxlen=TRACE_BUFFER)
+_local = threading.local()
+
+def _new_id():
+    return f"{random.getrandbits(64):016x}"
+
+@contextmanager
+def span(name, **attrs):
+    """Record a span; spans opened inside it (same thread) become its children."""
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    record = {
+        'name': name,
+        'trace_id': parent['trace_id'] if parent else _new_id(),
+        'span_id': _new_id(),
+        'parent_id': parent['span_id'] if parent else None,
+        'start': time.time(),
+        'attrs': attrs
+    }
+    stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = str(e)
+        raise
+    finally:
+        record['duration'] = round(time.perf_counter() - start, 6)
+        stack.pop()
+        _spans.append(record)
+
+def recent_spans(limit=100, name=None):
+    spans = [s for s in list(_spans) if name is None or s['name'] == name]
+    return spans[-limit:]
+
+@contextmanager
+def stage(name, nbytes=None, **attrs):
+    """
+    Time a pipeline stage. nbytes may be given up front or set later through the
+    yielded span (record['bytes'] = n) once the size is known.
+    """
+    start = time.perf_counter()
+    with span(name, **attrs) as record:
+        if nbytes is not None:
+            record['bytes'] = nbytes
+        try:
+            yield record
+        except Exception:
+            STAGE_ERRORS.inc(stage=name)
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+            if record.get('bytes'):
+                STAGE_BYTES.inc(record['bytes'], stage=name)
+
+# --- botocore instrumentation ---
+def instrument_client(client):
+    """Record latency/retries/errors for every call on a boto3 client (no-op for stand-ins)."""
+    events = getattr(getattr(client, 'meta', None), 'events', None)
+    if events is None:
+        return client
+
+    def before_call(model, context, **kwargs):
+        context['metrics_start'] = time.perf_counter()
+
+    def after_call(http_response, parsed, model, context, **kwargs):
+        operation = model.name
+        start = context.get('metrics_start')
+        if start is not None:
+            S3_SECONDS.observe(time.perf_counter() - start, operation=operation)
+        metadata = parsed.get('ResponseMetadata', {})
+        if metadata.get('RetryAttempts'):
+            S3_RETRIES.inc(metadata['RetryAttempts'], operation=operation)
+        status = metadata.get('HTTPStatusCode') or getattr(http_response, 'status_code', 200)
+        if status >= 400:
+            S3_ERRORS.inc(operation=operation, code=parsed.get('Error', {}).get('Code', str(status)))
+
+    def after_call_error(model, context, exception, **kwargs):
+        start = context.get('metrics_start')
+        if start is not None:
+            S3_SECONDS.observe(time.perf_counter() - start, operation=model.name)
+        S3_ERRORS.inc(operation=model.name, code=type(exception).__name__)
+
+    events.register('before-call.s3', before_call)
+    events.register('after-call.s3', after_call)
+    events.register('after-call-error.s3', after_call_error)
+    return client
+
+# --- Embedded endpoint ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            body, content_type = self.registry.render().encode('utf-8'), CONTENT_TYPE
+        elif path == '/traces':
+            body, content_type = json.dumps(recent_spans(TRACE_BUFFER)).encode('utf-8'), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the sync log
+
+def serve(port=None, host='127.0.0.1', registry=REGISTRY):
+    """Serve /metrics and /traces from a daemon thread. Returns the server (port 0 picks one)."""
+    port = int(os.environ.get('METRICS_PORT', 9108)) if port is None else port
+    handler = type('Handler', (MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.getLogger(__name__).info(f"📈 Metrics on http://{host}:{server.server_port}/metrics")
+    return server
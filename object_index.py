@@ -0,0 +1,229 @@
+"""
+Local, persistent index of the bucket's objects (SQLite).
+- One row per key: size, ETag, last-modified and version id.
+- Kept current from the scripts' own writes (record_put / record_delete) and by
+  periodic paginated refreshes, so browsing doesn't need an S3 round-trip.
+- refresh() re-walks a prefix and sweeps keys that disappeared; refresh_new() only
+  lists keys after the newest one already known (cheap for timestamped prefixes
+  like 'auto-backups/').
+- list_dir() answers delimiter-style folder listings with a skip-scan over the
+  primary-key B-tree, so cost scales with the entries shown, not the bucket size.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 's3_index.sqlite')
+KEY_MAX = '\U0010ffff'  # sorts after any valid key suffix
+
+CURRENT_GENERATION = "(SELECT COALESCE(CAST(value AS INTEGER), 0) FROM meta WHERE name = 'generation')"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    version_id TEXT,
+    generation INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def prefix_upper(prefix):
+    return prefix + KEY_MAX
+
+def _iso(value):
+    if value is None:
+        return datetime.now(timezone.utc).isoformat()
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+class ObjectIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    # --- Writes from our own scripts ---
+    def record_put(self, key, size, etag=None, version_id=None, last_modified=None):
+        with self.lock:
+            # Stamp with the current generation so a refresh running now won't sweep it
+            self.db.execute(
+                "INSERT INTO objects (key, size, etag, last_modified, version_id, generation) "
+                f"VALUES (?, ?, ?, ?, ?, COALESCE({CURRENT_GENERATION}, 0)) "
+                "ON CONFLICT(key) DO UPDATE SET size=excluded.size, etag=excluded.etag, "
+                "last_modified=excluded.last_modified, version_id=excluded.version_id, "
+                "generation=excluded.generation",
+                (key, size, etag, _iso(last_modified), version_id))
+
+    def record_delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM objects WHERE key = ?", (key,))
+
+    def record_delete_prefix(self, prefix):
+        with self.lock:
+            self.db.execute("DELETE FROM objects WHERE key >= ? AND key < ?", (prefix, prefix_upper(prefix)))
+
+    # --- Refresh from S3 ---
+    def _upsert_page(self, contents, generation):
+        rows = [(obj['Key'], obj['Size'], obj.get('ETag'), _iso(obj.get('LastModified')), generation)
+                for obj in contents]
+        self.db.executemany(
+            "INSERT INTO objects (key, size, etag, last_modified, generation) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET size=excluded.size, etag=excluded.etag, "
+            "last_modified=excluded.last_modified, generation=excluded.generation", rows)
+
+    def refresh(self, client, bucket, prefix=''):
+        """Re-list a prefix page by page and drop keys that no longer exist. Returns key count."""
+        with self.lock:
+            generation = int(self.get_meta('generation') or 0) + 1
+            self.set_meta('generation', generation)
+        count = 0
+        paginator = client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            contents = page.get('Contents', [])
+            with self.lock:
+                self.db.execute('BEGIN')
+                self._upsert_page(contents, generation)
+                self.db.execute('COMMIT')
+            count += len(contents)
+        with self.lock:
+            self.db.execute("DELETE FROM objects WHERE key >= ? AND key < ? AND generation < ?",
+                            (prefix, prefix_upper(prefix), generation))
+            self.set_meta('refreshed:' + prefix, datetime.now(timezone.utc).isoformat())
+        return count
+
+    def refresh_new(self, client, bucket, prefix=''):
+        """Delta refresh: only list keys sorting after the newest one already indexed."""
+        with self.lock:
+            row = self.db.execute("SELECT MAX(key) FROM objects WHERE key >= ? AND key < ?",
+                                  (prefix, prefix_upper(prefix))).fetchone()
+            generation = int(self.get_meta('generation') or 0)
+        params = {'Bucket': bucket, 'Prefix': prefix}
+        if row and row[0]:
+            params['StartAfter'] = row[0]
+        count = 0
+        paginator = client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**params):
+            contents = page.get('Contents', [])
+            with self.lock:
+                self.db.execute('BEGIN')
+                self._upsert_page(contents, generation)
+                self.db.execute('COMMIT')
+            count += len(contents)
+        return count
+
+    # --- Queries ---
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT key, size, etag, last_modified, version_id FROM objects WHERE key = ?",
+                (key,)).fetchone()
+        return self._record(row) if row else None
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def prefix_exists(self, prefix):
+        with self.lock:
+            row = self.db.execute("SELECT 1 FROM objects WHERE key >= ? AND key < ? LIMIT 1",
+                                  (prefix, prefix_upper(prefix))).fetchone()
+        return row is not None
+
+    def is_refreshed(self, prefix=''):
+        return self.get_meta('refreshed:' + prefix) is not None
+
+    def last_refreshed(self, prefix=''):
+        """When refresh() last completed a full walk of the prefix (None if never)."""
+        value = self.get_meta('refreshed:' + prefix)
+        return datetime.fromisoformat(value) if value else None
+
+    def iter_objects(self, prefix='', start_after='', batch_size=1000):
+        """Yield object records under a prefix in key order, one batch query at a time."""
+        last = max(start_after, prefix) if start_after else None
+        upper = prefix_upper(prefix)
+        while True:
+            with self.lock:
+                if last is None:
+                    rows = self.db.execute(
+                        "SELECT key, size, etag, last_modified, version_id FROM objects "
+                        "WHERE key >= ? AND key < ? ORDER BY key LIMIT ?",
+                        (prefix, upper, batch_size)).fetchall()
+                else:
+                    rows = self.db.execute(
+                        "SELECT key, size, etag, last_modified, version_id FROM objects "
+                        "WHERE key > ? AND key < ? ORDER BY key LIMIT ?",
+                        (last, upper, batch_size)).fetchall()
+            for row in rows:
+                yield self._record(row)
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+
+    def list_dir(self, prefix='', delimiter='/', start_after='', limit=1000):
+        """
+        Delimiter listing like list_objects_v2: returns (objects, folders, next_token).
+        Each folder costs one index seek; its contents are skipped, not scanned.
+        """
+        objects, folders = [], []
+        upper = prefix_upper(prefix)
+        cursor = start_after or None
+        while len(objects) + len(folders) < limit:
+            with self.lock:
+                if cursor is None:
+                    row = self.db.execute(
+                        "SELECT key, size, etag, last_modified, version_id FROM objects "
+                        "WHERE key >= ? AND key < ? ORDER BY key LIMIT 1", (prefix, upper)).fetchone()
+                else:
+                    row = self.db.execute(
+                        "SELECT key, size, etag, last_modified, version_id FROM objects "
+                        "WHERE key > ? AND key < ? ORDER BY key LIMIT 1", (cursor, upper)).fetchone()
+            if row is None:
+                return objects, folders, None
+            key = row[0]
+            idx = key.find(delimiter, len(prefix)) if delimiter else -1
+            if idx != -1:
+                folder = key[:idx + len(delimiter)]
+                folders.append(folder)
+                cursor = folder + KEY_MAX
+            else:
+                objects.append(self._record(row))
+                cursor = key
+        # Only hand out a token if something is left after the cursor
+        with self.lock:
+            more = self.db.execute("SELECT 1 FROM objects WHERE key > ? AND key < ? LIMIT 1",
+                                   (cursor, upper)).fetchone()
+        return objects, folders, (cursor if more else None)
+
+    def stats(self, prefix=''):
+        with self.lock:
+            count, total = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects WHERE key >= ? AND key < ?",
+                (prefix, prefix_upper(prefix))).fetchone()
+        return {'objects': count, 'bytes': total}
+
+    # --- Meta ---
+    def get_meta(self, name):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+    @staticmethod
+    def _record(row):
+        key, size, etag, last_modified, version_id = row
+        return {'Key': key, 'Size': size, 'ETag': etag, 'LastModified': last_modified, 'VersionId': version_id}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
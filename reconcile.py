@@ -0,0 +1,99 @@
+"""
+Startup reconciliation for the folder watcher.
+- scan_local() walks the watch folder recursively with os.scandir, keeping only stat data.
+- SyncIndex is a small local cache of what was last synced (relative path → size, mtime),
+  updated by the watcher after every upload/delete.
+- If the cache is missing it is seeded from one paginated listing of the sync prefix.
+- diff() compares the two so a restart only uploads/deletes what changed while the
+  watcher was down, instead of re-uploading everything.
+"""
+import os
+import json
+import logging
+import threading
+from file_state import iter_files
+
+SYNC_INDEX_NAME = '.s3_sync_index.json'
+
+def relative_key(path, root):
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+def scan_local(root, allowed_extensions, skip=()):
+    """Return {relative path: (size, mtime_ns)} for every allowed file under root."""
+    found = {}
+    for rel, entry in iter_files(root, allowed_extensions, skip):
+        st = entry.stat(follow_symlinks=False)
+        found[rel] = (st.st_size, st.st_mtime_ns)
+    return found
+
+# --- Local cache of synced state ---
+class SyncIndex:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.loaded = False
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+                self.loaded = True
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Ignoring unreadable sync index {path}: {e}")
+
+    def record(self, rel, size, mtime_ns):
+        with self.lock:
+            self.entries[rel] = {'size': size, 'mtime_ns': mtime_ns}
+            self.dirty = True
+
+    def remove(self, rel):
+        with self.lock:
+            if self.entries.pop(rel, None) is not None:
+                self.dirty = True
+
+    def seed_from_remote(self, client, bucket, prefix, allowed_extensions, skip=()):
+        # Remote LastModified stands in for the local mtime we never recorded
+        paginator = client.get_paginator('list_objects_v2')
+        with self.lock:
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    rel = obj['Key'][len(prefix):]
+                    if obj['Key'].startswith(skip) or not rel.lower().endswith(allowed_extensions):
+                        continue
+                    self.entries[rel] = {
+                        'size': obj['Size'],
+                        'mtime_ns': int(obj['LastModified'].timestamp() * 1e9),
+                        'remote': True
+                    }
+            self.dirty = True
+        return len(self.entries)
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(self.entries)
+            self.dirty = False
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.path)
+
+def diff(local, index):
+    """Return (relative paths to upload, relative paths to delete remotely)."""
+    to_upload = []
+    with index.lock:
+        entries = dict(index.entries)
+    for rel, (size, mtime_ns) in local.items():
+        entry = entries.get(rel)
+        if entry is None or entry['size'] != size:
+            to_upload.append(rel)
+        elif entry.get('remote'):
+            # S3 LastModified has one-second resolution
+            if mtime_ns // 10**9 > entry['mtime_ns'] // 10**9:
+                to_upload.append(rel)
+        elif entry['mtime_ns'] != mtime_ns:
+            to_upload.append(rel)
+    to_delete = [rel for rel in entries if rel not in local]
+    return to_upload, to_delete
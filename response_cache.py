@@ -0,0 +1,110 @@
+"""
+Bounded in-memory cache of small objects for the web demo's previews and editor.
+- Entries are keyed by (key, version id) and hold the body plus ETag/type/date.
+- A specific version never changes, so it is served straight from memory.
+- The latest version is trusted for FRESH_FOR seconds, then revalidated with a
+  conditional GET (IfNoneMatch=<cached ETag>): a 304 costs one request and no body.
+- Least recently used entries are evicted once MAX_BYTES of bodies are held;
+  objects over MAX_OBJECT_BYTES are never cached and are handed back as the open
+  S3 response so the caller can stream them.
+- Writers call invalidate()/invalidate_prefix() so edits show up immediately.
+"""
+import time
+import threading
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+
+MAX_BYTES = 64 * 1024 * 1024
+MAX_OBJECT_BYTES = 4 * 1024 * 1024
+FRESH_FOR = 5     # seconds a cached latest version is served without asking S3
+
+class ObjectCache:
+    def __init__(self, client, bucket, max_bytes=MAX_BYTES, max_object_bytes=MAX_OBJECT_BYTES,
+                 fresh_for=FRESH_FOR):
+        self.client = client
+        self.bucket = bucket
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.fresh_for = fresh_for
+        self.entries = OrderedDict()   # (key, version_id) -> entry dict
+        self.size = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.epoch = 0                 # bumped by every invalidation
+        self.lock = threading.Lock()
+
+    def get(self, key, version_id=None):
+        """
+        Return an entry: {'body', 'etag', 'content_type', 'last_modified'} from the
+        cache, or {'stream': <get_object response>} for objects too big to cache.
+        """
+        cache_key = (key, version_id)
+        with self.lock:
+            epoch = self.epoch
+            entry = self.entries.get(cache_key)
+            if entry is not None:
+                self.entries.move_to_end(cache_key)
+                if version_id or time.monotonic() - entry['checked_at'] < self.fresh_for:
+                    self.hits += 1
+                    return entry
+
+        params = {'Bucket': self.bucket, 'Key': key}
+        if version_id:
+            params['VersionId'] = version_id
+        if entry is not None:
+            params['IfNoneMatch'] = entry['etag']
+        try:
+            obj = self.client.get_object(**params)
+        except ClientError as e:
+            if entry is not None and e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304:
+                with self.lock:
+                    entry['checked_at'] = time.monotonic()
+                    self.revalidated += 1
+                return entry
+            raise
+
+        with self.lock:
+            self.misses += 1
+        if obj['ContentLength'] > self.max_object_bytes:
+            with self.lock:
+                self._drop(cache_key)
+            return {'stream': obj}
+        body = obj['Body'].read()
+        entry = {
+            'body': body,
+            'etag': obj.get('ETag'),
+            'content_type': obj.get('ContentType', 'application/octet-stream'),
+            'last_modified': obj.get('LastModified'),
+            'checked_at': time.monotonic()
+        }
+        with self.lock:
+            if self.epoch != epoch:
+                return entry  # a write landed while we were fetching; don't cache what we read
+            self._drop(cache_key)
+            self.entries[cache_key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes and self.entries:
+                self._drop(next(iter(self.entries)))
+        return entry
+
+    def _drop(self, cache_key):
+        entry = self.entries.pop(cache_key, None)
+        if entry is not None:
+            self.size -= len(entry['body'])
+
+    def invalidate(self, key, version_id=None):
+        with self.lock:
+            self.epoch += 1
+            self._drop((key, version_id))
+
+    def invalidate_prefix(self, prefix):
+        with self.lock:
+            self.epoch += 1
+            for cache_key in [k for k in self.entries if k[0].startswith(prefix) and k[1] is None]:
+                self._drop(cache_key)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits,
+                    'revalidated': self.revalidated, 'misses': self.misses}
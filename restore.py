@@ -0,0 +1,257 @@
+"""
+Parallel bulk restore of snapshots, prefixes and point-in-time folder states.
+- What to restore is resolved up front into (key, version, relative path) items:
+  a snapshot's '_index.json' (unchanged files point into earlier snapshots),
+  every object under a prefix, or for "as of T" the newest version of each key
+  at T from one paginated list_object_versions walk (keys deleted at T are left out).
+- Many files download at once; objects over PART_SIZE are fetched as concurrent
+  ranged GETs pinned to the listed version/ETag, so nothing changes underneath.
+- Each file is written to '<name>.part' and only renamed into place once complete
+  and verified (SHA-256 from the snapshot index, otherwise the S3 ETag).
+- A '<name>.part.json' sidecar records finished parts: rerunning an interrupted
+  restore skips verified files and refetches only the missing parts.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from backup_manifest import read_snapshot_index, file_sha256, SNAPSHOT_INDEX_NAME
+from file_state import etag_with_parts, guess_part_size
+from retention import iter_version_groups
+import metrics
+
+PART_SIZE = 8 * 1024 * 1024
+MAX_FILES_IN_FLIGHT = 8
+MAX_PARTS_PER_FILE = 4
+READ_BLOCK_SIZE = 1024 * 1024
+
+RestoreItem = namedtuple('RestoreItem', 'key version_id rel size etag sha256 modified',
+                         defaults=(None, None, None))
+RestoreResult = namedtuple('RestoreResult', 'rel path size elapsed error status')
+
+# --- Resolving what to restore ---
+def resolve_prefix(client, bucket, prefix):
+    """Latest version of every object under prefix."""
+    items = []
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            rel = obj['Key'][len(prefix):]
+            if not rel or rel.endswith('/') or rel == SNAPSHOT_INDEX_NAME:
+                continue
+            items.append(RestoreItem(obj['Key'], None, rel, obj['Size'], obj.get('ETag'),
+                                     modified=obj.get('LastModified')))
+    return items
+
+def resolve_snapshot(client, bucket, snapshot_prefix):
+    """Files of a snapshot: from its '_index.json' when it has one, else its own objects."""
+    try:
+        index = read_snapshot_index(client, bucket, snapshot_prefix)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            raise
+        return resolve_prefix(client, bucket, snapshot_prefix)
+    return [RestoreItem(entry['key'], None, name, entry['size'], sha256=entry.get('sha256'))
+            for name, entry in index.items()]
+
+def resolve_as_of(client, bucket, prefix, when):
+    """The version of every key under prefix that was current at `when` (aware datetime)."""
+    items = []
+    for key, versions in iter_version_groups(client, bucket, prefix):
+        rel = key[len(prefix):]
+        if not rel or rel.endswith('/') or rel == SNAPSHOT_INDEX_NAME:
+            continue
+        current = max((v for v in versions if v.modified <= when), key=lambda v: v.modified, default=None)
+        if current is None or current.is_marker:
+            continue  # didn't exist yet, or was deleted at that time
+        items.append(RestoreItem(key, current.version_id, rel, current.size, current.etag,
+                                 modified=current.modified))
+    return items
+
+# --- Verification ---
+def etag_matches(path, size, etag):
+    """True/False when the ETag is an MD5-style one we can recompute, None otherwise."""
+    etag = (etag or '').strip('"')
+    digest = etag.split('-', 1)[0]
+    if len(digest) != 32:
+        return None
+    part_size = guess_part_size(size, etag) if '-' in etag else None
+    return etag_with_parts(path, part_size) == etag
+
+def verify(path, item):
+    if item.sha256:
+        return file_sha256(path) == item.sha256
+    return etag_matches(path, item.size, item.etag) is not False
+
+# --- Engine ---
+class RestoreEngine:
+    def __init__(self, client, bucket, dest, max_files=MAX_FILES_IN_FLIGHT,
+                 max_parts=MAX_PARTS_PER_FILE, part_size=PART_SIZE, logger=None):
+        self.client = client
+        self.bucket = bucket
+        self.dest = os.path.abspath(dest)
+        self.max_files = max_files
+        self.part_size = part_size
+        self.parts_pool = ThreadPoolExecutor(max_workers=max_files * max_parts)
+        self.logger = logger or logging.getLogger(__name__)
+
+    def target_path(self, rel):
+        path = os.path.abspath(os.path.join(self.dest, rel))
+        if not path.startswith(self.dest + os.sep):
+            raise ValueError(f"Refusing to restore outside {self.dest}: {rel}")
+        return path
+
+    def restore(self, items):
+        """Restore items concurrently, yielding a RestoreResult per file as it finishes."""
+        items = iter(items)
+        window = self.max_files * 2
+        with ThreadPoolExecutor(max_workers=self.max_files) as pool:
+            pending = set()
+            for item in items:
+                pending.add(pool.submit(self._restore_file, item))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def close(self):
+        self.parts_pool.shutdown()
+
+    def _restore_file(self, item):
+        start = time.monotonic()
+        path = None
+        try:
+            path = self.target_path(item.rel)
+            if os.path.exists(path) and os.path.getsize(path) == item.size and verify(path, item):
+                return RestoreResult(item.rel, path, item.size, 0.0, None, 'skipped')
+            with metrics.stage('restore_file', nbytes=item.size, key=item.key):
+                resumed = self._download(item, path)
+            return RestoreResult(item.rel, path, item.size, time.monotonic() - start, None,
+                                 'resumed' if resumed else 'restored')
+        except Exception as e:
+            return RestoreResult(item.rel, path, 0, time.monotonic() - start, e, 'failed')
+
+    def _download(self, item, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.part'
+        state_path = tmp_path + '.json'
+        identity = {'key': item.key, 'version_id': item.version_id, 'etag': item.etag,
+                    'size': item.size, 'part_size': self.part_size}
+        done = set()
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if state['identity'] == identity and os.path.getsize(tmp_path) == item.size:
+                done = set(state['done'])
+        except (OSError, ValueError, KeyError):
+            pass
+        resumed = bool(done)
+        if not done:
+            with open(tmp_path, 'wb') as f:
+                f.truncate(item.size)  # preallocate so parts can land in any order
+
+        ranges = [(number, offset, min(offset + self.part_size, item.size) - 1)
+                  for number, offset in enumerate(range(0, item.size, self.part_size), 1)]
+        lock = threading.Lock()
+
+        def fetch(part):
+            number, first, last = part
+            params = {'Bucket': self.bucket, 'Key': item.key}
+            if item.version_id:
+                params['VersionId'] = item.version_id
+            elif item.etag:
+                params['IfMatch'] = item.etag  # the object must not change mid-restore
+            if len(ranges) > 1:
+                params['Range'] = f"bytes={first}-{last}"
+            with metrics.stage('restore_part', nbytes=last - first + 1, key=item.key, part=number):
+                body = self.client.get_object(**params)['Body']
+                with open(tmp_path, 'r+b') as f:
+                    f.seek(first)
+                    for block in iter(lambda: body.read(READ_BLOCK_SIZE), b''):
+                        f.write(block)
+            with lock:
+                done.add(number)
+                self._save_state(state_path, identity, done)
+
+        futures = [self.parts_pool.submit(fetch, part) for part in ranges if part[0] not in done]
+        for future in futures:
+            future.result()
+
+        if not verify(tmp_path, item):
+            os.remove(tmp_path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            raise ValueError(f"Checksum mismatch restoring {item.key}")
+        os.replace(tmp_path, path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        if item.modified is not None:
+            stamp = item.modified.timestamp()
+            os.utime(path, (stamp, stamp))
+        return resumed
+
+    @staticmethod
+    def _save_state(state_path, identity, done):
+        tmp = state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'identity': identity, 'done': sorted(done)}, f)
+        os.replace(tmp, state_path)
+
+def run_restore(client, bucket, items, dest, logger=None, **engine_options):
+    """Restore resolved items into dest, logging progress. Returns (restored, skipped, failed)."""
+    logger = logger or logging.getLogger(__name__)
+    engine = RestoreEngine(client, bucket, dest, logger=logger, **engine_options)
+    restored = skipped = failed = 0
+    total_bytes = 0
+    start = time.monotonic()
+    try:
+        for result in engine.restore(items):
+            if result.error:
+                failed += 1
+                logger.error(f"❌ Failed to restore {result.rel}: {result.error}")
+            elif result.status == 'skipped':
+                skipped += 1
+            else:
+                restored += 1
+                total_bytes += result.size
+                logger.info(f"📥 Restored{' (resumed)' if result.status == 'resumed' else ''}: {result.rel}")
+    finally:
+        engine.close()
+    elapsed = time.monotonic() - start
+    logger.info(f"✅ Restore finished in {elapsed:.1f}s: {restored} restored ({total_bytes} bytes), "
+                f"{skipped} already up to date, {failed} failed")
+    return restored, skipped, failed
+
+# --- Run from the command line ---
+if __name__ == "__main__":
+    import argparse
+    from s3_clients import get_client
+
+    logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+    parser = argparse.ArgumentParser(description="Restore a snapshot, a prefix, or a prefix as of a point in time.")
+    parser.add_argument('prefix', help="e.g. 'auto-backups/2025-07-04_16-00-00/' or 'live-sync/'")
+    parser.add_argument('dest', help="local folder to restore into")
+    parser.add_argument('--as-of', help="ISO time, e.g. 2025-07-04T16:00 (local time unless an offset is given)")
+    parser.add_argument('--bucket', default='24030142014')
+    args = parser.parse_args()
+
+    s3 = get_client()
+    prefix = args.prefix if args.prefix.endswith('/') else args.prefix + '/'
+    if args.as_of:
+        when = datetime.fromisoformat(args.as_of)
+        when = when.astimezone(timezone.utc) if when.tzinfo else when.astimezone().astimezone(timezone.utc)
+        items = resolve_as_of(s3, args.bucket, prefix, when)
+        logging.info(f"🕰️ {len(items)} file(s) under {prefix} as of {when.isoformat()}")
+    else:
+        items = resolve_snapshot(s3, args.bucket, prefix)
+        logging.info(f"🗂️ {len(items)} file(s) in {prefix}")
+    run_restore(s3, args.bucket, items, args.dest)
@@ -0,0 +1,220 @@
+"""
+Backup retention and compaction.
+- Snapshot prefixes ('auto-backups/<timestamp>/') are thinned with a
+  grandfather-father-son policy: keep the last N, plus the newest snapshot in each
+  of the last N hours, days and ISO weeks.
+- Every key is also capped at max_versions stored versions (the watcher's ZIP
+  backups pile up as noncurrent versions under bucket versioning); stale delete
+  markers are cleaned up too.
+- Everything is worked out from one paginated list_object_versions walk of the
+  root prefix; only snapshot keys are held until the walk ends, other keys are
+  decided as soon as all their versions have been seen.
+- Objects in an expired snapshot that a kept incremental snapshot's '_index.json'
+  still points at are kept, so no surviving snapshot loses data.
+- Deletions remove specific versions (not just add delete markers), batched
+  1,000 per delete_objects call; dry_run only plans and reports.
+"""
+import time
+import logging
+from datetime import datetime
+from collections import namedtuple
+from botocore.exceptions import ClientError
+from backup_manifest import read_snapshot_index
+import bulk_ops
+
+SNAPSHOT_TIME_FORMAT = '%Y-%m-%d_%H-%M-%S'
+
+RetentionPolicy = namedtuple('RetentionPolicy', 'keep_last hourly daily weekly max_versions',
+                             defaults=(5, 24, 7, 4, 10))
+
+# One stored version as seen by the walk
+Version = namedtuple('Version', 'key version_id modified size is_marker is_latest etag', defaults=(None,))
+
+class RetentionPlan:
+    def __init__(self, root):
+        self.root = root
+        self.kept_snapshots = []
+        self.expired_snapshots = []
+        self.deletions = []            # (key, version_id)
+        self.removed_keys = set()      # keys whose current version goes away
+        self.protected = 0             # objects kept because a kept snapshot references them
+        self.versions_seen = 0
+        self.bytes_reclaimed = 0
+        self.list_calls = 0
+        self.elapsed = 0.0
+
+    def delete(self, version):
+        self.deletions.append((version.key, version.version_id))
+        self.bytes_reclaimed += version.size
+        if version.is_latest:
+            self.removed_keys.add(version.key)
+
+    def summary(self):
+        return (f"{self.root}: {len(self.kept_snapshots)} snapshot(s) kept, "
+                f"{len(self.expired_snapshots)} expired, {len(self.deletions)} of "
+                f"{self.versions_seen} version(s) to delete ({self.bytes_reclaimed} bytes), "
+                f"{self.protected} referenced object(s) kept; planned in {self.elapsed:.2f}s "
+                f"with {self.list_calls} list call(s)")
+
+# --- Snapshot selection ---
+def snapshot_time(name):
+    try:
+        return datetime.strptime(name, SNAPSHOT_TIME_FORMAT)
+    except ValueError:
+        return None
+
+def select_snapshots(times, policy):
+    """Return the set of snapshot times the policy keeps."""
+    ordered = sorted(times, reverse=True)
+    keep = set(ordered[:max(1, policy.keep_last)])  # never drop the newest snapshot
+    periods = (
+        (policy.hourly, lambda t: (t.date(), t.hour)),
+        (policy.daily, lambda t: t.date()),
+        (policy.weekly, lambda t: t.isocalendar()[:2]),
+    )
+    for count, period_of in periods:
+        seen = set()
+        for t in ordered:
+            period = period_of(t)
+            if period in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(period)
+            keep.add(t)
+    return keep
+
+# --- Version rules ---
+def prune_versions(versions, max_versions, plan):
+    """Apply the per-key version cap to one key's versions (newest first)."""
+    kept_data = 0
+    deleted_data = 0
+    for v in versions:
+        if v.is_marker:
+            if not v.is_latest:
+                plan.delete(v)  # a marker buried under newer versions does nothing
+            continue
+        kept_data += 1
+        if max_versions and kept_data > max_versions:
+            plan.delete(v)
+            deleted_data += 1
+    latest = versions[0]
+    if latest.is_marker and deleted_data == kept_data:
+        plan.delete(latest)     # nothing left behind the marker
+
+def sort_versions(versions):
+    # Latest first, then newest to oldest
+    return sorted(versions, key=lambda v: (not v.is_latest, -v.modified.timestamp()))
+
+def iter_version_groups(client, bucket, root, plan=None):
+    """Yield (key, [Version]) once every version of the key has been listed."""
+    paginator = client.get_paginator('list_object_versions')
+    pending = {}
+    for page in paginator.paginate(Bucket=bucket, Prefix=root):
+        if plan is not None:
+            plan.list_calls += 1
+        for item in page.get('Versions', []):
+            pending.setdefault(item['Key'], []).append(Version(
+                item['Key'], item['VersionId'], item['LastModified'], item.get('Size', 0), False, item['IsLatest'],
+                item.get('ETag')))
+        for item in page.get('DeleteMarkers', []):
+            pending.setdefault(item['Key'], []).append(Version(
+                item['Key'], item['VersionId'], item['LastModified'], 0, True, item['IsLatest']))
+        # Keys before the next marker are complete; the marker key may continue
+        boundary = page.get('NextKeyMarker') if page.get('IsTruncated') else None
+        for key in sorted(pending):
+            if boundary is not None and key >= boundary:
+                break
+            yield key, sort_versions(pending.pop(key))
+    for key in sorted(pending):
+        yield key, sort_versions(pending[key])
+
+# --- Planning ---
+def referenced_keys(client, bucket, root, snapshot_names):
+    """Keys that kept incremental snapshots point at through their '_index.json'."""
+    keys = set()
+    for name in snapshot_names:
+        try:
+            index = read_snapshot_index(client, bucket, f"{root}{name}/")
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                continue  # full snapshot: holds its own files
+            raise
+        keys.update(entry['key'] for entry in index.values())
+    return keys
+
+def plan_retention(client, bucket, root, policy=RetentionPolicy(), snapshots=True):
+    """Walk every version under root once and work out what the policy deletes."""
+    start = time.monotonic()
+    plan = RetentionPlan(root)
+    by_snapshot = {}   # snapshot name -> [(key, [Version])]
+    for key, versions in iter_version_groups(client, bucket, root, plan):
+        plan.versions_seen += len(versions)
+        name = key[len(root):].split('/', 1)[0]
+        if snapshots and '/' in key[len(root):] and snapshot_time(name):
+            by_snapshot.setdefault(name, []).append((key, versions))
+        else:
+            prune_versions(versions, policy.max_versions, plan)
+
+    times = {snapshot_time(name): name for name in by_snapshot}
+    kept = {times[t] for t in select_snapshots(times, policy)}
+    plan.kept_snapshots = sorted(kept)
+    plan.expired_snapshots = sorted(set(by_snapshot) - kept)
+    protected = referenced_keys(client, bucket, root, plan.kept_snapshots) if plan.expired_snapshots else set()
+
+    for name, groups in by_snapshot.items():
+        expired = name not in kept
+        for key, versions in groups:
+            if expired and key not in protected:
+                for v in versions:
+                    plan.delete(v)
+            else:
+                if expired:
+                    plan.protected += 1
+                prune_versions(versions, policy.max_versions, plan)
+    plan.elapsed = time.monotonic() - start
+    return plan
+
+# --- Apply ---
+def apply_plan(client, bucket, plan, max_workers=bulk_ops.MAX_WORKERS, index=None, progress=None):
+    """Delete the planned versions in batches. Returns a bulk_ops.BulkReport."""
+    def on_deleted(item):
+        if index is not None and item[0] in plan.removed_keys:
+            index.record_delete(item[0])
+
+    return bulk_ops.delete_keys(client, bucket, plan.deletions, max_workers,
+                                progress=progress, on_deleted=on_deleted)
+
+def enforce_retention(client, bucket, root, policy=RetentionPolicy(), snapshots=True,
+                      dry_run=False, index=None, logger=None):
+    logger = logger or logging.getLogger(__name__)
+    plan = plan_retention(client, bucket, root, policy, snapshots)
+    logger.info(f"🧹 Retention plan — {plan.summary()}")
+    if dry_run:
+        for name in plan.expired_snapshots:
+            logger.info(f"   └── would expire snapshot {root}{name}/")
+        return plan, None
+    if not plan.deletions:
+        return plan, None
+    report = apply_plan(client, bucket, plan, index=index)
+    result = report.as_dict(include_failures=False)
+    logger.info(f"🗑️ Retention deleted {result['succeeded']} version(s) in {result['batches']} batch(es), "
+                f"{result['failed']} failed")
+    for failure in report.failed[:20]:
+        logger.error(f"❌ Couldn't delete {failure['Key']}: {failure['Code']} {failure['Message']}")
+    return plan, report
+
+# --- Run standalone (e.g. from cron) ---
+if __name__ == "__main__":
+    import sys
+    from s3_clients import get_client
+
+    logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+    bucket_name = '24030142014'
+    # root prefix -> whether it holds timestamped snapshot folders
+    RETENTION_ROOTS = {'auto-backups/': True, 'live-sync/backups/': False}
+    policy = RetentionPolicy()
+    dry_run = '--dry-run' in sys.argv
+    s3 = get_client()
+    for root, snapshots in RETENTION_ROOTS.items():
+        enforce_retention(s3, bucket_name, root, policy, snapshots, dry_run=dry_run)
@@ -0,0 +1,115 @@
+"""
+Lazily created, shared S3 clients and cached one-time bootstrap steps.
+- get_client() builds a client the first time it's asked for and hands the same
+  client to every later caller with the same settings (boto3 clients are
+  thread-safe). Importing a script no longer loads boto3, resolves credentials
+  or touches the network; that happens on first use.
+- lazy() turns a zero-argument factory into a cached, thread-safe accessor, for the
+  per-script objects built on top of the client (upload engine, local indexes, ...).
+- BootstrapCache records idempotent setup calls (folder markers, bucket versioning)
+  in a small local SQLite file. Later starts skip those S3 round trips until an
+  entry is older than BOOTSTRAP_TTL, so a setting changed behind our back is
+  still corrected eventually.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+import functools
+from upload_engine import client_config, MAX_CONNECTIONS
+import metrics
+
+DEFAULT_BOOTSTRAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 's3_bootstrap.sqlite')
+BOOTSTRAP_TTL = 24 * 3600  # seconds before a bootstrap step is checked against S3 again
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# --- Clients ---
+def get_client(max_connections=None, retry_mode='standard', instrument=True):
+    """The shared S3 client for these settings, created on first call."""
+    key = (max_connections, retry_mode, instrument)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        if key not in _clients:
+            import boto3
+            client = boto3.client('s3', config=client_config(max_connections or MAX_CONNECTIONS,
+                                                              retry_mode=retry_mode))
+            _clients[key] = metrics.instrument_client(client) if instrument else client
+        return _clients[key]
+
+def lazy(factory):
+    """Decorator: build the object on first call only, then keep returning it."""
+    lock = threading.Lock()
+    created = []
+
+    @functools.wraps(factory)
+    def get():
+        if not created:
+            with lock:
+                if not created:
+                    created.append(factory())
+        return created[0]
+    return get
+
+# --- One-time bootstrap ---
+class BootstrapCache:
+    def __init__(self, path=DEFAULT_BOOTSTRAP_PATH, ttl=BOOTSTRAP_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.db.execute("CREATE TABLE IF NOT EXISTS steps (name TEXT PRIMARY KEY, done_at REAL NOT NULL)")
+        return self.db
+
+    def is_done(self, name):
+        with self.lock:
+            row = self._connect().execute("SELECT done_at FROM steps WHERE name = ?", (name,)).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl
+
+    def mark_done(self, name):
+        with self.lock:
+            self._connect().execute("INSERT OR REPLACE INTO steps (name, done_at) VALUES (?, ?)",
+                                    (name, time.time()))
+
+    def once(self, name, step):
+        """Run step() unless it already succeeded within the TTL. True if it ran."""
+        if self.is_done(name):
+            return False
+        step()
+        self.mark_done(name)  # only after success, so a failed step is retried next start
+        return True
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+def ensure_folder(client, bucket, key, cache=None, logger=None):
+    """Create the folder marker key once; skipped on later starts while cached."""
+    logger = logger or logging.getLogger(__name__)
+    cache = cache or BootstrapCache()
+    if cache.once(f"folder:{bucket}/{key}", lambda: client.put_object(Bucket=bucket, Key=key)):
+        logger.info(f"📁 Ensured S3 folder: {key}")
+
+def ensure_versioning(client, bucket, cache=None, logger=None):
+    """Enable bucket versioning once (one GET, plus a PUT only if it was off)."""
+    logger = logger or logging.getLogger(__name__)
+    cache = cache or BootstrapCache()
+
+    def step():
+        if client.get_bucket_versioning(Bucket=bucket).get('Status') == 'Enabled':
+            logger.info(f"ℹ️ Versioning already enabled on bucket: {bucket}")
+            return
+        client.put_bucket_versioning(Bucket=bucket, VersioningConfiguration={'Status': 'Enabled'})
+        logger.info(f"✅ Enabled versioning on bucket: {bucket}")
+
+    cache.once(f"versioning:{bucket}", step)
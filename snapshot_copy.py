@@ -0,0 +1,108 @@
+"""
+Server-side copies for building snapshots without re-sending local bytes.
+- content_sources() indexes objects under some prefixes by (size, ETag), from
+  one paginated listing per prefix.
+- A local file whose S3-style ETag (see file_state) matches one of them is copied
+  inside S3 instead of uploaded: copy_object for single-part objects, concurrent
+  upload_part_copy ranges for multipart ones.
+- Multipart copies reuse the source's part size, so the copy ends up with the
+  same ETag as the source and keeps matching local files on later runs.
+- Copies are pinned to the source ETag (CopySourceIfMatch); a source that changed
+  in the meantime fails the copy and the caller falls back to uploading.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from file_state import guess_part_size
+import metrics
+
+MAX_COPIES_IN_FLIGHT = 16
+MAX_PARTS_PER_COPY = 8
+MAX_SINGLE_COPY_SIZE = 5 * 1024 ** 3   # copy_object limit
+
+CopyResult = namedtuple('CopyResult', 'source key size elapsed error')
+
+def content_sources(client, bucket, prefixes):
+    """{(size, etag): key} for every object under the given prefixes (first seen wins)."""
+    sources = {}
+    paginator = client.get_paginator('list_objects_v2')
+    for prefix in prefixes:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                etag = obj.get('ETag', '').strip('"')
+                if obj['Size'] and etag:
+                    sources.setdefault((obj['Size'], etag), obj['Key'])
+    return sources
+
+def server_copy(client, bucket, source_key, key, size, etag, parts_pool=None):
+    """Copy source_key to key inside the bucket so the result keeps the source's ETag."""
+    copy_source = {'Bucket': bucket, 'Key': source_key}
+    quoted = f'"{etag}"'
+    if '-' not in etag and size <= MAX_SINGLE_COPY_SIZE:
+        with metrics.stage('server_copy', nbytes=size, key=key):
+            client.copy_object(Bucket=bucket, Key=key, CopySource=copy_source, CopySourceIfMatch=quoted)
+        return
+
+    part_size = guess_part_size(size, etag) if '-' in etag else 1024 ** 3
+    upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+
+    def copy_part(number):
+        first = (number - 1) * part_size
+        last = min(first + part_size, size) - 1
+        resp = client.upload_part_copy(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number,
+                                       CopySource=copy_source, CopySourceIfMatch=quoted,
+                                       CopySourceRange=f"bytes={first}-{last}")
+        return {'PartNumber': number, 'ETag': resp['CopyPartResult']['ETag']}
+
+    numbers = range(1, -(-size // part_size) + 1)
+    try:
+        with metrics.stage('server_copy', nbytes=size, key=key):
+            if parts_pool is None:
+                parts = [copy_part(number) for number in numbers]
+            else:
+                parts = list(parts_pool.map(copy_part, numbers))
+            client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                             MultipartUpload={'Parts': parts})
+    except Exception:
+        client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+def copy_many(client, bucket, copies, max_copies=MAX_COPIES_IN_FLIGHT, max_parts=MAX_PARTS_PER_COPY):
+    """
+    Run (source_key, key, size, etag) copies concurrently and yield a CopyResult
+    per copy as it finishes.
+    """
+    copies = iter(copies)
+    window = max_copies * 2
+
+    def run(source_key, key, size, etag):
+        start = time.monotonic()
+        try:
+            server_copy(client, bucket, source_key, key, size, etag, parts_pool)
+            return CopyResult(source_key, key, size, time.monotonic() - start, None)
+        except Exception as e:
+            return CopyResult(source_key, key, size, time.monotonic() - start, e)
+
+    with ThreadPoolExecutor(max_workers=max_copies) as pool, \
+            ThreadPoolExecutor(max_workers=max_copies * max_parts) as parts_pool:
+        pending = set()
+        for copy in copies:
+            pending.add(pool.submit(run, *copy))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def previous_snapshot(client, bucket, root, before):
+    """Newest snapshot folder under root that sorts before `before` (timestamped names sort by time)."""
+    latest = None
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=root, Delimiter='/'):
+        for common in page.get('CommonPrefixes', []):
+            if common['Prefix'] < before:
+                latest = max(latest or '', common['Prefix'])
+    return latest
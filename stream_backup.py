@@ -0,0 +1,166 @@
+"""
+Streaming compressed backups with no temp files.
+- Compresses a file while uploading it: the archive is written into a
+  MultipartWriter that ships each full part with upload_part as soon as it fills,
+  so only a couple of parts are ever held in memory and nothing touches disk.
+- Small archives (under one part) go up as a single put_object.
+- Already-compressed types (jpg, pdf, zip...) are stored, not deflated again.
+- 'zip' produces a standard ZIP (data-descriptor mode, zip64 when needed);
+  'zstd' produces a .zst stream when the optional 'zstandard' package is installed.
+- Compression, each part upload and the final upload are timed as metrics stages.
+"""
+import os
+import zipfile
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+PART_SIZE = 8 * 1024 * 1024      # S3 minimum is 5 MiB for every part but the last
+MAX_PARTS_IN_FLIGHT = 2
+READ_BLOCK_SIZE = 1024 * 1024
+COMPRESSION_LEVEL = 6
+ALREADY_COMPRESSED = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.pdf', '.mpeg', '.mp3', '.mp4',
+                      '.zip', '.gz', '.bz2', '.xz', '.zst', '.docx', '.xlsx', '.pptx')
+
+# --- Multipart Writer ---
+class MultipartWriter:
+    """Write-only, non-seekable file object that uploads to S3 part by part."""
+
+    def __init__(self, client, bucket, key, part_size=PART_SIZE,
+                 max_in_flight=MAX_PARTS_IN_FLIGHT, content_type='application/octet-stream'):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.content_type = content_type
+        self.buffer = bytearray()
+        self.position = 0
+        self.upload_id = None
+        self.futures = []
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._submit(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, number, body):
+        try:
+            with metrics.stage('backup_part', nbytes=len(body), key=self.key, part=number):
+                resp = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                               PartNumber=number, Body=body)
+            return {'PartNumber': number, 'ETag': resp['ETag']}
+        finally:
+            self.slots.release()
+
+    def _submit(self, body):
+        if self.upload_id is None:
+            resp = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key,
+                                                       ContentType=self.content_type)
+            self.upload_id = resp['UploadId']
+        self.slots.acquire()  # backpressure: compression waits for a free part slot
+        self.futures.append(self.pool.submit(self._upload_part, len(self.futures) + 1, body))
+
+    def close(self):
+        """Upload what is left and finish the object. Returns bytes written."""
+        try:
+            if self.upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer),
+                                       ContentType=self.content_type)
+            else:
+                if self.buffer:
+                    self._submit(bytes(self.buffer))
+                parts = [future.result() for future in self.futures]
+                self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key,
+                                                      UploadId=self.upload_id,
+                                                      MultipartUpload={'Parts': parts})
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.pool.shutdown(wait=True)
+        return self.position
+
+    def abort(self):
+        self.pool.shutdown(wait=True)
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+# --- Compressors ---
+def is_compressed_type(path):
+    return path.lower().endswith(ALREADY_COMPRESSED)
+
+def _copy(src, dst):
+    for block in iter(lambda: src.read(READ_BLOCK_SIZE), b''):
+        dst.write(block)
+
+def write_zip(filepath, writer, arcname, level):
+    compress_type = zipfile.ZIP_STORED if is_compressed_type(filepath) else zipfile.ZIP_DEFLATED
+    info = zipfile.ZipInfo.from_file(filepath, arcname=arcname)
+    info.compress_type = compress_type
+    with zipfile.ZipFile(writer, 'w', compress_type, compresslevel=level) as zipf:
+        with open(filepath, 'rb') as src, \
+                zipf.open(info, 'w', force_zip64=info.file_size >= zipfile.ZIP64_LIMIT) as dst:
+            _copy(src, dst)
+
+def write_zstd(filepath, writer, level):
+    compressor = zstandard.ZstdCompressor(level=level)
+    with open(filepath, 'rb') as src, compressor.stream_writer(writer, closefd=False) as dst:
+        _copy(src, dst)
+
+# --- Backup Upload ---
+def upload_backup(client, filepath, bucket, key_base, fmt='zip', level=COMPRESSION_LEVEL,
+                  part_size=PART_SIZE):
+    """
+    Stream a compressed backup of filepath to key_base + '.zip' / '.zst'.
+    Returns (key, compressed bytes uploaded).
+    """
+    if fmt == 'zstd' and zstandard is None:
+        logging.warning("⚠️ zstandard is not installed; falling back to ZIP backups")
+        fmt = 'zip'
+
+    # backup_compress covers reading + compressing (including waits for a free part
+    # slot); backup_upload is the final part and the multipart completion.
+    if fmt == 'zstd':
+        key = key_base + '.zst'
+        writer = MultipartWriter(client, bucket, key, part_size, content_type='application/zstd')
+        try:
+            if is_compressed_type(filepath):
+                level = 1  # not worth spending CPU on data that won't shrink
+            with metrics.stage('backup_compress', nbytes=os.path.getsize(filepath), key=key):
+                write_zstd(filepath, writer, level)
+        except Exception:
+            writer.abort()
+            raise
+    else:
+        key = key_base + '.zip'
+        writer = MultipartWriter(client, bucket, key, part_size, content_type='application/zip')
+        try:
+            with metrics.stage('backup_compress', nbytes=os.path.getsize(filepath), key=key):
+                write_zip(filepath, writer, os.path.basename(filepath), level)
+        except Exception:
+            writer.abort()
+            raise
+    with metrics.stage('backup_upload', key=key) as record:
+        record['bytes'] = written = writer.close()
+    return key, written
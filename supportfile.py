@@ -1,80 +1,112 @@
 """
 Uploads all supported files from a local directory to a specified S3 folder (prefix).
-- Creates the S3 folder if missing.
+- Creates the S3 folder if missing (once; later runs skip it, see s3_clients.py).
 - Filters files by allowed extensions.
 - Uploads valid files, logs results, and lists unsupported files.
 - Handles AWS and local errors gracefully.
+- Progress is journaled per file and per multipart part: rerunning after a crash
+  skips finished files and resumes interrupted uploads from their last part.
+- Multipart uploads under the folder left behind by old crashed runs are aborted.
+- Files whose content already matches the object in S3 (same size and ETag) are
+  skipped; hashes are cached and only recomputed when a file's stat data changes.
+- Importable: all the work happens in main().
 """
-import boto3
 import os
 import logging
 from botocore.exceptions import BotoCoreError, ClientError
-
-# --- Logging Setup ---
-logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+from object_index import ObjectIndex
+from transfer_jobs import TransferJournal, ResumableUploader, JOURNAL_NAME, cleanup_stale_uploads
+from file_state import FileScanner, FILE_STATE_CACHE_NAME, remote_state
+from s3_clients import get_client, ensure_folder
 
 # --- Config ---
-s3 = boto3.client('s3')
 bucket_name = '24030142014'
 folder_name = 'documents/'  # S3 folder (prefix)
 local_folder = '/Volumes/study/cloud web/aws 4th july/'  # Local directory
+job_name = 'supportfile:' + folder_name
 allowed_extensions = ('.pdf', '.jpg', '.jpeg', '.mpeg', '.doc', '.txt', '.py')
-unsupported_files = []
+MAX_BANDWIDTH = None  # bytes/sec shared by all uploads; None = unlimited
 
-try:
-    # --- 1. Create Folder in S3 ---
-    s3.put_object(Bucket=bucket_name, Key=folder_name)
-    logging.info(f"Created folder '{folder_name}' in bucket '{bucket_name}'")
+def main():
+    s3 = get_client()
+    unsupported_files = []
+    try:
+        # --- 1. Create Folder in S3 (first run only, then cached) ---
+        ensure_folder(s3, bucket_name, folder_name)
 
-    # --- 2. Check Local Folder Exists ---
-    if not os.path.exists(local_folder):
-        logging.error(f"Local folder does not exist: {local_folder}")
-        exit(1)
+        # --- 2. Check Local Folder Exists ---
+        if not os.path.exists(local_folder):
+            logging.error(f"Local folder does not exist: {local_folder}")
+            exit(1)
 
-    # --- 3. Gather & Sort Valid Files ---
-    all_files = os.listdir(local_folder)
-    valid_files = []
-    
-    for f in all_files:
-        full_path = os.path.join(local_folder, f)
-        if os.path.isfile(full_path):
-            if f.lower().endswith(allowed_extensions):
-                valid_files.append(full_path)
-            else:
-                unsupported_files.append(f)
+        # --- 3. Gather & Sort Valid Files (one scandir pass, stat data included) ---
+        scanner = FileScanner(os.path.join(local_folder, FILE_STATE_CACHE_NAME))
+        try:
+            valid_files = []
+            for state in scanner.scan(local_folder, recursive=False):
+                if state.rel.lower().endswith(allowed_extensions):
+                    valid_files.append(state)
+                else:
+                    unsupported_files.append(state.rel)
 
-    if not valid_files:
-        logging.warning("No matching files to upload.")
-        exit(0)
+            if not valid_files:
+                logging.warning("No matching files to upload.")
+                return
 
-    valid_files.sort(key=os.path.getmtime, reverse=True)
+            # --- 3b. Skip files S3 already has (hashing only where the size matches) ---
+            unchanged, valid_files = scanner.unchanged(valid_files, remote_state(s3, bucket_name, folder_name))
+        finally:
+            scanner.close()  # also on the early return and on errors
+        if unchanged:
+            logging.info(f"⏭️ {len(unchanged)} file(s) already match S3 ({scanner.hashed} hashed, "
+                         f"{scanner.cache_hits} from the hash cache)")
+        valid_files.sort(key=lambda state: state.mtime_ns, reverse=True)
+        mod_times = {state.path: state.mtime_ns / 1e9 for state in valid_files}
 
-    # --- 4. Upload Valid Files to S3 ---
-    files_uploaded = 0
-    for full_path in valid_files:
-        file_name = os.path.basename(full_path)
-        s3_key = folder_name + file_name
-        try:
-            s3.upload_file(full_path, bucket_name, s3_key)
-            mod_time = os.path.getmtime(full_path)
-            logging.info(f"Uploaded '{file_name}' → S3:{s3_key} [Modified: {mod_time}]")
+        # --- 4. Upload Valid Files to S3 (resuming an interrupted run) ---
+        journal = TransferJournal(os.path.join(local_folder, JOURNAL_NAME))
+        _, resumed = journal.start_job(job_name, folder_name)
+        if resumed:
+            logging.info(f"⏯️ Resuming interrupted upload job '{job_name}'")
+        cleanup_stale_uploads(s3, bucket_name, folder_name, journal)
+        uploader = ResumableUploader(s3, bucket_name, journal, max_bandwidth=MAX_BANDWIDTH, index=ObjectIndex())
+        files_uploaded = files_skipped = files_failed = 0
+        jobs = ((state.path, folder_name + state.rel) for state in valid_files)
+        for result in uploader.upload_many(job_name, jobs):
+            file_name = os.path.basename(result.path)
+            if result.error:
+                logging.error(f"Failed to upload '{file_name}': {result.error}")
+                files_failed += 1
+                continue
+            if result.status == 'skipped':
+                files_skipped += 1
+                continue
+            mod_time = mod_times[result.path]
+            logging.info(f"Uploaded '{file_name}' → S3:{result.key} [Modified: {mod_time}]"
+                         + (" (resumed)" if result.status == 'resumed' else ""))
             files_uploaded += 1
-        except (ClientError, BotoCoreError) as upload_err:
-            logging.error(f"Failed to upload '{file_name}': {upload_err}")
+        if not files_failed:
+            journal.finish_job(job_name)  # otherwise keep it so the next run retries only the failures
+
+        # --- 5. Summary ---
+        if files_skipped:
+            logging.info(f"⏭️ {files_skipped} file(s) were already uploaded by the interrupted run")
+        if files_uploaded == 0 and not unchanged:
+            logging.warning("No files were uploaded.")
+        else:
+            logging.info(f"✅ Successfully uploaded {files_uploaded} file(s) to folder '{folder_name}'")
 
-    # --- 5. Summary ---
-    if files_uploaded == 0:
-        logging.warning("No files were uploaded.")
-    else:
-        logging.info(f"✅ Successfully uploaded {files_uploaded} file(s) to folder '{folder_name}'")
+        # --- 6. Show Unsupported Files ---
+        if unsupported_files:
+            logging.info("📛 Unsupported files skipped:")
+            for fname in unsupported_files:
+                logging.info(f" - {fname}")
 
-    # --- 6. Show Unsupported Files ---
-    if unsupported_files:
-        logging.info("📛 Unsupported files skipped:")
-        for fname in unsupported_files:
-            logging.info(f" - {fname}")
+    except (ClientError, BotoCoreError) as e:
+        logging.critical(f"🛑 AWS Error: {e}")
+    except Exception as ex:
+        logging.critical(f"🛑 Unexpected Error: {ex}")
 
-except (ClientError, BotoCoreError) as e:
-    logging.critical(f"🛑 AWS Error: {e}")
-except Exception as ex:
-    logging.critical(f"🛑 Unexpected Error: {ex}")
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+    main()
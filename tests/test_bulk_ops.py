@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from local_s3 import LocalS3
+from bulk_ops import DeleteBatcher
+
+BUCKET = 'test-bucket'
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def test_add_after_idle_period_is_flushed_within_delay():
+    client = LocalS3()
+    for key in ('a.txt', 'b.txt'):
+        client.put_object(Bucket=BUCKET, Key=key, Body=b'x')
+    deleted = []
+    batcher = DeleteBatcher(client, BUCKET, delay=0.2, on_deleted=deleted.append)
+    try:
+        batcher.add('a.txt')
+        assert wait_until(lambda: deleted == ['a.txt'], 1.0)
+        time.sleep(0.5)  # worker goes idle with nothing pending
+        batcher.add('b.txt')
+        assert wait_until(lambda: deleted == ['a.txt', 'b.txt'], 0.2 + 0.5)
+        assert client.list_objects_v2(Bucket=BUCKET).get('KeyCount', 0) == 0
+    finally:
+        batcher.close()
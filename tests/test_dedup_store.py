@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import random
+from datetime import timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from local_s3 import LocalS3
+from dedup_store import DedupStore
+
+BUCKET = 'test-bucket'
+NO_GRACE = timedelta(0)
+
+def random_bytes(size, seed=1):
+    return random.Random(seed).randbytes(size)
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+def chunk_digests(client):
+    return {key.rsplit('/', 1)[-1] for _, key in client.objects if key.startswith('dedup/chunks/')}
+
+def referenced_digests(client):
+    digests = set()
+    for _, key in list(client.objects):
+        if key.startswith('dedup/manifests/'):
+            body = client.get_object(Bucket=BUCKET, Key=key)['Body'].read()
+            digests.update(digest for digest, _ in json.loads(body)['chunks'])
+    return digests
+
+def restored(store, manifest_key, tmp_path):
+    dest = tmp_path / 'restored.bin'
+    store.restore(manifest_key, str(dest))
+    return dest.read_bytes()
+
+def test_backup_and_restore_round_trip(tmp_path):
+    client = LocalS3()
+    store = DedupStore(client, BUCKET)
+    data = random_bytes(1024 * 1024)
+    manifest_key, stats = store.backup_file(write(tmp_path / 'doc.bin', data), name='doc.bin')
+    assert stats['chunks'] > 1 and stats['new_chunks'] == stats['chunks']
+    assert restored(store, manifest_key, tmp_path) == data
+
+def test_edit_uploads_only_changed_chunks(tmp_path):
+    client = LocalS3()
+    store = DedupStore(client, BUCKET)
+    data = random_bytes(2 * 1024 * 1024)
+    path = write(tmp_path / 'doc.bin', data)
+    _, first = store.backup_file(path, name='doc.bin')
+    edited = data[:1000000] + b'inserted text' + data[1000000:]
+    write(path, edited)
+    manifest_key, second = store.backup_file(path, name='doc.bin')
+    assert 1 <= second['new_chunks'] <= 2
+    assert len(chunk_digests(client)) == first['chunks'] + second['new_chunks']
+    assert restored(store, manifest_key, tmp_path) == edited
+
+def test_prune_then_collect_keeps_referenced_chunks(tmp_path):
+    client = LocalS3()
+    store = DedupStore(client, BUCKET)
+    path = str(tmp_path / 'doc.bin')
+    versions = [random_bytes(512 * 1024, seed) for seed in range(3)]
+    for data in versions:
+        write(path, data)
+        latest, _ = store.backup_file(path, name='doc.bin')
+    assert store.prune_manifests(1) == 2
+    assert store.collect_garbage(grace=NO_GRACE) > 0
+    assert chunk_digests(client) == referenced_digests(client)
+    assert restored(store, latest, tmp_path) == versions[-1]
+
+def test_prune_rejects_keeping_nothing():
+    with pytest.raises(ValueError):
+        DedupStore(LocalS3(), BUCKET).prune_manifests(0)
+
+def test_reused_chunk_collected_by_another_process_is_uploaded_again(tmp_path):
+    client = LocalS3()
+    data = random_bytes(1024 * 1024)
+    path = write(tmp_path / 'doc.bin', data)
+    watcher = DedupStore(client, BUCKET)
+    manifest_key, _ = watcher.backup_file(path, name='doc.bin')
+    # The watcher's known_chunks still lists every chunk when another process collects them
+    client.delete_object(Bucket=BUCKET, Key=manifest_key)
+    DedupStore(client, BUCKET).collect_garbage(grace=NO_GRACE)
+    assert not chunk_digests(client)
+    manifest_key, stats = watcher.backup_file(path, name='doc.bin')
+    assert stats['new_chunks'] == stats['chunks']
+    assert restored(watcher, manifest_key, tmp_path) == data
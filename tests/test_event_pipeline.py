@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from event_pipeline import EventPipeline, CoalescingScheduler
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def test_same_key_runs_in_order_and_other_keys_in_parallel():
+    pipeline = EventPipeline(max_workers=2)
+    runs = []
+    b_started = threading.Event()
+    release_a = threading.Event()
+
+    def work(key, n):
+        if key == 'a' and n == 0:
+            assert release_a.wait(2)  # holds 'a' until 'b' has run beside it
+        if key == 'b':
+            b_started.set()
+        runs.append((key, n))
+
+    try:
+        for n in range(3):
+            pipeline.submit('a', 'deleted', work, 'a', n)
+        pipeline.submit('b', 'deleted', work, 'b', 0)
+        assert b_started.wait(2)
+        release_a.set()
+    finally:
+        pipeline.stop(timeout=2)
+    assert [n for key, n in runs if key == 'a'] == [0, 1, 2]
+    assert ('b', 0) in runs
+
+def test_queued_modifications_of_a_key_are_coalesced():
+    pipeline = EventPipeline(max_workers=1)
+    release = threading.Event()
+    synced = []
+    try:
+        pipeline.submit('a', 'modified', lambda: release.wait(2))
+        for version in range(5):
+            pipeline.submit('a', 'modified', synced.append, version)
+        release.set()
+    finally:
+        pipeline.stop(timeout=2)
+    assert synced == [4]
+    assert pipeline.stats()['coalesced'] == 4
+
+def test_stop_runs_everything_already_submitted():
+    pipeline = EventPipeline(max_workers=2)
+    done = []
+
+    def slow(n):
+        time.sleep(0.01)
+        done.append(n)
+
+    for n in range(20):
+        pipeline.submit(f"key-{n % 3}", 'deleted', slow, n)
+    pipeline.stop(timeout=5)
+    assert sorted(done) == list(range(20))
+    assert pipeline.stats()['queue_depth'] == 0
+
+def test_failing_task_is_counted_and_does_not_stop_its_key():
+    pipeline = EventPipeline(max_workers=1)
+    done = []
+    try:
+        pipeline.submit('a', 'deleted', lambda: 1 / 0)
+        pipeline.submit('a', 'deleted', done.append, 'next')
+    finally:
+        pipeline.stop(timeout=2)
+    assert done == ['next']
+    assert pipeline.stats()['errors'] == 1
+
+def test_burst_of_touches_fires_once_after_quiet_window(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_text('x')
+    fired = []
+    scheduler = CoalescingScheduler(lambda key, p: fired.append((key, p, time.monotonic())),
+                                    quiet=0.2, check_stable=False)
+    try:
+        for _ in range(5):
+            last_touch = time.monotonic()
+            scheduler.touch('a', str(path))
+            time.sleep(0.05)
+        assert wait_until(lambda: fired, 1.0)
+        time.sleep(0.3)
+    finally:
+        scheduler.stop(flush=False)
+    assert [(key, p) for key, p, _ in fired] == [('a', str(path))]
+    assert fired[0][2] - last_touch >= 0.2
+    assert scheduler.pending() == 0
+
+def test_file_still_changing_gets_another_window(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_text('x')
+    fired = []
+    scheduler = CoalescingScheduler(lambda key, p: fired.append(time.monotonic()), quiet=0.2)
+    try:
+        touched = time.monotonic()
+        scheduler.touch('a', str(path))
+        time.sleep(0.1)
+        path.write_text('grown without a new event')
+        assert wait_until(lambda: fired, 1.5)
+    finally:
+        scheduler.stop(flush=False)
+    assert len(fired) == 1 and fired[0] - touched >= 0.4
+
+def test_stop_flushes_pending_keys(tmp_path):
+    fired = []
+    scheduler = CoalescingScheduler(lambda key, p: fired.append(key), quiet=60, check_stable=False)
+    scheduler.touch('a', str(tmp_path / 'a.txt'))
+    scheduler.touch('b', str(tmp_path / 'b.txt'))
+    scheduler.cancel('b')
+    scheduler.stop()
+    assert fired == ['a']
+
+def test_stop_without_flush_drops_pending_keys(tmp_path):
+    fired = []
+    scheduler = CoalescingScheduler(lambda key, p: fired.append(key), quiet=60, check_stable=False)
+    scheduler.touch('a', str(tmp_path / 'a.txt'))
+    scheduler.stop(flush=False)
+    assert fired == [] and scheduler.pending() == 0
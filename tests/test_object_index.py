@@ -0,0 +1,85 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from local_s3 import LocalS3
+from object_index import ObjectIndex
+
+BUCKET = 'test-bucket'
+
+def put(client, *keys):
+    for key in keys:
+        client.put_object(Bucket=BUCKET, Key=key, Body=key.encode())
+
+def keys(index, prefix=''):
+    return [obj['Key'] for obj in index.iter_objects(prefix)]
+
+def test_refresh_pages_through_the_bucket_and_sweeps_deleted_keys(tmp_path):
+    client = LocalS3()
+    index = ObjectIndex(str(tmp_path / 'index.sqlite'))
+    put(client, *[f"docs/{n:04d}.txt" for n in range(2500)])  # three list pages
+    assert not index.is_refreshed()
+    assert index.refresh(client, BUCKET) == 2500
+    assert index.is_refreshed() and index.last_refreshed() is not None
+    assert index.stats()['objects'] == 2500
+
+    client.delete_object(Bucket=BUCKET, Key='docs/0007.txt')
+    put(client, 'docs/new.txt')
+    index.refresh(client, BUCKET)
+    assert not index.exists('docs/0007.txt')
+    assert index.get('docs/new.txt')['Size'] == len('docs/new.txt')
+
+def test_refresh_of_a_prefix_only_sweeps_that_prefix(tmp_path):
+    client = LocalS3()
+    index = ObjectIndex(str(tmp_path / 'index.sqlite'))
+    put(client, 'a/1.txt', 'a/2.txt', 'b/1.txt')
+    index.refresh(client, BUCKET)
+    client.delete_object(Bucket=BUCKET, Key='a/2.txt')
+    client.delete_object(Bucket=BUCKET, Key='b/1.txt')
+    index.refresh(client, BUCKET, prefix='a/')
+    assert keys(index) == ['a/1.txt', 'b/1.txt']
+
+def test_own_writes_during_a_refresh_are_not_swept(tmp_path):
+    client = LocalS3()
+    index = ObjectIndex(str(tmp_path / 'index.sqlite'))
+    put(client, 'a.txt')
+
+    class WriteDuringListing:
+        def get_paginator(self, operation):
+            paginator = client.get_paginator(operation)
+
+            class Paginator:
+                def paginate(self, **kwargs):
+                    for page in paginator.paginate(**kwargs):
+                        index.record_put('uploaded-meanwhile.txt', 1)  # after S3 listed past it
+                        yield page
+            return Paginator()
+
+    index.refresh(WriteDuringListing(), BUCKET)
+    assert keys(index) == ['a.txt', 'uploaded-meanwhile.txt']
+
+def test_refresh_new_only_lists_keys_after_the_newest_indexed(tmp_path):
+    client = LocalS3()
+    index = ObjectIndex(str(tmp_path / 'index.sqlite'))
+    put(client, 'auto-backups/2025-01-01/', 'auto-backups/2025-01-02/')
+    index.refresh(client, BUCKET)
+    put(client, 'auto-backups/2025-01-03/')
+    client.delete_object(Bucket=BUCKET, Key='auto-backups/2025-01-01/')
+    assert index.refresh_new(client, BUCKET) == 1
+    # Deletions are left for the next full refresh
+    assert keys(index) == ['auto-backups/2025-01-01/', 'auto-backups/2025-01-02/', 'auto-backups/2025-01-03/']
+
+def test_list_dir_matches_a_delimiter_listing(tmp_path):
+    client = LocalS3()
+    index = ObjectIndex(str(tmp_path / 'index.sqlite'))
+    put(client, 'top.txt', 'docs/a.txt', 'docs/sub/b.txt', 'docs/sub/c.txt', 'img/x.jpg')
+    index.refresh(client, BUCKET)
+    objects, folders, token = index.list_dir('', '/')
+    assert [o['Key'] for o in objects] == ['top.txt'] and folders == ['docs/', 'img/'] and token is None
+    objects, folders, _ = index.list_dir('docs/', '/')
+    assert [o['Key'] for o in objects] == ['docs/a.txt'] and folders == ['docs/sub/']
+
+    objects, folders, token = index.list_dir('', '/', limit=2)
+    assert folders == ['docs/', 'img/'] and token
+    objects, folders, token = index.list_dir('', '/', start_after=token, limit=2)
+    assert [o['Key'] for o in objects] == ['top.txt'] and folders == [] and token is None
@@ -0,0 +1,80 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from local_s3 import LocalS3
+from backup_manifest import write_snapshot_index
+from retention import RetentionPolicy, select_snapshots, plan_retention, enforce_retention
+
+BUCKET = 'test-bucket'
+ROOT = 'auto-backups/'
+
+def versions_of(client, key):
+    return [v['version_id'] for v in client.versions.get((BUCKET, key), [])]
+
+def snapshot(day):
+    return f"{ROOT}2025-01-0{day}_00-00-00/"
+
+def test_select_snapshots_keeps_last_and_newest_per_period():
+    start = datetime(2025, 1, 1)
+    times = [start + timedelta(hours=h) for h in range(72)]
+    policy = RetentionPolicy(keep_last=2, hourly=3, daily=2, weekly=1)
+    assert select_snapshots(times, policy) == {
+        datetime(2025, 1, 3, 23), datetime(2025, 1, 3, 22), datetime(2025, 1, 3, 21),
+        datetime(2025, 1, 2, 23),
+    }
+
+def test_select_snapshots_never_drops_the_newest():
+    times = [datetime(2025, 1, 1), datetime(2025, 1, 2)]
+    assert select_snapshots(times, RetentionPolicy(0, 0, 0, 0)) == {datetime(2025, 1, 2)}
+
+def test_expired_snapshots_are_deleted_except_files_kept_snapshots_reference():
+    client = LocalS3(versioned=True)
+    for day in range(1, 7):
+        client.put_object(Bucket=BUCKET, Key=snapshot(day) + 'own.txt', Body=b'x')
+    # The newest snapshot is incremental and still points at a file stored in day 2
+    write_snapshot_index(client, BUCKET, snapshot(6), {
+        'old.txt': {'key': snapshot(2) + 'own.txt'},
+        'own.txt': {'key': snapshot(6) + 'own.txt'},
+    })
+    policy = RetentionPolicy(keep_last=2, hourly=0, daily=0, weekly=0)
+
+    plan = plan_retention(client, BUCKET, ROOT, policy)
+    assert plan.kept_snapshots == ['2025-01-05_00-00-00', '2025-01-06_00-00-00']
+    assert plan.expired_snapshots == ['2025-01-01_00-00-00', '2025-01-02_00-00-00',
+                                      '2025-01-03_00-00-00', '2025-01-04_00-00-00']
+    assert plan.protected == 1
+
+    enforce_retention(client, BUCKET, ROOT, policy)
+    remaining = sorted(key for _, key in client.objects)
+    assert remaining == [snapshot(2) + 'own.txt', snapshot(5) + 'own.txt',
+                         snapshot(6) + '_index.json', snapshot(6) + 'own.txt']
+    # Whole versions are removed, not hidden behind delete markers
+    assert versions_of(client, snapshot(1) + 'own.txt') == []
+
+def test_versions_are_capped_per_key_and_buried_markers_removed():
+    client = LocalS3(versioned=True)
+    zip_key = 'live-sync/backups/a.zip'
+    for n in range(15):
+        client.put_object(Bucket=BUCKET, Key=zip_key, Body=b'%d' % n)
+    other = 'live-sync/backups/b.zip'
+    client.put_object(Bucket=BUCKET, Key=other, Body=b'old')
+    client.delete_object(Bucket=BUCKET, Key=other)
+    client.put_object(Bucket=BUCKET, Key=other, Body=b'new')
+    newest = versions_of(client, zip_key)[:10]
+
+    plan, report = enforce_retention(client, BUCKET, 'live-sync/backups/', RetentionPolicy(max_versions=10),
+                                     snapshots=False)
+    assert len(plan.deletions) == 6 and report.succeeded == 6
+    assert versions_of(client, zip_key) == newest
+    assert client.get_object(Bucket=BUCKET, Key=zip_key)['Body'].read() == b'14'
+    assert len(versions_of(client, other)) == 2  # the two data versions; the marker is gone
+
+def test_dry_run_only_plans():
+    client = LocalS3(versioned=True)
+    for day in range(1, 4):
+        client.put_object(Bucket=BUCKET, Key=snapshot(day) + 'own.txt', Body=b'x')
+    plan, report = enforce_retention(client, BUCKET, ROOT, RetentionPolicy(1, 0, 0, 0), dry_run=True)
+    assert report is None and len(plan.deletions) == 2
+    assert len(client.objects) == 3
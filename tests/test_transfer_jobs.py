@@ -0,0 +1,99 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from local_s3 import LocalS3
+from transfer_jobs import TransferJournal, ResumableUploader, cleanup_stale_uploads
+
+BUCKET = 'test-bucket'
+JOB = 'test-job'
+PART_SIZE = 1024
+
+class CrashingClient:
+    """Delegates to a LocalS3 but fails every part from `fail_from` on, like a dropped connection."""
+
+    def __init__(self, client, fail_from):
+        self.client = client
+        self.fail_from = fail_from
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def upload_part(self, PartNumber, **kwargs):
+        if PartNumber >= self.fail_from:
+            raise ConnectionError("connection reset")
+        return self.client.upload_part(PartNumber=PartNumber, **kwargs)
+
+def uploader(client, journal):
+    return ResumableUploader(client, BUCKET, journal, max_files=1, max_concurrency=1,
+                             chunk_size=PART_SIZE, multipart_threshold=2 * PART_SIZE)
+
+def run(client, journal, files):
+    return {result.key: result for result in uploader(client, journal).upload_many(JOB, files)}
+
+def body(client, key):
+    return client.get_object(Bucket=BUCKET, Key=key)['Body'].read()
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+def test_interrupted_multipart_upload_resumes_from_the_parts_in_s3(tmp_path):
+    client = LocalS3()
+    journal = TransferJournal(str(tmp_path / 'journal.sqlite'))
+    data = os.urandom(10 * PART_SIZE)
+    path = write(tmp_path / 'big.bin', data)
+
+    first = run(CrashingClient(client, fail_from=5), journal, [(path, 'big.bin')])
+    assert first['big.bin'].status == 'failed'
+    assert journal.file(JOB, 'big.bin')['state'] == 'uploading'
+    assert sorted(journal.parts(JOB, 'big.bin')) == [1, 2, 3, 4]
+
+    journal.close()
+    journal = TransferJournal(str(tmp_path / 'journal.sqlite'))  # as after a restart
+    sent_before = client.calls['UploadPart']
+    second = run(client, journal, [(path, 'big.bin')])
+    assert second['big.bin'].status == 'resumed'
+    assert client.calls['UploadPart'] - sent_before == 6
+    assert body(client, 'big.bin') == data
+    assert not client.uploads
+
+def test_finished_files_are_skipped_on_rerun(tmp_path):
+    client = LocalS3()
+    journal = TransferJournal(str(tmp_path / 'journal.sqlite'))
+    journal.start_job(JOB, 'target/')
+    files = [(write(tmp_path / f'{n}.txt', b'x' * n), f'{n}.txt') for n in (1, 2, 3)]
+    assert {r.status for r in run(client, journal, files).values()} == {'uploaded'}
+    _, resumed = journal.start_job(JOB, 'target/')
+    assert resumed
+    puts = client.calls['PutObject']
+    assert {r.status for r in run(client, journal, files).values()} == {'skipped'}
+    assert client.calls['PutObject'] == puts
+
+def test_file_changed_since_interruption_restarts_its_upload(tmp_path):
+    client = LocalS3()
+    journal = TransferJournal(str(tmp_path / 'journal.sqlite'))
+    path = write(tmp_path / 'big.bin', os.urandom(10 * PART_SIZE))
+    run(CrashingClient(client, fail_from=5), journal, [(path, 'big.bin')])
+    old_upload = journal.file(JOB, 'big.bin')['upload_id']
+
+    data = os.urandom(12 * PART_SIZE)
+    write(path, data)
+    result = run(client, journal, [(path, 'big.bin')])['big.bin']
+    assert result.status == 'uploaded'
+    assert old_upload not in client.uploads
+    assert body(client, 'big.bin') == data
+
+def test_cleanup_aborts_only_stale_unowned_uploads(tmp_path):
+    client = LocalS3()
+    journal = TransferJournal(str(tmp_path / 'journal.sqlite'))
+    path = write(tmp_path / 'big.bin', os.urandom(10 * PART_SIZE))
+    run(CrashingClient(client, fail_from=2), journal, [(path, 'docs/big.bin')])
+    owned = journal.file(JOB, 'docs/big.bin')['upload_id']
+    orphan = client.create_multipart_upload(Bucket=BUCKET, Key='docs/orphan.bin')['UploadId']
+    elsewhere = client.create_multipart_upload(Bucket=BUCKET, Key='other/orphan.bin')['UploadId']
+
+    assert cleanup_stale_uploads(client, BUCKET, 'docs/', journal, max_age=0) == 1
+    assert set(client.uploads) == {owned, elsewhere}
+    assert orphan not in client.uploads
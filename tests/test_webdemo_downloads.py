@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'webdemo'))
+from local_s3 import LocalS3
+import app as webdemo
+
+DATA = bytes(range(100))
+
+@pytest.fixture
+def client(monkeypatch):
+    s3 = LocalS3()
+    s3.put_object(Bucket=webdemo.BUCKET_NAME, Key='docs/a.bin', Body=DATA)
+    monkeypatch.setattr(webdemo, 'get_s3', lambda: s3)
+    # Every whole-object read goes through stream_object, not the object cache
+    monkeypatch.setattr(webdemo, 'get_object_cache', lambda: None)
+    return webdemo.app.test_client()
+
+def download(client, **headers):
+    return client.get('/api/download?key=docs/a.bin&redirect=0', headers=headers)
+
+def test_whole_object_is_streamed_with_validators(client):
+    resp = download(client)
+    assert resp.status_code == 200
+    assert resp.data == DATA
+    assert resp.headers['Content-Length'] == str(len(DATA))
+    assert resp.headers['Accept-Ranges'] == 'bytes'
+    assert resp.headers['ETag'] and resp.headers['Last-Modified']
+
+def test_range_request_returns_partial_content(client):
+    resp = download(client, Range='bytes=10-19')
+    assert resp.status_code == 206
+    assert resp.data == DATA[10:20]
+    assert resp.headers['Content-Range'] == f"bytes 10-19/{len(DATA)}"
+    assert resp.headers['Content-Length'] == '10'
+
+def test_open_ended_range_runs_to_the_end(client):
+    resp = download(client, Range='bytes=90-')
+    assert resp.status_code == 206 and resp.data == DATA[90:]
+
+def test_matching_etag_is_not_modified(client):
+    etag = download(client).headers['ETag']
+    resp = download(client, **{'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.data == b''
+    assert resp.headers['ETag'] == etag
+
+def test_stale_etag_gets_the_full_object(client):
+    resp = download(client, **{'If-None-Match': '"not-the-current-etag"'})
+    assert resp.status_code == 200 and resp.data == DATA
+
+def test_attachment_sets_content_disposition(client):
+    resp = client.get('/api/download?key=docs/a.bin&redirect=0&download=1')
+    assert resp.headers['Content-Disposition'] == 'attachment; filename="a.bin"'
@@ -0,0 +1,285 @@
+"""
+Resumable, checkpointed bulk uploads for supportfile.py and automaticbackup.py.
+- A local SQLite journal records each job, each file (size, mtime, state) and,
+  for multipart uploads, the upload id and every completed part.
+- On restart a job with the same name picks up where it stopped: finished files
+  are skipped, and an interrupted multipart upload continues from the parts S3
+  already holds (list_parts) instead of starting over.
+- A file that changed since its upload began is restarted (the old upload is aborted).
+- cleanup_stale_uploads() aborts multipart uploads under a prefix that are older
+  than STALE_UPLOAD_AGE and not owned by an unfinished journal entry, so crashed
+  runs don't leave orphaned parts billing forever.
+- Uploads stay inside UploadEngine's limits: files x parts in flight are clamped to
+  the connection budget, and an optional BandwidthLimiter (its own, or one shared
+  with an UploadEngine) paces every PUT.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone, timedelta
+from botocore.exceptions import ClientError
+from upload_engine import (MAX_FILES_IN_FLIGHT, MAX_CONCURRENCY_PER_FILE, MULTIPART_CHUNK_SIZE, MULTIPART_THRESHOLD,
+                           MAX_CONNECTIONS, BandwidthLimiter, connection_budget)
+from file_state import part_size_for
+import metrics
+
+JOURNAL_NAME = '.transfer_journal.sqlite'
+STALE_UPLOAD_AGE = 24 * 3600      # seconds before an unowned multipart upload is aborted
+
+TransferResult = namedtuple('TransferResult', 'path key size elapsed error status')
+
+# --- Journal ---
+class TransferJournal:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                name TEXT PRIMARY KEY,
+                target TEXT NOT NULL,
+                started REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                job TEXT NOT NULL,
+                key TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                state TEXT NOT NULL,          -- 'uploading' or 'done'
+                upload_id TEXT,
+                part_size INTEGER,
+                PRIMARY KEY (job, key)
+            );
+            CREATE TABLE IF NOT EXISTS parts (
+                job TEXT NOT NULL,
+                key TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                etag TEXT NOT NULL,
+                PRIMARY KEY (job, key, number)
+            );
+        """)
+
+    def start_job(self, name, target):
+        """
+        Begin job `name`, or resume it if a previous run didn't finish.
+        Returns (target, resumed): a resumed job keeps its original target
+        (e.g. the snapshot folder it was writing into).
+        """
+        with self.lock:
+            row = self.db.execute("SELECT target FROM jobs WHERE name = ?", (name,)).fetchone()
+            if row:
+                return row[0], True
+            self.db.execute("INSERT INTO jobs (name, target, started) VALUES (?, ?, ?)",
+                            (name, target, time.time()))
+            return target, False
+
+    def finish_job(self, name):
+        with self.lock:
+            self.db.execute('BEGIN')
+            self.db.execute("DELETE FROM parts WHERE job = ?", (name,))
+            self.db.execute("DELETE FROM files WHERE job = ?", (name,))
+            self.db.execute("DELETE FROM jobs WHERE name = ?", (name,))
+            self.db.execute('COMMIT')
+
+    def file(self, job, key):
+        with self.lock:
+            row = self.db.execute("SELECT path, size, mtime_ns, state, upload_id, part_size FROM files "
+                                  "WHERE job = ? AND key = ?", (job, key)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('path', 'size', 'mtime_ns', 'state', 'upload_id', 'part_size'), row))
+
+    def begin_file(self, job, key, path, st, upload_id=None, part_size=None):
+        with self.lock:
+            self.db.execute('BEGIN')
+            self.db.execute("DELETE FROM parts WHERE job = ? AND key = ?", (job, key))
+            self.db.execute("INSERT OR REPLACE INTO files (job, key, path, size, mtime_ns, state, upload_id, part_size) "
+                            "VALUES (?, ?, ?, ?, ?, 'uploading', ?, ?)",
+                            (job, key, path, st.st_size, st.st_mtime_ns, upload_id, part_size))
+            self.db.execute('COMMIT')
+
+    def record_part(self, job, key, number, etag):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO parts (job, key, number, etag) VALUES (?, ?, ?, ?)",
+                            (job, key, number, etag))
+
+    def parts(self, job, key):
+        with self.lock:
+            return dict(self.db.execute("SELECT number, etag FROM parts WHERE job = ? AND key = ?", (job, key)))
+
+    def finish_file(self, job, key, path, st):
+        with self.lock:
+            self.db.execute('BEGIN')
+            self.db.execute("DELETE FROM parts WHERE job = ? AND key = ?", (job, key))
+            self.db.execute("INSERT OR REPLACE INTO files (job, key, path, size, mtime_ns, state) "
+                            "VALUES (?, ?, ?, ?, ?, 'done')", (job, key, path, st.st_size, st.st_mtime_ns))
+            self.db.execute('COMMIT')
+
+    def active_upload_ids(self):
+        with self.lock:
+            return {row[0] for row in self.db.execute(
+                "SELECT upload_id FROM files WHERE state = 'uploading' AND upload_id IS NOT NULL")}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+# --- Uploader ---
+class ResumableUploader:
+    def __init__(self, client, bucket, journal, max_files=MAX_FILES_IN_FLIGHT,
+                 max_concurrency=MAX_CONCURRENCY_PER_FILE, chunk_size=MULTIPART_CHUNK_SIZE,
+                 multipart_threshold=MULTIPART_THRESHOLD, max_connections=MAX_CONNECTIONS,
+                 max_bandwidth=None, limiter=None, index=None, logger=None):
+        self.client = client
+        self.bucket = bucket
+        self.journal = journal
+        # Same budget as UploadEngine: files x parts never exceed max_connections
+        self.max_files, self.max_concurrency = connection_budget(max_files, max_concurrency, max_connections)
+        self.limiter = limiter or (BandwidthLimiter(max_bandwidth) if max_bandwidth else None)
+        self.chunk_size = chunk_size
+        self.multipart_threshold = multipart_threshold
+        self.index = index
+        self.logger = logger or logging.getLogger(__name__)
+
+    def upload_many(self, job, files):
+        """
+        Upload (path, key) pairs as part of journal job `job`, yielding a
+        TransferResult per file; status is 'uploaded', 'resumed', 'skipped' or 'failed'.
+        """
+        files = iter(files)
+        window = self.max_files * 2
+        with ThreadPoolExecutor(max_workers=self.max_files) as pool:
+            pending = set()
+            for path, key in files:
+                pending.add(pool.submit(self._transfer, job, path, key, time.monotonic()))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def _transfer(self, job, path, key, submitted):
+        start = time.monotonic()
+        metrics.QUEUE_WAIT.observe(start - submitted, queue='upload')
+        try:
+            st = os.stat(path)
+            entry = self.journal.file(job, key)
+            unchanged = entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns
+            if unchanged and entry['state'] == 'done':
+                return TransferResult(path, key, st.st_size, 0.0, None, 'skipped')
+            if entry and entry['upload_id'] and not unchanged:
+                # The file moved on since this upload began; its parts are useless now
+                self._abort(key, entry['upload_id'])
+                entry = None
+            if st.st_size < self.multipart_threshold:
+                with metrics.stage('upload', nbytes=st.st_size, key=key):
+                    if self.limiter:
+                        self.limiter.consume(st.st_size)
+                    with open(path, 'rb') as f:
+                        resp = self.client.put_object(Bucket=self.bucket, Key=key, Body=f)
+                status = 'uploaded'
+            else:
+                resp, status = self._multipart(job, path, key, st, entry if unchanged else None)
+            self.journal.finish_file(job, key, path, st)
+            if self.index is not None:
+                self.index.record_put(key, st.st_size, resp.get('ETag'), resp.get('VersionId'))
+            return TransferResult(path, key, st.st_size, time.monotonic() - start, None, status)
+        except Exception as e:
+            return TransferResult(path, key, 0, time.monotonic() - start, e, 'failed')
+
+    def _multipart(self, job, path, key, st, entry):
+        done = {}
+        upload_id = entry and entry['upload_id']
+        part_size = entry and entry['part_size']
+        if upload_id:
+            try:
+                done = self._uploaded_parts(key, upload_id, part_size, st.st_size)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+                    raise
+                upload_id = None  # aborted or expired: start over
+        if upload_id:
+            journaled = self.journal.parts(job, key)
+            self.logger.info(f"⏯️ Resuming {key}: {len(done)} part(s) already in S3 "
+                             f"({len(journaled)} journaled)")
+        else:
+            part_size = part_size_for(st.st_size, self.chunk_size)
+            upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+            self.journal.begin_file(job, key, path, st, upload_id, part_size)
+        resumed = bool(done)
+
+        total = -(-st.st_size // part_size)
+        todo = [number for number in range(1, total + 1) if number not in done]
+
+        def send(number):
+            offset = (number - 1) * part_size
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                body = f.read(part_size)
+            with metrics.stage('upload_part', nbytes=len(body), key=key, part=number):
+                if self.limiter:
+                    self.limiter.consume(len(body))
+                etag = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                               PartNumber=number, Body=body)['ETag']
+            # Checkpoint: a crash after this line never re-sends this part
+            self.journal.record_part(job, key, number, etag)
+            return number, etag
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for number, etag in pool.map(send, todo):
+                done[number] = etag
+
+        parts = [{'PartNumber': n, 'ETag': done[n]} for n in sorted(done)]
+        resp = self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                     MultipartUpload={'Parts': parts})
+        return resp, 'resumed' if resumed else 'uploaded'
+
+    def _uploaded_parts(self, key, upload_id, part_size, size):
+        """Parts S3 holds for an upload, keeping only those of the expected length."""
+        done = {}
+        paginator = self.client.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=self.bucket, Key=key, UploadId=upload_id):
+            for part in page.get('Parts', []):
+                number = part['PartNumber']
+                expected = min(part_size, size - (number - 1) * part_size)
+                if part['Size'] == expected:
+                    done[number] = part['ETag']
+        return done
+
+    def _abort(self, key, upload_id):
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+                raise
+
+# --- Stale Upload Cleanup ---
+def cleanup_stale_uploads(client, bucket, prefix='', journal=None, max_age=STALE_UPLOAD_AGE, logger=None):
+    """Abort multipart uploads under prefix older than max_age seconds. Returns the count."""
+    logger = logger or logging.getLogger(__name__)
+    owned = journal.active_upload_ids() if journal is not None else set()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+    aborted = 0
+    paginator = client.get_paginator('list_multipart_uploads')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for upload in page.get('Uploads', []):
+            if upload['UploadId'] in owned or upload['Initiated'] > cutoff:
+                continue
+            try:
+                client.abort_multipart_upload(Bucket=bucket, Key=upload['Key'], UploadId=upload['UploadId'])
+                aborted += 1
+            except ClientError as e:
+                logger.warning(f"⚠️ Couldn't abort stale upload of {upload['Key']}: {e}")
+    if aborted:
+        logger.info(f"🧹 Aborted {aborted} stale multipart upload(s) under '{prefix}'")
+    return aborted
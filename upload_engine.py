@@ -0,0 +1,123 @@
+"""
+Shared concurrent upload engine used by all upload scripts.
+- Uploads many files at once through a bounded thread pool.
+- Tunable multipart chunk size and per-file part concurrency.
+- A global connection budget caps (files in flight x parts per file).
+- An optional global bandwidth budget (bytes/sec) shared by every transfer.
+- Successful uploads are recorded in the local ObjectIndex when one is given.
+- Each upload is timed as the 'upload' metrics stage; time spent queued for a
+  worker feeds the 'upload' queue wait histogram.
+"""
+import os
+import time
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import metrics
+
+# --- Defaults ---
+MAX_FILES_IN_FLIGHT = 8           # files uploaded in parallel
+MAX_CONCURRENCY_PER_FILE = 4      # multipart parts in parallel per file
+MAX_CONNECTIONS = 32              # global connection budget
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
+UploadResult = namedtuple('UploadResult', 'path key size elapsed error')
+
+def client_config(max_connections=MAX_CONNECTIONS, retry_mode='standard', max_attempts=5):
+    # The client's pool has to cover the whole budget or urllib3 will discard
+    # connections ("Connection pool is full") and the link won't saturate.
+    # Keep-alive probes stop idle pooled connections from being dropped silently.
+    from botocore.config import Config  # imported on use: importing this module stays cheap
+    return Config(max_pool_connections=max_connections, tcp_keepalive=True,
+                  retries={'mode': retry_mode, 'max_attempts': max_attempts})
+
+def connection_budget(max_files, max_concurrency, max_connections=MAX_CONNECTIONS):
+    """(files in flight, parts per file) clamped so their product fits the connection budget."""
+    max_files = max(1, min(max_files, max_connections))
+    return max_files, max(1, min(max_concurrency, max_connections // max_files))
+
+# --- Bandwidth Budget ---
+class BandwidthLimiter:
+    """Token bucket shared by all transfer threads."""
+
+    def __init__(self, bytes_per_second):
+        self.rate = float(bytes_per_second)
+        self.tokens = self.rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= amount
+            wait_for = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait_for:
+            time.sleep(wait_for)
+
+# --- Engine ---
+class UploadEngine:
+    def __init__(self, client, max_files=MAX_FILES_IN_FLIGHT,
+                 max_concurrency=MAX_CONCURRENCY_PER_FILE,
+                 chunk_size=MULTIPART_CHUNK_SIZE,
+                 multipart_threshold=MULTIPART_THRESHOLD,
+                 max_connections=MAX_CONNECTIONS,
+                 max_bandwidth=None, index=None, logger=None, limiter=None):
+        self.client = client
+        self.index = index
+        self.logger = logger or logging.getLogger(__name__)
+        # Keep files x parts inside the connection budget
+        self.max_files, self.max_concurrency = connection_budget(max_files, max_concurrency, max_connections)
+        from boto3.s3.transfer import TransferConfig
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=chunk_size,
+            max_concurrency=self.max_concurrency,
+            use_threads=True
+        )
+        # Pass another engine's limiter to share one bandwidth budget between them
+        self.limiter = limiter or (BandwidthLimiter(max_bandwidth) if max_bandwidth else None)
+
+    def upload(self, path, bucket, key, extra_args=None):
+        """Upload one file (multipart above the threshold). Raises on failure."""
+        callback = self.limiter.consume if self.limiter else None
+        size = os.path.getsize(path)
+        with metrics.stage('upload', nbytes=size, key=key):
+            self.client.upload_file(path, bucket, key, ExtraArgs=extra_args,
+                                    Config=self.transfer_config, Callback=callback)
+        if self.index is not None:
+            self.index.record_put(key, size)
+
+    def _upload_job(self, path, bucket, key, extra_args, submitted):
+        start = time.monotonic()
+        metrics.QUEUE_WAIT.observe(start - submitted, queue='upload')
+        try:
+            size = os.path.getsize(path)
+            self.upload(path, bucket, key, extra_args)
+            return UploadResult(path, key, size, time.monotonic() - start, None)
+        except Exception as e:
+            return UploadResult(path, key, 0, time.monotonic() - start, e)
+
+    def upload_many(self, jobs, extra_args=None):
+        """
+        Upload (path, bucket, key) jobs concurrently and yield an UploadResult
+        per file as it finishes. Only a bounded window of jobs is submitted at
+        a time, so huge file lists don't pile up in memory.
+        """
+        jobs = iter(jobs)
+        window = self.max_files * 2
+        with ThreadPoolExecutor(max_workers=self.max_files) as pool:
+            pending = set()
+            for path, bucket, key in jobs:
+                pending.add(pool.submit(self._upload_job, path, bucket, key, extra_args, time.monotonic()))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
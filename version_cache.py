@@ -0,0 +1,97 @@
+"""
+Exact-key version history with a TTL/LRU cache.
+- list_object_versions only filters by prefix, so 'a.txt' would also return
+  'a.txt.bak', 'a.txt2'... Versions come back sorted by key, so the requested
+  key's versions and delete markers are always first: pagination stops at the
+  first page that reaches another key.
+- Histories are cached per key for TTL seconds; the least recently used ones are
+  dropped once MAX_KEYS histories or MAX_VERSIONS versions in total are held.
+- Callers invalidate a key (or a whole prefix) after writing through the API.
+"""
+import time
+import heapq
+import threading
+from collections import OrderedDict
+
+TTL = 60                 # seconds a cached history is trusted
+MAX_KEYS = 256
+MAX_VERSIONS = 200000    # across all cached histories
+
+def version_record(item, is_marker):
+    return {
+        'VersionId': item['VersionId'],
+        'IsLatest': item['IsLatest'],
+        'LastModified': item['LastModified'].isoformat(),
+        'Size': 0 if is_marker else item.get('Size', 0),
+        'ETag': None if is_marker else item.get('ETag', '').strip('"'),
+        'IsDeleteMarker': is_marker
+    }
+
+def list_key_versions(client, bucket, key):
+    """Every version and delete marker of exactly `key`, newest first."""
+    paginator = client.get_paginator('list_object_versions')
+    versions, markers = [], []
+    for page in paginator.paginate(Bucket=bucket, Prefix=key):
+        passed = False
+        for field, is_marker, records in (('Versions', False, versions), ('DeleteMarkers', True, markers)):
+            for item in page.get(field, []):
+                if item['Key'] == key:
+                    records.append(version_record(item, is_marker))
+                else:
+                    passed = True
+        if passed:
+            break
+    # Each list is already newest first in S3's own order, which a sort on the
+    # timestamp would scramble for entries written within the same second. Only
+    # interleave the two lists; the merge is stable, so ties keep listing order.
+    return list(heapq.merge(versions, markers, key=lambda r: (r['IsLatest'], r['LastModified']), reverse=True))
+
+class VersionCache:
+    def __init__(self, client, bucket, ttl=TTL, max_keys=MAX_KEYS, max_versions=MAX_VERSIONS):
+        self.client = client
+        self.bucket = bucket
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.max_versions = max_versions
+        self.entries = OrderedDict()    # key -> (fetched at, versions)
+        self.total_versions = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        versions = list_key_versions(self.client, self.bucket, key)
+        with self.lock:
+            self._drop(key)
+            self.entries[key] = (time.monotonic(), versions)
+            self.total_versions += len(versions)
+            while len(self.entries) > 1 and (len(self.entries) > self.max_keys
+                                             or self.total_versions > self.max_versions):
+                self._drop(next(iter(self.entries)))
+        return versions
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.total_versions -= len(entry[1])
+
+    def invalidate(self, key):
+        with self.lock:
+            self._drop(key)
+
+    def invalidate_prefix(self, prefix):
+        with self.lock:
+            for key in [k for k in self.entries if k.startswith(prefix)]:
+                self._drop(key)
+
+    def stats(self):
+        with self.lock:
+            return {'keys': len(self.entries), 'versions': self.total_versions,
+                    'hits': self.hits, 'misses': self.misses}
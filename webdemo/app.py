@@ -1,14 +1,255 @@
 import os
-from flask import Flask, render_template, request, jsonify, send_from_directory, Response
-import boto3
+import sys
+import json
+import time
+import queue
+import threading
+from itertools import islice
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context, redirect, g
 from botocore.exceptions import ClientError
-import glob
+from werkzeug.http import http_date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from object_index import ObjectIndex, DEFAULT_INDEX_PATH
+from s3_clients import get_client, lazy
+import bulk_ops
+from version_cache import VersionCache
+from response_cache import ObjectCache
+import log_tail
+import metrics
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
 # --- AWS S3 Config ---
 BUCKET_NAME = os.environ.get('S3_BUCKET', '24030142014')
-s3 = boto3.client('s3')
+# One shared client for every request thread: its pool should be at least as large
+# as the server's thread count, and adaptive retries back off when S3 throttles.
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', '32'))
+
+def get_s3():
+    # Built on first use, so importing the app doesn't load boto3 or resolve credentials
+    return get_client(S3_MAX_POOL_CONNECTIONS, retry_mode='adaptive')
+
+# --- Local Object Index ---
+# Browsing and existence checks are answered from a local SQLite index that a
+# background thread refreshes; until the first refresh completes we fall back to S3.
+USE_LOCAL_INDEX = os.environ.get('S3_LOCAL_INDEX', '1') == '1'
+# Every interval only lists keys newer than the last one indexed; the full walk that
+# also drops deleted keys (and catches writes made elsewhere) runs far less often.
+INDEX_REFRESH_INTERVAL = int(os.environ.get('S3_INDEX_REFRESH', '300'))
+INDEX_SWEEP_INTERVAL = int(os.environ.get('S3_INDEX_SWEEP', '3600'))
+INDEX_TOKEN_PREFIX = 'idx:'
+index_refresher = None
+index_refresher_lock = threading.Lock()
+
+@lazy
+def get_object_index():
+    return ObjectIndex(os.environ.get('S3_INDEX_DB', DEFAULT_INDEX_PATH)) if USE_LOCAL_INDEX else None
+
+def index_sweep_due(object_index):
+    last = object_index.last_refreshed()
+    return last is None or (datetime.now(timezone.utc) - last).total_seconds() >= INDEX_SWEEP_INTERVAL
+
+def refresh_index_forever():
+    object_index = get_object_index()
+    while True:
+        try:
+            if index_sweep_due(object_index):
+                count = object_index.refresh(get_s3(), BUCKET_NAME)
+                app.logger.info(f"Object index refreshed: {count} object(s)")
+            else:
+                count = object_index.refresh_new(get_s3(), BUCKET_NAME)
+                app.logger.info(f"Object index delta refresh: {count} new object(s)")
+        except Exception as e:
+            app.logger.error(f"Object index refresh failed: {e}")
+        time.sleep(INDEX_REFRESH_INTERVAL)
+
+def index_ready():
+    global index_refresher
+    object_index = get_object_index()
+    if object_index is None:
+        return False
+    with index_refresher_lock:
+        if index_refresher is None:
+            index_refresher = threading.Thread(target=refresh_index_forever, name='index-refresh', daemon=True)
+            index_refresher.start()
+    return object_index.is_refreshed()
+
+def index_put(key, size, etag=None, version_id=None):
+    object_index = get_object_index()
+    if object_index is not None:
+        object_index.record_put(key, size, etag, version_id)
+
+def index_delete(key):
+    object_index = get_object_index()
+    if object_index is not None:
+        object_index.record_delete(key)
+
+# --- Version History Cache ---
+# Per-key histories, dropped whenever the key is written through this API
+VERSION_CACHE_TTL = int(os.environ.get('S3_VERSION_CACHE_TTL', '60'))
+VERSION_PAGE_SIZE = 100
+MAX_VERSION_PAGE_SIZE = 1000
+
+@lazy
+def get_version_cache():
+    cache = VersionCache(get_s3(), BUCKET_NAME, ttl=VERSION_CACHE_TTL)
+    metrics.REGISTRY.add_collector('version_cache', cache.stats)
+    return cache
+
+# --- Object Cache ---
+# Small objects opened in the editor/preview are kept in memory and revalidated
+# with a conditional GET, so reopening a hot document costs one 304 or nothing.
+OBJECT_CACHE_BYTES = int(os.environ.get('S3_OBJECT_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+@lazy
+def get_object_cache():
+    if not OBJECT_CACHE_BYTES:
+        return None
+    cache = ObjectCache(get_s3(), BUCKET_NAME, max_bytes=OBJECT_CACHE_BYTES)
+    metrics.REGISTRY.add_collector('object_cache', cache.stats)
+    return cache
+
+def key_changed(key):
+    get_version_cache().invalidate(key)
+    object_cache = get_object_cache()
+    if object_cache is not None:
+        object_cache.invalidate(key)
+
+def prefix_changed(prefix):
+    get_version_cache().invalidate_prefix(prefix)
+    object_cache = get_object_cache()
+    if object_cache is not None:
+        object_cache.invalidate_prefix(prefix)
+
+# --- Listing Config ---
+MAX_PAGE_SIZE = 1000  # S3 never returns more than 1000 keys per list call
+
+def listing_params():
+    prefix = request.args.get('prefix', '')
+    delimiter = request.args.get('delimiter', '')
+    try:
+        page_size = int(request.args.get('page_size', MAX_PAGE_SIZE))
+    except ValueError:
+        page_size = MAX_PAGE_SIZE
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    params = {'Bucket': BUCKET_NAME, 'Prefix': prefix}
+    if delimiter:
+        params['Delimiter'] = delimiter
+    return params, page_size
+
+# --- Download Config ---
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # per-request memory ceiling while streaming
+
+def stream_object(key, version_id=None, as_attachment=False):
+    # Range and conditional headers are passed straight through to S3 so the
+    # bytes are never buffered here; S3 answers 206/304/412/416 itself.
+    params = {'Bucket': BUCKET_NAME, 'Key': key}
+    if version_id:
+        params['VersionId'] = version_id
+    if request.headers.get('Range'):
+        params['Range'] = request.headers['Range']
+    if request.headers.get('If-None-Match'):
+        params['IfNoneMatch'] = request.headers['If-None-Match']
+    if request.if_modified_since:
+        params['IfModifiedSince'] = request.if_modified_since
+    try:
+        obj = get_s3().get_object(**params)
+    except ClientError as e:
+        status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if status == 304:
+            headers = {}
+            if request.headers.get('If-None-Match'):
+                headers['ETag'] = request.headers['If-None-Match']
+            return Response(status=304, headers=headers)
+        if status == 416:
+            return jsonify({'error': 'Requested range not satisfiable'}), 416
+        raise
+    return object_response(obj, key, as_attachment)
+
+def object_response(obj, key, as_attachment=False):
+    headers = {
+        'Content-Type': obj.get('ContentType', 'application/octet-stream'),
+        'Content-Length': str(obj['ContentLength']),
+        'Accept-Ranges': 'bytes'
+    }
+    if obj.get('ETag'):
+        headers['ETag'] = obj['ETag']
+    if obj.get('LastModified'):
+        headers['Last-Modified'] = http_date(obj['LastModified'])
+    if obj.get('ContentRange'):
+        headers['Content-Range'] = obj['ContentRange']
+    if as_attachment:
+        headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(key)}"'
+
+    def generate():
+        body = obj['Body']
+        try:
+            for chunk in body.iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    status = 206 if obj.get('ContentRange') else 200
+    return Response(generate(), status=status, headers=headers, direct_passthrough=True)
+
+# With redirects on, downloads 302 to a short-lived presigned GET so the bytes
+# never pass through Flask (?redirect=0/1 overrides per request).
+PRESIGNED_DOWNLOADS = os.environ.get('S3_PRESIGNED_DOWNLOADS', '0') == '1'
+PRESIGNED_GET_EXPIRES = 300
+
+def presigned_redirect(key, version_id=None, as_attachment=False):
+    params = {'Bucket': BUCKET_NAME, 'Key': key}
+    if version_id:
+        params['VersionId'] = version_id
+    if as_attachment:
+        params['ResponseContentDisposition'] = f'attachment; filename="{os.path.basename(key)}"'
+    return redirect(get_s3().generate_presigned_url('get_object', Params=params, ExpiresIn=PRESIGNED_GET_EXPIRES))
+
+def serve_object(key, version_id=None, as_attachment=False):
+    # Ranged reads go straight to S3; whole-object reads go through the cache
+    object_cache = get_object_cache()
+    if object_cache is None or request.headers.get('Range'):
+        return stream_object(key, version_id, as_attachment)
+    entry = object_cache.get(key, version_id)
+    if 'stream' in entry:
+        return object_response(entry['stream'], key, as_attachment)
+    headers = {'Content-Type': entry['content_type'], 'Accept-Ranges': 'bytes'}
+    if entry['etag']:
+        headers['ETag'] = entry['etag']
+    if entry['last_modified']:
+        headers['Last-Modified'] = http_date(entry['last_modified'])
+    not_modified = (entry['etag'] and request.if_none_match.contains(entry['etag'].strip('"'))) or \
+        (not request.if_none_match and request.if_modified_since and entry['last_modified']
+         and entry['last_modified'].replace(microsecond=0) <= request.if_modified_since)
+    if not_modified:
+        return Response(status=304, headers=headers)
+    if as_attachment:
+        headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(key)}"'
+    return Response(entry['body'], headers=headers)
+
+def object_record(obj):
+    last_modified = obj['LastModified']
+    return {
+        'key': obj['Key'],
+        'size': obj['Size'],
+        'last_modified': last_modified.isoformat() if hasattr(last_modified, 'isoformat') else last_modified
+    }
+
+def use_index(token):
+    # A token always goes back to the source that issued it
+    if token:
+        return token.startswith(INDEX_TOKEN_PREFIX)
+    return request.args.get('source') != 's3' and index_ready()
+
+def index_page(params, page_size, start_after=''):
+    prefix, delimiter = params['Prefix'], params.get('Delimiter')
+    if delimiter:
+        return get_object_index().list_dir(prefix, delimiter, start_after=start_after, limit=page_size)
+    objects = list(islice(get_object_index().iter_objects(prefix, start_after=start_after), page_size + 1))
+    next_token = objects[page_size - 1]['Key'] if len(objects) > page_size else None
+    return objects[:page_size], [], next_token
 
 # --- Routes ---
 @app.route('/')
@@ -17,13 +258,66 @@ def index():
 
 @app.route('/api/list-files')
 def list_files():
+    params, page_size = listing_params()
+    token = request.args.get('token')
+    if use_index(token):
+        if request.args.get('format') == 'ndjson':
+            return stream_index_listing(params, page_size)
+        objects, folders, next_token = index_page(params, page_size, (token or '')[len(INDEX_TOKEN_PREFIX):])
+        return jsonify({
+            'files': [obj['Key'] for obj in objects],
+            'objects': [object_record(obj) for obj in objects],
+            'folders': folders,
+            'next_token': INDEX_TOKEN_PREFIX + next_token if next_token else None,
+            'truncated': next_token is not None,
+            'source': 'index'
+        })
+    if request.args.get('format') == 'ndjson':
+        return stream_listing(params, page_size)
+    if token:
+        params['ContinuationToken'] = token
     try:
-        objects = s3.list_objects_v2(Bucket=BUCKET_NAME)
-        files = [obj['Key'] for obj in objects.get('Contents', [])]
-        return jsonify({'files': files})
+        resp = get_s3().list_objects_v2(MaxKeys=page_size, **params)
+        contents = resp.get('Contents', [])
+        return jsonify({
+            'files': [obj['Key'] for obj in contents],
+            'objects': [object_record(obj) for obj in contents],
+            'folders': [p['Prefix'] for p in resp.get('CommonPrefixes', [])],
+            'next_token': resp.get('NextContinuationToken'),
+            'truncated': resp.get('IsTruncated', False)
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def stream_listing(params, page_size):
+    # One NDJSON line per object/prefix, walking every page lazily so memory
+    # stays at a single page no matter how big the bucket is.
+    def generate():
+        paginator = get_s3().get_paginator('list_objects_v2')
+        try:
+            for page in paginator.paginate(PaginationConfig={'PageSize': page_size}, **params):
+                for p in page.get('CommonPrefixes', []):
+                    yield json.dumps({'folder': p['Prefix']}) + '\n'
+                for obj in page.get('Contents', []):
+                    yield json.dumps(object_record(obj)) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def stream_index_listing(params, page_size):
+    def generate():
+        start_after = ''
+        while True:
+            objects, folders, next_token = index_page(params, page_size, start_after)
+            for folder in folders:
+                yield json.dumps({'folder': folder}) + '\n'
+            for obj in objects:
+                yield json.dumps(object_record(obj)) + '\n'
+            if not next_token:
+                return
+            start_after = next_token
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -37,20 +331,153 @@ def upload_file():
         folder += '/'
     s3_key = f"{folder}{file.filename}" if folder else file.filename
     try:
-        s3.upload_fileobj(file, BUCKET_NAME, s3_key)
+        file.stream.seek(0, os.SEEK_END)
+        size = file.stream.tell()
+        file.stream.seek(0)
+        get_s3().upload_fileobj(file, BUCKET_NAME, s3_key)
+        index_put(s3_key, size)
+        key_changed(s3_key)
         return jsonify({'success': True, 'filename': s3_key})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# --- Direct-to-S3 Uploads ---
+# The browser PUTs bytes straight to S3 with presigned URLs: one URL for small
+# files, one URL per part for multipart uploads. Flask only signs and finishes.
+# The bucket needs a CORS rule allowing PUT from this origin and exposing ETag.
+PRESIGN_EXPIRES = 3600
+MULTIPART_PART_SIZE = 16 * 1024 * 1024     # S3 minimum is 5 MiB (except the last part)
+MULTIPART_MIN_SIZE = 32 * 1024 * 1024      # below this a single PUT is used
+MAX_PART_URLS = 100                        # part URLs signed per request
+
+def upload_key(filename, folder):
+    folder = (folder or '').strip()
+    if folder and not folder.endswith('/'):
+        folder += '/'
+    return f"{folder}{filename}"
+
+def uploaded(key):
+    # The bytes bypassed us, so read back what landed for the index and caches
+    head = get_s3().head_object(Bucket=BUCKET_NAME, Key=key)
+    index_put(key, head['ContentLength'], head.get('ETag'), head.get('VersionId'))
+    key_changed(key)
+    return head
+
+@app.route('/api/presign-upload', methods=['POST'])
+def presign_upload():
+    data = request.json or {}
+    filename = (data.get('filename') or '').strip()
+    if not filename:
+        return jsonify({'error': 'No filename provided'}), 400
+    key = upload_key(filename, data.get('folder'))
+    size = int(data.get('size') or 0)
+    content_type = data.get('content_type') or 'application/octet-stream'
+    try:
+        if size < MULTIPART_MIN_SIZE:
+            url = get_s3().generate_presigned_url('put_object', ExpiresIn=PRESIGN_EXPIRES, Params={
+                'Bucket': BUCKET_NAME, 'Key': key, 'ContentType': content_type})
+            return jsonify({'method': 'put', 'key': key, 'url': url})
+        resp = get_s3().create_multipart_upload(Bucket=BUCKET_NAME, Key=key, ContentType=content_type)
+        return jsonify({
+            'method': 'multipart',
+            'key': key,
+            'upload_id': resp['UploadId'],
+            'part_size': MULTIPART_PART_SIZE,
+            'part_count': -(-size // MULTIPART_PART_SIZE)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/multipart/part-urls', methods=['POST'])
+def multipart_part_urls():
+    data = request.json or {}
+    key, upload_id = data.get('key'), data.get('upload_id')
+    part_numbers = data.get('part_numbers') or []
+    if not key or not upload_id or not part_numbers:
+        return jsonify({'error': 'Missing key, upload_id or part_numbers'}), 400
+    if len(part_numbers) > MAX_PART_URLS:
+        return jsonify({'error': f'At most {MAX_PART_URLS} part URLs per request'}), 400
+    try:
+        urls = {str(n): get_s3().generate_presigned_url('upload_part', ExpiresIn=PRESIGN_EXPIRES, Params={
+                    'Bucket': BUCKET_NAME, 'Key': key, 'UploadId': upload_id, 'PartNumber': int(n)})
+                for n in part_numbers}
+        return jsonify({'urls': urls})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/multipart/parts')
+def multipart_parts():
+    # Parts S3 already has, so an interrupted upload can resume where it stopped
+    key, upload_id = request.args.get('key'), request.args.get('upload_id')
+    if not key or not upload_id:
+        return jsonify({'error': 'Missing key or upload_id'}), 400
+    try:
+        parts = []
+        paginator = get_s3().get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=BUCKET_NAME, Key=key, UploadId=upload_id):
+            parts.extend({'PartNumber': p['PartNumber'], 'ETag': p['ETag'], 'Size': p['Size']}
+                         for p in page.get('Parts', []))
+        return jsonify({'parts': parts})
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'NoSuchUpload':
+            return jsonify({'error': 'Upload no longer exists'}), 404
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/multipart/complete', methods=['POST'])
+def multipart_complete():
+    data = request.json or {}
+    key, upload_id, parts = data.get('key'), data.get('upload_id'), data.get('parts') or []
+    if not key or not upload_id or not parts:
+        return jsonify({'error': 'Missing key, upload_id or parts'}), 400
+    try:
+        parts = sorted(({'PartNumber': int(p['PartNumber']), 'ETag': p['ETag']} for p in parts),
+                       key=lambda p: p['PartNumber'])
+        get_s3().complete_multipart_upload(Bucket=BUCKET_NAME, Key=key, UploadId=upload_id,
+                                     MultipartUpload={'Parts': parts})
+        uploaded(key)
+        return jsonify({'success': True, 'filename': key})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/multipart/abort', methods=['POST'])
+def multipart_abort():
+    data = request.json or {}
+    key, upload_id = data.get('key'), data.get('upload_id')
+    if not key or not upload_id:
+        return jsonify({'error': 'Missing key or upload_id'}), 400
+    try:
+        get_s3().abort_multipart_upload(Bucket=BUCKET_NAME, Key=key, UploadId=upload_id)
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/upload-complete', methods=['POST'])
+def upload_complete():
+    # Called after a presigned single PUT
+    key = (request.json or {}).get('key')
+    if not key:
+        return jsonify({'error': 'No key provided'}), 400
+    try:
+        uploaded(key)
+        return jsonify({'success': True, 'filename': key})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/get-file')
 def get_file():
     key = request.args.get('key')
     if not key:
         return jsonify({'error': 'No key provided'}), 400
     try:
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=key)
-        content = obj['Body'].read().decode('utf-8')
-        return jsonify({'content': content})
+        object_cache = get_object_cache()
+        if object_cache is None:
+            body = get_s3().get_object(Bucket=BUCKET_NAME, Key=key)['Body'].read()
+        else:
+            entry = object_cache.get(key)
+            body = entry['stream']['Body'].read() if 'stream' in entry else entry['body']
+        return jsonify({'content': body.decode('utf-8')})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -62,7 +489,10 @@ def edit_file():
     if not key or content is None:
         return jsonify({'error': 'Missing key or content'}), 400
     try:
-        s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=content.encode('utf-8'))
+        body = content.encode('utf-8')
+        resp = get_s3().put_object(Bucket=BUCKET_NAME, Key=key, Body=body)
+        index_put(key, len(body), resp.get('ETag'), resp.get('VersionId'))
+        key_changed(key)
         return jsonify({'success': True, 'key': key})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -73,19 +503,11 @@ def download_file():
     if not key:
         return jsonify({'error': 'No key provided'}), 400
     try:
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=key)
-        data = obj['Body'].read()
-        content_type = obj.get('ContentType', 'application/octet-stream')
         # If ?download=1 is present, force download, else preview
-        if request.args.get('download') == '1':
-            return Response(data, headers={
-                'Content-Type': content_type,
-                'Content-Disposition': f'attachment; filename="{os.path.basename(key)}"'
-            })
-        else:
-            return Response(data, headers={
-                'Content-Type': content_type
-            })
+        as_attachment = request.args.get('download') == '1'
+        if request.args.get('redirect', '1' if PRESIGNED_DOWNLOADS else '0') == '1':
+            return presigned_redirect(key, as_attachment=as_attachment)
+        return serve_object(key, as_attachment=as_attachment)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -96,45 +518,253 @@ def delete_file():
     if not key:
         return jsonify({'error': 'No key provided'}), 400
     try:
-        s3.delete_object(Bucket=BUCKET_NAME, Key=key)
+        get_s3().delete_object(Bucket=BUCKET_NAME, Key=key)
+        index_delete(key)
+        key_changed(key)
         return jsonify({'success': True, 'key': key})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# --- Bulk Operations ---
+# POST {"action": "delete" | "copy" | "move", "keys": [...] or "prefix": "folder/", "dest_prefix": "other/"}
+# Keys given explicitly land in dest_prefix under their file name; a prefix is
+# relocated as a whole. Add ?format=ndjson to stream a progress line per batch.
+BULK_ACTIONS = ('delete', 'copy', 'move')
+
+def bulk_pairs(keys, prefix, dest_prefix):
+    if prefix:
+        return bulk_ops.prefix_pairs(get_s3(), BUCKET_NAME, prefix, dest_prefix)
+    return [(key, dest_prefix + key.rsplit('/', 1)[-1]) for key in keys]
+
+def run_bulk(action, keys, prefix, dest_prefix, progress=None):
+    try:
+        return dispatch_bulk(action, keys, prefix, dest_prefix, progress)
+    finally:
+        if prefix:
+            prefix_changed(prefix)
+        for key in keys:
+            key_changed(key)
+        if dest_prefix:
+            prefix_changed(dest_prefix)
+
+def dispatch_bulk(action, keys, prefix, dest_prefix, progress):
+    if action == 'delete':
+        if prefix:
+            return bulk_ops.delete_prefix(get_s3(), BUCKET_NAME, prefix, progress=progress, index=get_object_index())
+        return bulk_ops.delete_keys(get_s3(), BUCKET_NAME, keys, progress=progress, index=get_object_index())
+    if action == 'move':
+        if prefix:
+            return bulk_ops.move_prefix(get_s3(), BUCKET_NAME, prefix, dest_prefix, progress=progress, index=get_object_index())
+        return bulk_ops.move_pairs(get_s3(), BUCKET_NAME, bulk_pairs(keys, prefix, dest_prefix),
+                                   progress=progress, index=get_object_index())
+    return bulk_ops.copy_pairs(get_s3(), BUCKET_NAME, bulk_pairs(keys, prefix, dest_prefix),
+                               progress=progress, index=get_object_index())
+
+@app.route('/api/bulk', methods=['POST'])
+def bulk_operation():
+    data = request.json or {}
+    action = data.get('action')
+    keys = data.get('keys') or []
+    prefix = (data.get('prefix') or '').strip()
+    dest_prefix = (data.get('dest_prefix') or '').strip()
+    if action not in BULK_ACTIONS:
+        return jsonify({'error': f"action must be one of {', '.join(BULK_ACTIONS)}"}), 400
+    if bool(keys) == bool(prefix):
+        return jsonify({'error': 'Provide either keys or prefix'}), 400
+    if prefix and not prefix.endswith('/'):
+        prefix += '/'
+    if action != 'delete':
+        if not dest_prefix:
+            return jsonify({'error': 'No dest_prefix provided'}), 400
+        if not dest_prefix.endswith('/'):
+            dest_prefix += '/'
+    if request.args.get('format') == 'ndjson':
+        return stream_bulk(action, keys, prefix, dest_prefix)
+    try:
+        report = run_bulk(action, keys, prefix, dest_prefix)
+        result = report.as_dict()
+        return jsonify(dict(result, success=result['failed'] == 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def stream_bulk(action, keys, prefix, dest_prefix):
+    updates = queue.Queue()
+    done = object()
+
+    def work():
+        try:
+            report = run_bulk(action, keys, prefix, dest_prefix,
+                              progress=lambda r: updates.put(r.as_dict(include_failures=False)))
+            result = report.as_dict()
+            updates.put(dict(result, done=True, success=result['failed'] == 0))
+        except Exception as e:
+            updates.put({'error': str(e), 'done': True})
+        finally:
+            updates.put(done)
+
+    threading.Thread(target=work, name='bulk-op', daemon=True).start()
+
+    def generate():
+        for update in iter(updates.get, done):
+            yield json.dumps(update) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/list-versions')
 def list_versions():
+    # ?key=...&page_size=100&token=<last VersionId shown>&markers=0 to hide delete markers
     key = request.args.get('key')
     if not key:
         return jsonify({'error': 'No key provided'}), 400
     try:
-        versions = s3.list_object_versions(Bucket=BUCKET_NAME, Prefix=key)
-        version_list = []
-        for v in versions.get('Versions', []):
-            if v['Key'] == key:
-                version_list.append({
-                    'VersionId': v['VersionId'],
-                    'IsLatest': v['IsLatest'],
-                    'LastModified': v['LastModified'].isoformat(),
-                    'Size': v['Size']
-                })
-        return jsonify({'versions': version_list})
+        page_size = min(int(request.args.get('page_size', VERSION_PAGE_SIZE)), MAX_VERSION_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'page_size must be an integer'}), 400
+    token = request.args.get('token')
+    try:
+        history = get_version_cache().get(key)
+        if request.args.get('markers') == '0':
+            history = [v for v in history if not v['IsDeleteMarker']]
+        start = 0
+        if token:
+            ids = [v['VersionId'] for v in history]
+            if token not in ids:
+                return jsonify({'error': 'Unknown or expired token'}), 400
+            start = ids.index(token) + 1
+        page = history[start:start + page_size]
+        truncated = start + page_size < len(history)
+        return jsonify({
+            'versions': page,
+            'total': len(history),
+            'truncated': truncated,
+            'next_token': page[-1]['VersionId'] if truncated else None
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# --- Logs ---
+# Offsets in the log file are the cursors: ?tail=N for the last N lines, ?cursor=C for
+# lines written since C, ?before=C&tail=N to page back. level= (minimum) and file=
+# filters go through an on-disk line index. /api/logs/stream live-tails over SSE; each
+# stream holds a server thread, so streams are capped in number and in lifetime (the
+# browser reconnects and resumes from Last-Event-ID).
+LOG_PATH = os.environ.get('S3_SYNC_LOG', os.path.join(os.path.dirname(__file__), '..', 's3_sync.log'))
+LOG_TAIL_LINES = 200
+MAX_LOG_LINES = 2000
+LOG_POLL_INTERVAL = 1.0
+LOG_HEARTBEAT = 15
+LOG_STREAM_MAX_SECONDS = int(os.environ.get('S3_LOG_STREAM_MAX_SECONDS', '300'))
+LOG_STREAM_MAX_CLIENTS = int(os.environ.get('S3_LOG_STREAM_MAX_CLIENTS', '4'))
+LOG_STREAM_RETRY_MS = 3000
+log_stream_slots = threading.BoundedSemaphore(LOG_STREAM_MAX_CLIENTS)
+log_index = None
+log_index_lock = threading.Lock()
+
+def get_log_index():
+    global log_index
+    with log_index_lock:
+        if log_index is None:
+            log_index = log_tail.LogIndex(LOG_PATH)
+    return log_index
+
+def log_filters():
+    level = (request.args.get('level') or '').upper()
+    if level and level not in log_tail.LEVELS:
+        raise ValueError(f"level must be one of {', '.join(log_tail.LEVELS)}")
+    return log_tail.LEVELS.get(level), request.args.get('file') or None
+
 @app.route('/api/logs')
 def get_logs():
-    log_path = os.path.join(os.path.dirname(__file__), '..', 's3_sync.log')
     try:
-        with open(log_path, 'r') as f:
-            log_content = f.read()
-        return jsonify({'log': log_content})
+        count = min(int(request.args.get('tail', LOG_TAIL_LINES)), MAX_LOG_LINES)
+        cursor = request.args.get('cursor', type=int)
+        before = request.args.get('before', type=int)
+        min_level, file = log_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        if min_level or file:
+            index = get_log_index()
+            end = index.catch_up()
+            if cursor is not None:
+                page = index.query(min_level, file, after=cursor, limit=count)
+            else:
+                page = index.query(min_level, file, before=before, limit=count)
+            lines = [line for _, line in page.rows]
+            # Cursors follow the lines the index scanned, not the matches left after the
+            # text filter: continue after the last scanned line, or jump to the indexed end
+            if cursor is not None:
+                next_cursor = page.end if page.full else end
+            else:
+                next_cursor = end
+            start = page.start if page.start is not None else (before if before is not None else end)
+            return jsonify({'lines': lines, 'cursor': next_cursor, 'start': start,
+                            'more': cursor is not None and page.full})
+        if cursor is not None:
+            lines, next_cursor, more = log_tail.read_after(LOG_PATH, cursor)
+            return jsonify({'lines': lines, 'cursor': next_cursor, 'start': cursor, 'more': more})
+        if before is not None:
+            lines, start = log_tail.read_before(LOG_PATH, before, count)
+            return jsonify({'lines': lines, 'cursor': before, 'start': start, 'more': start > 0})
+        lines, start, end = log_tail.tail(LOG_PATH, count)
+        return jsonify({'lines': lines, 'cursor': end, 'start': start, 'more': start > 0})
+    except FileNotFoundError:
+        return jsonify({'lines': [], 'cursor': 0, 'start': 0, 'more': False})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/logs/stream')
+def stream_logs():
+    # Server-Sent Events: each line is an event whose id is the cursor after it, so
+    # a reconnecting EventSource resumes from Last-Event-ID without gaps.
+    try:
+        min_level, file = log_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cursor = request.headers.get('Last-Event-ID', request.args.get('cursor'))
+    try:
+        cursor = int(cursor) if cursor is not None else log_tail.complete_end(LOG_PATH)
+    except (ValueError, FileNotFoundError):
+        cursor = 0
+    if not log_stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many live log streams; retry shortly'}), 503, \
+            {'Retry-After': str(LOG_STREAM_RETRY_MS // 1000)}
+    matches = log_tail.LineFilter(min_level, file)
+
+    def generate():
+        position = cursor
+        started = last_sent = time.monotonic()
+        yield f"retry: {LOG_STREAM_RETRY_MS}\n\n"
+        while time.monotonic() - started < LOG_STREAM_MAX_SECONDS:
+            try:
+                entries, new_position, more = log_tail.read_entries_after(LOG_PATH, position)
+            except FileNotFoundError:
+                entries, new_position, more = [], 0, False
+            for offset, line in entries:
+                if matches(line):
+                    yield f"id: {offset}\ndata: {json.dumps(line)}\n\n"
+                    last_sent = time.monotonic()
+            position = new_position
+            if more:
+                continue
+            if time.monotonic() - last_sent >= LOG_HEARTBEAT:
+                yield f"id: {position}\n: keep-alive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(LOG_POLL_INTERVAL)
+        # Hand the thread back; the browser reconnects from this id
+        yield f"id: {position}\n: reconnect\n\n"
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(log_stream_slots.release)
+    return response
+
 @app.route('/api/versioning')
 def versioning_status():
     try:
-        response = s3.get_bucket_versioning(Bucket=BUCKET_NAME)
+        response = get_s3().get_bucket_versioning(Bucket=BUCKET_NAME)
         status = response.get('Status', 'Disabled')
         return jsonify({'versioning': status})
     except Exception as e:
@@ -147,19 +777,27 @@ def download_version():
     if not key or not version_id:
         return jsonify({'error': 'No key or version_id provided'}), 400
     try:
-        obj = s3.get_object(Bucket=BUCKET_NAME, Key=key, VersionId=version_id)
-        data = obj['Body'].read()
-        return Response(data, headers={
-            'Content-Disposition': f'attachment; filename="{os.path.basename(key)}"'
-        })
+        if request.args.get('redirect', '1' if PRESIGNED_DOWNLOADS else '0') == '1':
+            return presigned_redirect(key, version_id, as_attachment=True)
+        return serve_object(key, version_id=version_id, as_attachment=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/list-folders')
 def list_folders():
     try:
-        resp = s3.list_objects_v2(Bucket=BUCKET_NAME, Delimiter='/')
-        prefixes = [p['Prefix'] for p in resp.get('CommonPrefixes', [])]
+        if index_ready():
+            prefixes = []
+            start_after = ''
+            while True:
+                _, folders, start_after = get_object_index().list_dir('', '/', start_after=start_after)
+                prefixes.extend(folders)
+                if not start_after:
+                    break
+        else:
+            paginator = get_s3().get_paginator('list_objects_v2')
+            prefixes = [p['Prefix'] for page in paginator.paginate(Bucket=BUCKET_NAME, Delimiter='/')
+                        for p in page.get('CommonPrefixes', [])]
         return jsonify({'folders': prefixes})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -173,12 +811,17 @@ def create_folder():
     if not folder.endswith('/'):
         folder += '/'
     try:
-        # Check if folder exists
-        resp = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=folder, Delimiter='/')
-        if 'CommonPrefixes' in resp and any(p['Prefix'] == folder for p in resp['CommonPrefixes']):
+        # Check if folder exists (anything stored under the prefix counts)
+        if index_ready():
+            exists = get_object_index().prefix_exists(folder)
+        else:
+            exists = get_s3().list_objects_v2(Bucket=BUCKET_NAME, Prefix=folder, MaxKeys=1).get('KeyCount', 0) > 0
+        if exists:
             return jsonify({'error': 'Folder already exists'}), 400
         # Create folder marker
-        s3.put_object(Bucket=BUCKET_NAME, Key=folder)
+        resp = get_s3().put_object(Bucket=BUCKET_NAME, Key=folder)
+        index_put(folder, 0, resp.get('ETag'), resp.get('VersionId'))
+        key_changed(folder)
         return jsonify({'success': True, 'folder': folder})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -187,6 +830,35 @@ def create_folder():
 def send_static(path):
     return send_from_directory('static', path)
 
+# --- Metrics ---
+# Prometheus text format on /metrics: request latency per endpoint, S3 call latency,
+# retries and errors (from the instrumented client) and the caches' counters.
+# Streaming responses are timed until their headers are ready, not until the last byte.
+HTTP_SECONDS = metrics.REGISTRY.histogram('http_request_duration_seconds', 'Web demo request latency')
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None and request.endpoint != 'get_metrics':
+        HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or 'unknown',
+                             method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/traces')
+def get_traces():
+    limit = min(request.args.get('limit', 100, type=int), metrics.TRACE_BUFFER)
+    return jsonify({'spans': metrics.recent_spans(limit, request.args.get('name'))})
+
 if __name__ == '__main__':
-    extra_files = glob.glob('/Volumes/study/cloud web/aws 4th july/*')
-    app.run(debug=True, extra_files=extra_files) 
\ No newline at end of file
+    # Development server. S3_WEB_DEBUG=1 turns on the debugger and code reloader
+    # (it only watches the source, not the data folder). For production use serve.py.
+    debug = os.environ.get('S3_WEB_DEBUG') == '1'
+    app.run(debug=debug, use_reloader=debug, threaded=True) 
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+Production entry point for the web demo.
+- No debugger, no code reloader and no file watching.
+- Threaded server: waitress when it is installed, otherwise werkzeug's threaded
+  WSGI server. A slow S3 call only holds its own thread, never the whole server.
+- The shared S3 client's connection pool is sized to the thread count, so every
+  thread gets a kept-alive connection instead of opening and discarding new ones.
+
+Usage: python serve.py   (WEB_HOST, WEB_PORT, WEB_THREADS from the environment)
+"""
+import os
+import logging
+
+WEB_HOST = os.environ.get('WEB_HOST', '127.0.0.1')
+WEB_PORT = int(os.environ.get('WEB_PORT', '5000'))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '32'))
+
+# Must be set before the app builds its client
+os.environ.setdefault('S3_MAX_POOL_CONNECTIONS', str(WEB_THREADS))
+
+from app import app
+
+def make_server(host=WEB_HOST, port=WEB_PORT, threads=WEB_THREADS):
+    """Return an object with serve_forever()/shutdown(), like werkzeug's servers."""
+    try:
+        from waitress.server import create_server
+        return WaitressServer(create_server(app, host=host, port=port, threads=threads))
+    except ImportError:
+        from werkzeug.serving import make_server as werkzeug_server
+        return werkzeug_server(host, port, app, threaded=True)
+
+class WaitressServer:
+    def __init__(self, server):
+        self.server = server
+
+    def serve_forever(self):
+        self.server.run()
+
+    def shutdown(self):
+        self.server.close()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='🔍 %(levelname)s: %(message)s')
+    server = make_server()
+    logging.info(f"🌐 Serving on http://{WEB_HOST}:{WEB_PORT} ({WEB_THREADS} threads, "
+                 f"S3 pool {os.environ['S3_MAX_POOL_CONNECTIONS']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("🛑 Server stopped.")
@@ -27,6 +27,130 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     loadFolders();
 
+    // --- Direct-to-S3 uploads ---
+    // Small files get one presigned PUT; large ones a multipart upload whose parts
+    // go up in parallel. Multipart state is kept in localStorage so re-uploading the
+    // same file after a failure only sends the missing parts.
+    const PART_CONCURRENCY = 4;
+    const PART_RETRIES = 3;
+    const PART_URL_BATCH = 100;
+
+    function postJSON(url, body) {
+        return fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        }).then(res => res.json());
+    }
+    function uploadViaServer(file, folder) {
+        const formData = new FormData();
+        formData.append('file', file);
+        if (folder) formData.append('folder', folder);
+        return fetch('/api/upload', { method: 'POST', body: formData }).then(res => res.json());
+    }
+    function putWithRetry(url, body, headers, attempt) {
+        attempt = attempt || 0;
+        return fetch(url, { method: 'PUT', body: body, headers: headers || {} })
+            .then(res => {
+                if (!res.ok) throw new Error('HTTP ' + res.status);
+                return res;
+            })
+            .catch(err => {
+                if (attempt + 1 >= PART_RETRIES) throw err;
+                return new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt))
+                    .then(() => putWithRetry(url, body, headers, attempt + 1));
+            });
+    }
+    function resumeSlot(file, key) {
+        return 'multipart:' + key + ':' + file.size + ':' + file.lastModified;
+    }
+    function uploadParts(file, plan, doneParts) {
+        const slot = resumeSlot(file, plan.key);
+        const etags = {};
+        doneParts.forEach(p => { etags[p.PartNumber] = p.ETag; });
+        const todo = [];
+        for (let n = 1; n <= plan.part_count; n++) {
+            if (!etags[n]) todo.push(n);
+        }
+        const urls = {};
+        let signing = null;
+        let next = 0;
+        // Part URLs are signed in batches just ahead of the workers that need them
+        function urlFor(n, idx) {
+            if (urls[n]) return Promise.resolve(urls[n]);
+            if (!signing) {
+                signing = postJSON('/api/multipart/part-urls', {
+                    key: plan.key, upload_id: plan.upload_id,
+                    part_numbers: todo.slice(idx, idx + PART_URL_BATCH)
+                }).then(data => {
+                    signing = null;
+                    if (data.error) throw new Error(data.error);
+                    Object.assign(urls, data.urls);
+                });
+            }
+            return signing.then(() => urlFor(n, idx));
+        }
+        function worker() {
+            if (next >= todo.length) return Promise.resolve();
+            const idx = next++;
+            const n = todo[idx];
+            const blob = file.slice((n - 1) * plan.part_size, n * plan.part_size);
+            return urlFor(n, idx)
+                .then(url => putWithRetry(url, blob))
+                .then(res => {
+                    const etag = res.headers.get('ETag');
+                    if (!etag) throw new Error('ETag not exposed by bucket CORS rule');
+                    etags[n] = etag;
+                    uploadResult.style.display = '';
+                    uploadResult.className = 'alert';
+                    uploadResult.textContent = `Uploading ${file.name}: ${Object.keys(etags).length}/${plan.part_count} parts`;
+                })
+                .then(worker);
+        }
+        const workers = [];
+        for (let i = 0; i < PART_CONCURRENCY; i++) workers.push(worker());
+        return Promise.all(workers)
+            .then(() => postJSON('/api/multipart/complete', {
+                key: plan.key,
+                upload_id: plan.upload_id,
+                parts: Object.keys(etags).map(n => ({ PartNumber: Number(n), ETag: etags[n] }))
+            }))
+            .then(data => {
+                if (data.success) localStorage.removeItem(slot);
+                return data;
+            });
+    }
+    function startUpload(file, folder) {
+        const contentType = file.type || 'application/octet-stream';
+        return postJSON('/api/presign-upload', {
+            filename: file.name, folder: folder, size: file.size, content_type: contentType
+        }).then(plan => {
+            if (plan.error) return uploadViaServer(file, folder);
+            if (plan.method === 'put') {
+                return putWithRetry(plan.url, file, { 'Content-Type': contentType })
+                    .then(() => postJSON('/api/upload-complete', { key: plan.key }));
+            }
+            localStorage.setItem(resumeSlot(file, plan.key), JSON.stringify(plan));
+            return uploadParts(file, plan, []);
+        });
+    }
+    function uploadFile(file, folder) {
+        let key = file.name;
+        if (folder) key = (folder.endsWith('/') ? folder : folder + '/') + file.name;
+        const saved = JSON.parse(localStorage.getItem(resumeSlot(file, key)) || 'null');
+        if (!saved) return startUpload(file, folder);
+        // Resume: ask S3 which parts it already has
+        return fetch('/api/multipart/parts?key=' + encodeURIComponent(saved.key) + '&upload_id=' + encodeURIComponent(saved.upload_id))
+            .then(res => res.ok ? res.json() : null)
+            .then(data => {
+                if (!data || data.error) {
+                    localStorage.removeItem(resumeSlot(file, key));
+                    return startUpload(file, folder);
+                }
+                return uploadParts(file, saved, data.parts);
+            });
+    }
+
     uploadForm.addEventListener('submit', function(e) {
         e.preventDefault();
         const files = fileInput.files;
@@ -56,14 +180,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
         let completed = 0;
         for (let i = 0; i < files.length; i++) {
-            const formData = new FormData();
-            formData.append('file', files[i]);
-            if (folder) formData.append('folder', folder);
-            fetch('/api/upload', {
-                method: 'POST',
-                body: formData
-            })
-            .then(res => res.json())
+            uploadFile(files[i], folder)
             .then(data => {
                 if (data.success) {
                     uploadCount++;
@@ -194,30 +311,71 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // List files
     function loadFiles() {
-        fetch('/api/list-files')
-            .then(res => res.json())
-            .then(data => {
-                const fileList = document.getElementById('fileList');
-                fileList.innerHTML = '';
-                if (data.files && data.files.length) {
-                    const tree = buildTree(data.files);
-                    const treeUl = renderTree(tree);
-                    fileList.appendChild(treeUl);
-                } else {
-                    fileList.innerHTML = '<li>No files found.</li>';
-                }
-            });
+        // Follow continuation tokens page by page
+        const allFiles = [];
+        function loadPage(token) {
+            let url = '/api/list-files';
+            if (token) url += '?token=' + encodeURIComponent(token);
+            return fetch(url)
+                .then(res => res.json())
+                .then(data => {
+                    if (data.files) allFiles.push(...data.files);
+                    if (data.next_token) return loadPage(data.next_token);
+                });
+        }
+        loadPage(null).then(() => {
+            const fileList = document.getElementById('fileList');
+            fileList.innerHTML = '';
+            if (allFiles.length) {
+                const tree = buildTree(allFiles);
+                const treeUl = renderTree(tree);
+                fileList.appendChild(treeUl);
+            } else {
+                fileList.innerHTML = '<li>No files found.</li>';
+            }
+        });
     }
     loadFiles();
 
-    // Show logs
+    // Show logs: the last lines, then a live tail from the returned cursor
+    const MAX_LOG_LINES = 2000;
+    let logLines = [];
+    let logStream = null;
+    function showLogLines(lines) {
+        const logContent = document.getElementById('logContent');
+        const atBottom = logContent.scrollTop + logContent.clientHeight >= logContent.scrollHeight - 5;
+        logLines = logLines.concat(lines).slice(-MAX_LOG_LINES);
+        logContent.textContent = logLines.join('\n');
+        if (atBottom) logContent.scrollTop = logContent.scrollHeight;
+    }
     function loadLogs() {
-        fetch('/api/logs')
+        fetch('/api/logs?tail=200')
             .then(res => res.json())
             .then(data => {
-                document.getElementById('logContent').textContent = data.log || data.error || '';
+                if (data.error) {
+                    document.getElementById('logContent').textContent = data.error;
+                    return;
+                }
+                logLines = [];
+                showLogLines(data.lines);
+                openLogStream(data.cursor);
             });
     }
+    // The browser reconnects by itself when the server ends a stream (Last-Event-ID);
+    // a refused stream (503, too many open) closes it, so retry from the last line seen.
+    function openLogStream(cursor) {
+        if (logStream) logStream.close();
+        logStream = new EventSource(`/api/logs/stream?cursor=${cursor}`);
+        logStream.onmessage = e => {
+            cursor = e.lastEventId || cursor;
+            showLogLines([JSON.parse(e.data)]);
+        };
+        logStream.onerror = () => {
+            if (logStream.readyState === EventSource.CLOSED) {
+                setTimeout(() => openLogStream(cursor), 5000);
+            }
+        };
+    }
     loadLogs();
 
     // Show versioning status
@@ -302,27 +460,53 @@ document.addEventListener('DOMContentLoaded', function() {
         versionModal.innerHTML = '<div id="versionModalContent" style="background:#fff;max-width:600px;margin:60px auto;padding:20px;border-radius:8px;position:relative;"></div>';
         document.body.appendChild(versionModal);
     }
+    function versionItem(key, v) {
+        if (v.IsDeleteMarker) {
+            return `<li>${v.IsLatest ? '<b>Latest</b> ' : ''}<i>Deleted</i> | Modified: ${v.LastModified}</li>`;
+        }
+        return `<li>${v.IsLatest ? '<b>Latest</b> ' : ''}VersionId: <code>${v.VersionId}</code> | Size: ${v.Size} | Modified: ${v.LastModified} <button onclick="window.open('/api/download-version?key=${encodeURIComponent(key)}&version_id=${encodeURIComponent(v.VersionId)}','_blank')">Download</button> <button onclick="restoreVersion('${key}','${v.VersionId}')">Restore</button></li>`;
+    }
     function showVersions(key, displayName) {
-        fetch('/api/list-versions?key=' + encodeURIComponent(key))
-            .then(res => res.json())
-            .then(data => {
-                const content = document.getElementById('versionModalContent');
-                if (data.versions && data.versions.length) {
-                    let html = `<h3>Versions for ${displayName || key}</h3><ul>`;
-                    data.versions.forEach(v => {
-                        html += `<li>${v.IsLatest ? '<b>Latest</b> ' : ''}VersionId: <code>${v.VersionId}</code> | Size: ${v.Size} | Modified: ${v.LastModified} <button onclick="window.open('/api/download-version?key=${encodeURIComponent(key)}&version_id=${encodeURIComponent(v.VersionId)}','_blank')">Download</button> <button onclick="restoreVersion('${key}','${v.VersionId}')">Restore</button></li>`;
+        const content = document.getElementById('versionModalContent');
+        const title = `<h3>Versions for ${displayName || key}</h3>`;
+        // Versions arrive a page at a time; "Load more" follows next_token
+        function loadPage(token) {
+            let url = '/api/list-versions?key=' + encodeURIComponent(key);
+            if (token) url += '&token=' + encodeURIComponent(token);
+            return fetch(url).then(res => res.json());
+        }
+        function renderMore(data) {
+            const list = document.getElementById('versionList');
+            list.insertAdjacentHTML('beforeend', data.versions.map(v => versionItem(key, v)).join(''));
+            const more = document.getElementById('moreVersions');
+            if (data.next_token) {
+                more.style.display = '';
+                more.textContent = `Load more (${list.children.length} of ${data.total})`;
+                more.onclick = function() {
+                    more.disabled = true;
+                    loadPage(data.next_token).then(next => {
+                        more.disabled = false;
+                        renderMore(next);
                     });
-                    html += '</ul>';
-                    html += '<button id="closeVersionModal">Close</button>';
-                    content.innerHTML = html;
-                } else {
-                    content.innerHTML = `<h3>Versions for ${displayName || key}</h3><p>No versions found.</p><button id="closeVersionModal">Close</button>`;
-                }
-                versionModal.style.display = '';
-                document.getElementById('closeVersionModal').onclick = function() {
-                    versionModal.style.display = 'none';
                 };
-            });
+            } else {
+                more.style.display = 'none';
+            }
+        }
+        loadPage(null).then(data => {
+            if (data.versions && data.versions.length) {
+                content.innerHTML = title + '<ul id="versionList"></ul>' +
+                    '<button id="moreVersions" style="display:none">Load more</button> ' +
+                    '<button id="closeVersionModal">Close</button>';
+                renderMore(data);
+            } else {
+                content.innerHTML = `${title}<p>No versions found.</p><button id="closeVersionModal">Close</button>`;
+            }
+            versionModal.style.display = '';
+            document.getElementById('closeVersionModal').onclick = function() {
+                versionModal.style.display = 'none';
+            };
+        });
     }
     // Restore version
     window.restoreVersion = function(key, versionId) {
@@ -2,33 +2,36 @@
 Watches a local folder for file changes.
 On file modification:
 - Uploads the changed file to S3.
-- Creates a timestamped ZIP backup and uploads it to S3.
+- Streams a timestamped ZIP backup to S3 (compressed while uploading, no temp file).
 - Logs all actions to a debug log file.
 - Minimal version of the main sync script for testing ZIP backup logic.
+- Nothing is created at import; the client and engine are built on first use.
 """
 import os
 import time
-import boto3
-import zipfile
 import logging
 from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from upload_engine import UploadEngine
+from dedup_store import DedupStore
+from stream_backup import upload_backup
+from s3_clients import get_client, lazy
 
 # --- Setup ---
 bucket_name = '24030142014'
 watch_folder = '/Volumes/study/cloud web/aws 4th july/'
 log_path = os.path.join(watch_folder, 'zip_debug.log')
-zip_output_folder = os.path.join(watch_folder, 'zips/')
-s3 = boto3.client('s3')
+# 'zip' uploads a timestamped ZIP per change; 'dedup' stores only new chunks
+BACKUP_MODE = 'zip'
 
-# --- Logging ---
-logging.basicConfig(
-    filename=log_path,
-    filemode='a',
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+@lazy
+def get_engine():
+    return UploadEngine(get_client())
+
+@lazy
+def get_dedup_store():
+    return DedupStore(get_client(), bucket_name)
 
 # --- Event Handler ---
 class ZipUploadHandler(FileSystemEventHandler):
@@ -46,37 +49,38 @@ class ZipUploadHandler(FileSystemEventHandler):
         try:
             # Upload raw file
             s3_key_raw = f'live-sync/{filename}'
-            s3.upload_file(filepath, bucket_name, s3_key_raw)
+            get_engine().upload(filepath, bucket_name, s3_key_raw)
             logging.info(f"Uploaded RAW file → {s3_key_raw}")
         except Exception as e:
             logging.error(f"Failed RAW upload: {e}")
             return
 
-        try:
-            # Create ZIP
-            os.makedirs(zip_output_folder, exist_ok=True)
-            timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-            zip_name = f"{os.path.splitext(filename)[0]}_{timestamp}.zip"
-            zip_path = os.path.join(zip_output_folder, zip_name)
-
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                zipf.write(filepath, arcname=filename)
-
-            logging.info(f"Created ZIP: {zip_path}")
-        except Exception as e:
-            logging.error(f"ZIP creation failed: {e}")
+        if BACKUP_MODE == 'dedup':
+            try:
+                manifest_key, stats = get_dedup_store().backup_file(filepath, name=filename)
+                logging.info(f"Dedup backup → {manifest_key} ({stats['bytes_uploaded']} bytes uploaded)")
+            except Exception as e:
+                logging.error(f"Dedup backup failed: {e}")
             return
 
         try:
-            # Upload ZIP
-            with open(zip_path, 'rb') as f:
-                s3.put_object(Bucket=bucket_name, Key=f'live-sync/backups/{zip_name}', Body=f)
-            logging.info(f"Uploaded ZIP → live-sync/backups/{zip_name}")
+            # Compress + upload ZIP in one streaming pass
+            timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+            zip_stem = f"live-sync/backups/{os.path.splitext(filename)[0]}_{timestamp}"
+            zip_key, size = upload_backup(get_client(), filepath, bucket_name, zip_stem)
+            logging.info(f"Uploaded ZIP → {zip_key} ({size} bytes)")
         except Exception as e:
             logging.error(f"ZIP upload failed: {e}")
 
 # --- Main Watcher ---
 if __name__ == "__main__":
+    # --- Logging ---
+    logging.basicConfig(
+        filename=log_path,
+        filemode='a',
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
     logging.info("Started minimal ZIP sync test.")
     observer = Observer()
     observer.schedule(ZipUploadHandler(), watch_folder, recursive=False)